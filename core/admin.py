@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     Course, Module, Lesson, Assignment, Submission,
-    Enrollment, LessonProgress, Certificate, Message
+    Enrollment, LessonProgress, Certificate, Message, CertificateIssueJob,
+    Conversation, ConversationMember, TelegramDelivery, AnalyticsRollup
 )
 
 # Inline for modules within course
@@ -43,7 +44,11 @@ class CourseAdmin(admin.ModelAdmin):
         ('Additional Information', {
             'fields': ('category', 'level', 'accessibility_features', 'is_active')
         }),
+        ('Statistics', {
+            'fields': ('module_count', 'lesson_count', 'total_duration', 'enrollment_count', 'certificate_count')
+        }),
     )
+    readonly_fields = ('module_count', 'lesson_count', 'total_duration', 'enrollment_count', 'certificate_count')
 
 @admin.register(Module)
 class ModuleAdmin(admin.ModelAdmin):
@@ -97,11 +102,12 @@ class AssignmentAdmin(admin.ModelAdmin):
 
 @admin.register(Submission)
 class SubmissionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'assignment', 'student', 'submission_date', 'status', 'submitted_file')
+    list_display = ('id', 'assignment', 'student', 'submission_date', 'status', 'claimed_by', 'submitted_file')
     list_filter = ('assignment', 'status', 'submission_date')
     search_fields = ('status', 'student__email', 'assignment__title')
     ordering = ('-submission_date',)
     list_editable = ('status',)
+    actions = ['mark_looked']
     fieldsets = (
         ('Basic Information', {
             'fields': ('assignment', 'student', 'submitted_file')
@@ -111,6 +117,11 @@ class SubmissionAdmin(admin.ModelAdmin):
         }),
     )
 
+    @admin.action(description="Mark selected submissions as looked")
+    def mark_looked(self, request, queryset):
+        updated = queryset.update(status='looked', claimed_by=None, claimed_until=None)
+        self.message_user(request, f"{updated} submissions marked as looked.")
+
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'course', 'enrollment_date', 'progress', 'needs_accessibility_support')
@@ -154,10 +165,34 @@ class CertificateAdmin(admin.ModelAdmin):
             'fields': ('user', 'course', 'certificate_number')
         }),
         ('Additional Information', {
-            'fields': ('issue_date', 'accessibility_features')
+            'fields': ('issue_date', 'accessibility_features', 'file')
         }),
     )
 
+@admin.register(CertificateIssueJob)
+class CertificateIssueJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'course', 'requested_by', 'status', 'issued', 'rendered', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('course__title', 'requested_by__email')
+    ordering = ('-created_at',)
+    readonly_fields = ('course', 'requested_by', 'min_progress', 'status', 'issued', 'rendered', 'error',
+                       'created_at', 'finished_at')
+
+class ConversationMemberInline(admin.TabularInline):
+    model = ConversationMember
+    fk_name = 'conversation'
+    extra = 0
+    readonly_fields = ('user', 'peer', 'unread_count', 'last_message_at')
+    can_delete = False
+
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user_low', 'user_high', 'last_message_at', 'created_at')
+    search_fields = ('user_low__email', 'user_high__email')
+    ordering = ('-last_message_at',)
+    readonly_fields = ('user_low', 'user_high', 'last_message', 'last_message_at', 'created_at')
+    inlines = [ConversationMemberInline]
+
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('id', 'sender', 'receiver', 'timestamp', 'read_status', 'via_telegram', 'telegram_message_id')
@@ -173,3 +208,20 @@ class MessageAdmin(admin.ModelAdmin):
             'fields': ('read_status', 'via_telegram', 'telegram_message_id', 'timestamp')
         }),
     )
+
+@admin.register(TelegramDelivery)
+class TelegramDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'message', 'chat_id', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('chat_id', 'message__receiver__email')
+    ordering = ('-created_at',)
+    readonly_fields = ('message', 'chat_id', 'attempts', 'locked_until', 'last_error', 'created_at', 'sent_at')
+
+@admin.register(AnalyticsRollup)
+class AnalyticsRollupAdmin(admin.ModelAdmin):
+    list_display = ('id', 'course', 'module', 'granularity', 'bucket', 'lessons_completed', 'submissions',
+                    'active_students', 'stale')
+    list_filter = ('granularity', 'stale', 'course')
+    ordering = ('-bucket',)
+    list_select_related = ('course', 'module')
+    readonly_fields = [field.name for field in AnalyticsRollup._meta.fields]
@@ -0,0 +1,250 @@
+import logging
+import operator
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+from .models import AnalyticsRollup, AnalyticsWatermark, Enrollment, LessonProgress, Module, Submission
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+COUNTS = ('enrollments', 'lessons_completed', 'time_spent', 'time_spent_samples', 'submissions', 'submissions_on_time')
+METRICS = COUNTS + ('active_students',)
+WATERMARK = 'rollups'
+# Buckets per recompute query, to keep the OR of time ranges small.
+BUCKET_CHUNK = 100
+
+
+def overlap():
+    # Rows are stamped before they commit; re-reading a little behind the watermark catches late commits.
+    return timedelta(seconds=getattr(settings, 'ANALYTICS_OVERLAP', 300))
+
+
+def hour_cutoff(now=None):
+    """Hourly buckets older than this are dropped; the daily ones are kept for good."""
+    return (now or timezone.now()) - timedelta(days=getattr(settings, 'ANALYTICS_HOURLY_RETENTION_DAYS', 14))
+
+
+def bucket_end(bucket, granularity):
+    local = timezone.localtime(bucket).replace(tzinfo=None) + GRANULARITIES[granularity]
+    return timezone.make_aware(local)
+
+
+def sources():
+    """``(queryset, event time field, change marker field)`` for every raw row feeding the rollups."""
+    return (
+        # Any status: a row that stopped being completed still changes its bucket.
+        (LessonProgress.objects.all(), 'completion_date', 'updated_at'),
+        (Submission.objects.all(), 'submission_date', 'updated_at'),
+        # Enrollments are never edited in a way the rollups see, only created and deleted.
+        (Enrollment.objects.all(), 'enrollment_date', 'enrollment_date'),
+    )
+
+
+def affected_buckets(granularity, since=None, now=None):
+    """``{course_id: {bucket, ...}}`` touched by rows changed since ``since``, plus stale rollups."""
+    cutoff = hour_cutoff(now) if granularity == 'hour' else None
+    keys = defaultdict(set)
+    for queryset, time_field, changed_field in sources():
+        queryset = queryset.filter(**{f'{time_field}__isnull': False})
+        if since is not None:
+            queryset = queryset.filter(**{f'{changed_field}__gte': since})
+        if cutoff is not None:
+            queryset = queryset.filter(**{f'{time_field}__gte': cutoff})
+        rows = queryset.annotate(bucket=Trunc(time_field, granularity)).values_list('course_id', 'bucket').distinct()
+        for course_id, bucket in rows:
+            keys[course_id].add(bucket)
+    stale = AnalyticsRollup.objects.filter(granularity=granularity, stale=True)
+    if cutoff is not None:
+        stale = stale.filter(bucket__gte=cutoff)
+    for course_id, bucket in stale.values_list('course_id', 'bucket').distinct():
+        keys[course_id].add(bucket)
+    return keys
+
+
+def _in_buckets(field, granularity, buckets):
+    return reduce(operator.or_, (
+        Q(**{f'{field}__gte': bucket, f'{field}__lt': bucket_end(bucket, granularity)}) for bucket in buckets
+    ))
+
+
+def compute(course_id, granularity, buckets):
+    """Rollup rows for ``buckets`` of one course, aggregated from the raw rows."""
+    rows = defaultdict(lambda: dict.fromkeys(COUNTS, 0))
+    active = defaultdict(set)
+
+    completions = LessonProgress.objects.filter(
+        _in_buckets('completion_date', granularity, buckets), course_id=course_id, status='completed'
+    ).annotate(bucket=Trunc('completion_date', granularity))
+    for row in completions.values('bucket', module_id=F('lesson__module')).annotate(
+        completed=Count('pk'), minutes=Coalesce(Sum('time_spent'), 0), samples=Count('time_spent')
+    ).order_by():
+        rows[row['bucket'], row['module_id']].update(
+            lessons_completed=row['completed'], time_spent=row['minutes'], time_spent_samples=row['samples']
+        )
+    for bucket, module_id, user_id in completions.values_list('bucket', 'lesson__module', 'user').distinct():
+        active[bucket, module_id].add(user_id)
+
+    submissions = Submission.objects.filter(
+        _in_buckets('submission_date', granularity, buckets), course_id=course_id
+    ).annotate(bucket=Trunc('submission_date', granularity))
+    on_time = Q(assignment__due_date__isnull=True) | Q(submission_date__date__lte=F('assignment__due_date'))
+    for row in submissions.values('bucket', module_id=F('assignment__lesson__module')).annotate(
+        submissions=Count('pk'), submissions_on_time=Count('pk', filter=on_time)
+    ).order_by():
+        rows[row.pop('bucket'), row.pop('module_id')].update(row)
+    for bucket, module_id, user_id in submissions.values_list('bucket', 'assignment__lesson__module', 'student').distinct():
+        active[bucket, module_id].add(user_id)
+
+    course_rows = defaultdict(lambda: dict.fromkeys(COUNTS, 0))
+    for (bucket, _), counts in rows.items():
+        for name, value in counts.items():
+            course_rows[bucket][name] += value
+    enrollments = Enrollment.objects.filter(
+        _in_buckets('enrollment_date', granularity, buckets), course_id=course_id
+    ).annotate(bucket=Trunc('enrollment_date', granularity))
+    for bucket, count in enrollments.values_list('bucket').annotate(count=Count('pk')).order_by():
+        course_rows[bucket]['enrollments'] = count
+
+    course_active = defaultdict(set)
+    for (bucket, module_id), users in active.items():
+        course_active[bucket] |= users
+    rollups = [
+        AnalyticsRollup(course_id=course_id, module_id=None, granularity=granularity, bucket=bucket,
+                        active_students=len(course_active[bucket]), **counts)
+        for bucket, counts in course_rows.items()
+    ]
+    rollups += [
+        AnalyticsRollup(course_id=course_id, module_id=module_id, granularity=granularity, bucket=bucket,
+                        active_students=len(active[bucket, module_id]), **counts)
+        for (bucket, module_id), counts in rows.items()
+    ]
+    return rollups
+
+
+def recompute(course_id, granularity, buckets):
+    """Replace the course's rollups for ``buckets``; returns the number of buckets rewritten."""
+    buckets = sorted(buckets)
+    for start in range(0, len(buckets), BUCKET_CHUNK):
+        chunk = buckets[start:start + BUCKET_CHUNK]
+        with transaction.atomic():
+            rollups = compute(course_id, granularity, chunk)
+            AnalyticsRollup.objects.filter(course_id=course_id, granularity=granularity, bucket__in=chunk).delete()
+            AnalyticsRollup.objects.bulk_create(rollups)
+    return len(buckets)
+
+
+def refresh(now=None, full=False):
+    """
+    Fold the raw rows changed since the watermark into the rollups: every hour and
+    day bucket they fall in is recomputed from scratch, so edits are handled the same
+    as inserts, and deletions through the ``stale`` flag (``mark_stale``). The first
+    run, or ``full``, rebuilds everything.
+
+    Returns the number of buckets rewritten, or None if another run holds the watermark.
+    """
+    now = now or timezone.now()
+    AnalyticsWatermark.objects.get_or_create(name=WATERMARK)
+    with transaction.atomic():
+        watermark = AnalyticsWatermark.objects.select_for_update(skip_locked=True).filter(name=WATERMARK).first()
+        if watermark is None:
+            return None
+        since = None if full or watermark.value is None else watermark.value - overlap()
+        if since is None:
+            AnalyticsRollup.objects.all().delete()
+        rewritten = 0
+        for granularity in GRANULARITIES:
+            for course_id, buckets in affected_buckets(granularity, since, now).items():
+                rewritten += recompute(course_id, granularity, buckets)
+        AnalyticsRollup.objects.filter(granularity='hour', bucket__lt=hour_cutoff(now)).delete()
+        watermark.value = now
+        watermark.save(update_fields=['value'])
+    logger.info(f"Analytics rollups: {rewritten} buckets rewritten since {since or 'the beginning'}")
+    return rewritten
+
+
+def mark_stale(course_id, moment):
+    """Flag the rollups covering ``moment`` for the next ``refresh``, e.g. after a row was deleted."""
+    mark_stale_many([(course_id, moment)])
+
+
+def mark_stale_many(moments):
+    """``mark_stale`` for an iterable of ``(course_id, moment)`` pairs, in one UPDATE."""
+    conditions = [
+        Q(course_id=course_id, granularity=granularity, bucket__lte=moment, bucket__gt=moment - step)
+        for course_id, moment in set(moments) if moment is not None
+        for granularity, step in GRANULARITIES.items()
+    ]
+    if conditions:
+        AnalyticsRollup.objects.filter(reduce(operator.or_, conditions)).update(stale=True)
+
+
+def mark_course_stale(course_id):
+    if course_id is not None:
+        AnalyticsRollup.objects.filter(course_id=course_id).update(stale=True)
+
+
+def processed_through():
+    return AnalyticsWatermark.objects.filter(name=WATERMARK).values_list('value', flat=True).first()
+
+
+def _rates(counts, lessons=None, enrolled=None):
+    def ratio(numerator, denominator):
+        return round(min(numerator / denominator, 1.0), 4) if denominator else None
+
+    rates = {
+        'average_time_spent': round(counts['time_spent'] / counts['time_spent_samples'], 1)
+        if counts['time_spent_samples'] else None,
+        'on_time_rate': ratio(counts['submissions_on_time'], counts['submissions']),
+    }
+    if lessons is not None:
+        rates['completion_rate'] = ratio(counts['lessons_completed'], lessons * enrolled)
+    return rates
+
+
+def course_analytics(course, granularity, start, end):
+    """
+    Dashboard figures for ``course``, read from the rollups alone: all-time totals
+    from the daily rows and a ``granularity`` series over ``[start, end)``, for the
+    course and each active module.
+    """
+    totals = {
+        row.pop('module'): row for row in AnalyticsRollup.objects.filter(course=course, granularity='day').values(
+            'module'
+        ).annotate(**{name: Coalesce(Sum(name), 0) for name in COUNTS}).order_by()
+    }
+    series = defaultdict(list)
+    for row in AnalyticsRollup.objects.filter(
+        course=course, granularity=granularity, bucket__gte=start, bucket__lt=end
+    ).order_by('bucket').values('module', 'bucket', *METRICS):
+        series[row.pop('module')].append({**row, **_rates(row)})
+    modules = Module.objects.filter(course=course, is_active=True).annotate(
+        lesson_count=Count('lessons', filter=Q(lessons__is_active=True))
+    ).order_by('order', 'id').values('id', 'title', 'lesson_count')
+
+    empty = dict.fromkeys(COUNTS, 0)
+    enrolled = course.enrollment_count
+    course_totals = totals.get(None, empty)
+    return {
+        'course': course.pk,
+        'granularity': granularity,
+        'start': start,
+        'end': end,
+        'updated_through': processed_through(),
+        'summary': {
+            'enrolled': enrolled, 'lesson_count': course.lesson_count, **course_totals,
+            **_rates(course_totals, course.lesson_count, enrolled),
+        },
+        'series': series[None],
+        'modules': [
+            {**module, **totals.get(module['id'], empty),
+             **_rates(totals.get(module['id'], empty), module['lesson_count'], enrolled),
+             'series': series[module['id']]}
+            for module in modules
+        ],
+    }
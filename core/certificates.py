@@ -0,0 +1,150 @@
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = (1169, 827)  # A4 landscape at 100 dpi
+
+
+def certificate_number(course_id, user_id):
+    """
+    Deterministic certificate number.
+
+    (course, user) is already unique, so the number cannot collide; the HMAC
+    suffix keeps numbers from being guessed from the ids alone.
+    """
+    check = salted_hmac('core.certificates', f'{course_id}:{user_id}').hexdigest()[:6].upper()
+    return f'CRT-{course_id}-{user_id}-{check}'
+
+
+def _font(size):
+    from PIL import ImageFont
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def render_certificate_pdf(payload):
+    """Render one certificate to PDF bytes. Pure Pillow, so it runs in worker processes."""
+    from PIL import Image, ImageDraw
+    image = Image.new('RGB', PAGE_SIZE, 'white')
+    draw = ImageDraw.Draw(image)
+    width, height = PAGE_SIZE
+    draw.rectangle([30, 30, width - 30, height - 30], outline='#4F46E5', width=8)
+
+    lines = [
+        ('Certificate of Completion', 56, 170),
+        ('This certifies that', 28, 300),
+        (payload['name'], 48, 370),
+        ('has successfully completed', 28, 460),
+        (payload['course'], 40, 520),
+        (f"Issued {payload['date']}  ·  {payload['number']}", 22, 700),
+    ]
+    for text, size, top in lines:
+        font = _font(size)
+        left, _, right, _ = draw.textbbox((0, 0), text, font=font)
+        draw.text(((width - (right - left)) / 2, top), text, fill='#111827', font=font)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PDF', resolution=100.0)
+    return buffer.getvalue()
+
+
+def lease_duration():
+    return timedelta(seconds=getattr(settings, 'CERTIFICATE_LEASE', 300))
+
+
+def claim_job():
+    """
+    Lease the oldest pending job, or a running one whose worker stopped renewing its
+    lease, and mark it running. Returns None when nothing is due. A course is only
+    rendered by one job at a time: jobs for a course with a live job stay queued.
+    """
+    from django.db import transaction
+    from django.db.models import Q
+    from django.utils import timezone
+    from .models import Course, CertificateIssueJob
+    now = timezone.now()
+    with transaction.atomic():
+        due = CertificateIssueJob.objects.filter(
+            Q(status='pending') | Q(status='running', locked_until__lt=now)
+        ).order_by('created_at', 'id').select_for_update(skip_locked=True)
+        for job in due:
+            # Claims for one course queue up on its row, so the check below sees a claim that just committed.
+            Course.objects.select_for_update().filter(pk=job.course_id).exists()
+            busy = CertificateIssueJob.objects.filter(
+                course_id=job.course_id, status='running', locked_until__gte=now
+            ).exclude(pk=job.pk)
+            if busy.exists():
+                continue
+            CertificateIssueJob.objects.filter(pk=job.pk).update(status='running', locked_until=now + lease_duration())
+            return job
+    return None
+
+
+def run_issue_job(job_id):
+    """
+    Render PDFs for the job's course in a process pool and attach them, reporting
+    progress and renewing the job's lease as batches land. Only certificates without
+    a file are rendered, so a job taken over after a crash picks up where it stopped.
+    """
+    # Imported here so worker processes only need Pillow to unpickle render_certificate_pdf.
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+    from django.db.models import Q
+    from django.utils import timezone
+    from .models import Certificate, CertificateIssueJob
+
+    job = CertificateIssueJob.objects.select_related('course').get(pk=job_id)
+    certificates = list(
+        Certificate.objects.filter(course=job.course)
+        .filter(Q(file__isnull=True) | Q(file=''))
+        .select_related('user')
+    )
+    payloads = [{
+        'name': certificate.user.full_name or certificate.user.email,
+        'course': job.course.title,
+        'date': certificate.issue_date.date().isoformat(),
+        'number': certificate.certificate_number,
+    } for certificate in certificates]
+
+    batch_size = getattr(settings, 'CERTIFICATE_PROGRESS_BATCH', 100)
+    workers = getattr(settings, 'CERTIFICATE_WORKERS', 2)
+    rendered = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pdfs = pool.map(render_certificate_pdf, payloads, chunksize=16)
+            for certificate, pdf in zip(certificates, pdfs):
+                name = f'certificates/{certificate.certificate_number}.pdf'
+                # A crashed run may have stored the file without recording it; replace it rather than add a copy.
+                default_storage.delete(name)
+                certificate.file = default_storage.save(name, ContentFile(pdf))
+                rendered.append(certificate)
+                if len(rendered) % batch_size == 0:
+                    _flush(job_id, rendered[-batch_size:])
+            _flush(job_id, rendered[len(rendered) - len(rendered) % batch_size:])
+    except Exception as e:
+        logger.exception(f"Certificate job {job_id} failed")
+        CertificateIssueJob.objects.filter(pk=job_id).update(
+            status='failed', error=str(e), finished_at=timezone.now(), locked_until=None
+        )
+        return
+    CertificateIssueJob.objects.filter(pk=job_id).update(status='done', finished_at=timezone.now(), locked_until=None)
+    logger.info(f"Certificate job {job_id}: rendered {len(rendered)} certificates for course {job.course_id}")
+
+
+def _flush(job_id, certificates):
+    from django.db.models import F
+    from django.utils import timezone
+    from .models import Certificate, CertificateIssueJob
+    if not certificates:
+        return
+    Certificate.objects.bulk_update(certificates, ['file'])
+    CertificateIssueJob.objects.filter(pk=job_id).update(
+        rendered=F('rendered') + len(certificates), locked_until=timezone.now() + lease_duration()
+    )
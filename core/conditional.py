@@ -0,0 +1,53 @@
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETag / Last-Modified support for ``list`` and ``retrieve``.
+
+    The version of a response is one aggregate query over the filtered queryset:
+    the newest ``updated_at`` of the rows (and of ``etag_dependencies``, the related
+    rows the serializer renders) plus the row count. A matching ``If-None-Match`` or
+    ``If-Modified-Since`` returns ``304 Not Modified`` before anything is serialized.
+    """
+    etag_dependencies = []
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional(request, queryset, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        return self.conditional(request, queryset, super().retrieve, *args, **kwargs)
+
+    def conditional(self, request, queryset, render, *args, **kwargs):
+        etag, last_modified = self.get_version(request, queryset)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = render(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_version(self, request, queryset):
+        fields = ['updated_at'] + list(self.etag_dependencies)
+        aggregates = {f'max_{n}': Max(field) for n, field in enumerate(fields)}
+        version = queryset.order_by().aggregate(rows=Count('pk'), **aggregates)
+
+        stamps = [version[f'max_{n}'] for n in range(len(fields))]
+        known = [stamp for stamp in stamps if stamp is not None]
+        last_modified = int(max(known).timestamp()) if known else None
+        digest = hashlib.sha1(
+            '|'.join([request.get_full_path(), str(version['rows'])] +
+                     [stamp.isoformat() if stamp else '' for stamp in stamps]).encode()
+        ).hexdigest()
+        return f'"{digest}"', last_modified
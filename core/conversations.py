@@ -0,0 +1,107 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, QuerySet, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Conversation, ConversationMember, Mailbox, Message
+from . import realtime
+
+
+def get_conversation(user_id, peer_id):
+    """The conversation between two users, created with both memberships on first use."""
+    low, high = sorted((user_id, peer_id))
+    conversation, created = Conversation.objects.get_or_create(user_low_id=low, user_high_id=high)
+    if created:
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=conversation, user_id=low, peer_id=high),
+            ConversationMember(conversation=conversation, user_id=high, peer_id=low),
+        ], ignore_conflicts=True)
+        Mailbox.objects.bulk_create([Mailbox(user_id=low), Mailbox(user_id=high)], ignore_conflicts=True)
+    return conversation
+
+
+def record_message(message):
+    """Fold a new message into its conversation and the receiver's mailbox, without reads."""
+    Conversation.objects.filter(pk=message.conversation_id).update(
+        last_message=message, last_message_at=message.timestamp
+    )
+    unread = F('unread_count') if message.read_status else F('unread_count') + 1
+    ConversationMember.objects.filter(conversation_id=message.conversation_id).update(
+        last_message_at=message.timestamp,
+        unread_count=Case(
+            When(user_id=message.receiver_id, then=unread), default=F('unread_count'), output_field=IntegerField()
+        ),
+    )
+    if not message.read_status:
+        Mailbox.objects.filter(user_id=message.receiver_id).update(unread_count=F('unread_count') + 1)
+
+
+def unread_expression():
+    """Unread messages addressed to the outer ``ConversationMember``'s user."""
+    unread = Message.objects.filter(
+        conversation=OuterRef('conversation'), receiver=OuterRef('user'), read_status=False
+    ).order_by().values('conversation').annotate(value=Count('pk')).values('value')
+    return Coalesce(Subquery(unread, output_field=IntegerField()), 0)
+
+
+def refresh_mailboxes(user_ids):
+    """Re-derive each mailbox total from the user's conversation memberships."""
+    totals = ConversationMember.objects.filter(user=OuterRef('user')).order_by().values('user').annotate(
+        value=Sum('unread_count')
+    ).values('value')
+    return Mailbox.objects.filter(user__in=[pk for pk in user_ids if pk is not None]).update(
+        unread_count=Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+    )
+
+
+def refresh_conversations(conversations):
+    """Recompute last message and unread counts for a conversation queryset (or ids)."""
+    if not isinstance(conversations, QuerySet):
+        conversations = Conversation.objects.filter(pk__in=[pk for pk in conversations if pk is not None])
+    latest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-timestamp', '-id')
+    updated = conversations.update(
+        last_message=Subquery(latest.values('pk')[:1]),
+        last_message_at=Subquery(latest.values('timestamp')[:1]),
+    )
+    members = ConversationMember.objects.filter(conversation__in=conversations)
+    members.update(
+        last_message_at=Subquery(Conversation.objects.filter(pk=OuterRef('conversation')).values('last_message_at')),
+        unread_count=unread_expression(),
+    )
+    refresh_mailboxes(set(members.values_list('user_id', flat=True)))
+    return updated
+
+
+def mark_read(user, messages):
+    """
+    Mark the user's unread ``messages`` as read in one UPDATE and re-derive their counters.
+
+    Only memberships that had unread messages can change, so those are recounted
+    rather than adjusted by deltas, which keeps concurrent calls from double-counting.
+    Read receipts go to both participants of every affected conversation.
+    """
+    messages = messages.filter(receiver=user, read_status=False)
+    with transaction.atomic():
+        threads = set(messages.values_list('conversation_id', 'sender_id').distinct())
+        updated = messages.update(read_status=True)
+        if updated:
+            ConversationMember.objects.filter(user=user, unread_count__gt=0).update(
+                unread_count=unread_expression()
+            )
+            refresh_mailboxes([user.pk])
+            read_at = timezone.now()
+            for conversation_id, sender_id in threads:
+                realtime.publish([user.pk, sender_id], realtime.read_event(conversation_id, user.pk, read_at))
+    return updated
+
+
+def attach_orphan_messages():
+    """File messages written around the signals (``bulk_create``, raw SQL) under their conversation."""
+    conversation_ids = set()
+    pairs = Message.objects.filter(conversation__isnull=True).values_list('sender_id', 'receiver_id').distinct()
+    for sender_id, receiver_id in pairs:
+        conversation = get_conversation(sender_id, receiver_id)
+        Message.objects.filter(
+            conversation__isnull=True, sender_id=sender_id, receiver_id=receiver_id
+        ).update(conversation=conversation)
+        conversation_ids.add(conversation.pk)
+    return conversation_ids
@@ -0,0 +1,65 @@
+from django.db.models import Count, F, IntegerField, OuterRef, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest, Least, Now, NullIf
+from .models import Course, Module, Lesson, Enrollment, LessonProgress, Certificate
+
+CONTENT_COUNTERS = ('module_count', 'lesson_count', 'total_duration')
+AUDIENCE_COUNTERS = ('enrollment_count', 'certificate_count')
+
+
+def _scalar(queryset, aggregate):
+    subquery = queryset.order_by().values('course_ref').annotate(value=aggregate).values('value')
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), 0)
+
+
+def counter_expressions():
+    """Set-wise expressions computing every counter of the outer ``Course`` row."""
+    lessons = Lesson.objects.filter(
+        module__course=OuterRef('pk'), is_active=True, module__is_active=True
+    ).annotate(course_ref=F('module__course'))
+    return {
+        'module_count': _scalar(
+            Module.objects.filter(course=OuterRef('pk'), is_active=True).annotate(course_ref=F('course')),
+            Count('pk')
+        ),
+        'lesson_count': _scalar(lessons, Count('pk')),
+        'total_duration': _scalar(lessons, Sum('duration')),
+        'enrollment_count': _scalar(
+            Enrollment.objects.filter(course=OuterRef('pk')).annotate(course_ref=F('course')), Count('pk')
+        ),
+        'certificate_count': _scalar(
+            Certificate.objects.filter(course=OuterRef('pk')).annotate(course_ref=F('course')), Count('pk')
+        ),
+    }
+
+
+def refresh_course_counters(courses, fields=None):
+    """Recompute counters for a course queryset (or ids) in a single UPDATE."""
+    if not isinstance(courses, QuerySet):
+        courses = Course.objects.filter(pk__in=[pk for pk in courses if pk is not None])
+    expressions = counter_expressions()
+    fields = fields or list(expressions)
+    return courses.update(updated_at=Now(), **{field: expressions[field] for field in fields})
+
+
+def adjust_course_counter(course_id, field, delta):
+    Course.objects.filter(pk=course_id).update(
+        updated_at=Now(), **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def progress_expression():
+    """Percentage of the course's active lessons the outer ``Enrollment`` user has completed."""
+    completed = Coalesce(Subquery(
+        LessonProgress.objects.filter(
+            user=OuterRef('user'), course=OuterRef('course'), status='completed',
+            lesson__is_active=True, lesson__module__is_active=True
+        ).order_by().values('user').annotate(value=Count('pk')).values('value'),
+        output_field=IntegerField()
+    ), 0)
+    total = Subquery(Course.objects.filter(pk=OuterRef('course')).values('lesson_count'))
+    return Least(Coalesce(completed * 100 / NullIf(total, 0), 0), 100)
+
+
+def refresh_enrollment_progress(enrollments):
+    """Recompute ``progress`` for an enrollment queryset in a single UPDATE."""
+    return enrollments.update(progress=progress_expression())
@@ -0,0 +1,65 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Submission
+
+QUEUE_STATUSES = ('not_looked', 'in_progress')
+
+
+def lease_duration():
+    return timedelta(seconds=getattr(settings, 'GRADING_LEASE', 900))
+
+
+def queue_for(user):
+    """Ungraded submissions of ``user``'s courses; admins see every course."""
+    queryset = Submission.objects.filter(status__in=QUEUE_STATUSES)
+    if user.role != 'admin':
+        queryset = queryset.filter(teacher=user)
+    return queryset
+
+
+def unclaimed(now):
+    return Q(claimed_by__isnull=True) | Q(claimed_until__lt=now)
+
+
+def claimable_by(user, now):
+    return unclaimed(now) | Q(claimed_by=user)
+
+
+def claim(user, count, course_id=None):
+    """
+    Lease the oldest ``count`` unclaimed submissions to ``user`` and mark them in
+    progress. Rows another grader is claiming right now are skipped, not waited on,
+    and leases that ran out are taken over.
+    """
+    now = timezone.now()
+    queue = queue_for(user)
+    if course_id is not None:
+        queue = queue.filter(course_id=course_id)
+    with transaction.atomic():
+        free = queue.filter(unclaimed(now)).order_by('submission_date', 'id').select_for_update(skip_locked=True)
+        ids = list(free.values_list('pk', flat=True)[:count])
+        Submission.objects.filter(pk__in=ids).update(
+            status='in_progress', claimed_by=user, claimed_until=now + lease_duration()
+        )
+    return ids
+
+
+def release(user, ids):
+    """Hand ``user``'s claims on ``ids`` back to the queue."""
+    return Submission.objects.filter(pk__in=ids, claimed_by=user, status__in=QUEUE_STATUSES).update(
+        status='not_looked', claimed_by=None, claimed_until=None
+    )
+
+
+def mark_looked(user, ids):
+    """
+    Grade ``ids`` in one UPDATE. Submissions outside ``user``'s queue or under
+    someone else's live claim are left alone; returns how many were updated.
+    """
+    now = timezone.now()
+    return queue_for(user).filter(claimable_by(user, now), pk__in=ids).update(
+        status='looked', claimed_by=None, claimed_until=None
+    )
@@ -0,0 +1,128 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Image field -> JSON field holding its generated variants, per model.
+VARIANT_FIELDS = {
+    'core.course': ('image', 'image_variants'),
+    'users.user': ('avatar', 'avatar_variants'),
+}
+FORMAT_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_WORKERS', 2), thread_name_prefix='image-derivatives'
+        )
+    return _executor
+
+
+def variant_name(name, variant, image_format):
+    root, _ = os.path.splitext(name)
+    return f'{root}_{variant}.{FORMAT_EXTENSIONS[image_format]}'
+
+
+def variant_url(instance, variant, request=None):
+    """URL of a generated variant, or of the original while variants are pending."""
+    image_field, variants_field = VARIANT_FIELDS[instance._meta.label_lower]
+    image = getattr(instance, image_field)
+    if not image:
+        return None
+    variants = getattr(instance, variants_field) or {}
+    if variants.get('source') == image.name and variant in variants:
+        url = default_storage.url(variants[variant])
+    else:
+        url = image.url
+    return request.build_absolute_uri(url) if request else url
+
+
+def needs_derivatives(instance):
+    image_field, variants_field = VARIANT_FIELDS[instance._meta.label_lower]
+    image = getattr(instance, image_field)
+    return bool(image) and (getattr(instance, variants_field) or {}).get('source') != image.name
+
+
+def schedule_derivatives(model, pk, source_name):
+    """Queue variant generation for after the current transaction commits."""
+    label = model._meta.label_lower
+    transaction.on_commit(lambda: _submit(label, pk, source_name))
+
+
+def _submit(label, pk, source_name):
+    if getattr(settings, 'IMAGE_DERIVATIVES_ASYNC', True):
+        get_executor().submit(_run_in_worker, label, pk, source_name)
+    else:
+        generate_derivatives(label, pk, source_name)
+
+
+def _run_in_worker(label, pk, source_name):
+    try:
+        generate_derivatives(label, pk, source_name)
+    except Exception:
+        logger.exception(f"Image derivatives failed for {label} {pk}")
+    finally:
+        connection.close()
+
+
+def render_variant(image, size, image_format):
+    from PIL import Image
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    if image_format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+        variant = variant.convert('RGB')
+    buffer = io.BytesIO()
+    variant.save(buffer, format=image_format, quality=getattr(settings, 'IMAGE_VARIANT_QUALITY', 80))
+    return buffer.getvalue()
+
+
+def generate_derivatives(label, pk, source_name):
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    image_field, variants_field = VARIANT_FIELDS[label]
+    image_format = getattr(settings, 'IMAGE_VARIANT_FORMAT', 'WEBP')
+    max_pixels = getattr(settings, 'IMAGE_MAX_PIXELS', 40_000_000)
+
+    with default_storage.open(source_name, 'rb') as source:
+        try:
+            image = Image.open(source)
+            width, height = image.size
+            if width * height > max_pixels:
+                raise Image.DecompressionBombError(f'{width}x{height} exceeds {max_pixels} pixels')
+            image.load()
+        except Image.DecompressionBombError as e:
+            logger.warning(f"Refusing to process {source_name}: {e}")
+            return None
+        except (UnidentifiedImageError, OSError) as e:
+            logger.warning(f"Skipping {source_name}, not a readable image: {e}")
+            return None
+        image = ImageOps.exif_transpose(image)
+
+    variants = {'source': source_name}
+    for variant, size in getattr(settings, 'IMAGE_VARIANTS', {'small': 160, 'medium': 480}).items():
+        name = variant_name(source_name, variant, image_format)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        variants[variant] = default_storage.save(name, ContentFile(render_variant(image, size, image_format)))
+
+    model = apps.get_model(label)
+    # Skip the write if the image was replaced while we were rendering. updated_at moves
+    # the ETags on, so clients drop the responses that still point at the original.
+    updated = model.objects.filter(pk=pk, **{image_field: source_name}).update(
+        **{variants_field: variants, 'updated_at': timezone.now()}
+    )
+    if updated and label == 'users.user':
+        from users.authentication import invalidate_user
+        invalidate_user(pk)
+    return variants
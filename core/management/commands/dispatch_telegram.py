@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from core.telegram import dispatch_batch, get_limiter
+
+
+class Command(BaseCommand):
+    help = 'Relay queued messages to Telegram in batches (runs until stopped unless --once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send at most one batch and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the outbox is empty')
+
+    def handle(self, *args, **options):
+        # One limiter for the whole run, so per-chat spacing and retry_after survive between batches.
+        limiter = get_limiter()
+        while True:
+            sent = dispatch_batch(limiter=limiter)
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS(f'Dispatched {sent} deliveries'))
+                return
+            if not sent:
+                time.sleep(options['interval'])
@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from core.certificates import claim_job, run_issue_job
+
+
+class Command(BaseCommand):
+    help = 'Render queued certificate issue jobs, resuming abandoned ones (runs until stopped unless --once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due now and exit')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when no job is due')
+
+    def handle(self, *args, **options):
+        ran = 0
+        while True:
+            job = claim_job()
+            if job is not None:
+                run_issue_job(job.pk)
+                ran += 1
+                continue
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS(f'Ran {ran} certificate jobs'))
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from core.models import Course, Lesson
+from core.search import rebuild_index, rebuild_message_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SQLite full-text index for courses, lessons and messages (Postgres maintains its own)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        for model in (Course, Lesson):
+            rebuild_index(model, using=options['database'])
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt search index for {model._meta.verbose_name_plural}'))
+        rebuild_message_index(using=options['database'])
+        self.stdout.write(self.style.SUCCESS('Rebuilt search index for messages'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from core.conversations import attach_orphan_messages, refresh_conversations
+from core.models import Conversation
+
+
+class Command(BaseCommand):
+    help = 'File orphaned messages under their conversation and recompute last message and unread counts'
+
+    def handle(self, *args, **options):
+        attached = attach_orphan_messages()
+        updated = refresh_conversations(Conversation.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'Attached messages to {len(attached)} conversations, recomputed {updated} conversations'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from core.counters import refresh_course_counters
+from core.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized counters on every course in one set-based UPDATE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Only recompute the given course id (repeatable)')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+        if options['courses']:
+            courses = courses.filter(pk__in=options['courses'])
+        updated = refresh_course_counters(courses)
+        self.stdout.write(self.style.SUCCESS(f'Recomputed counters for {updated} courses'))
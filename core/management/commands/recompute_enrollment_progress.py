@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from core.counters import refresh_enrollment_progress
+from core.models import Enrollment
+
+
+class Command(BaseCommand):
+    help = 'Recompute Enrollment.progress from completed lesson progress in one set-based UPDATE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Only recompute enrollments of the given course id (repeatable)')
+
+    def handle(self, *args, **options):
+        enrollments = Enrollment.objects.all()
+        if options['courses']:
+            enrollments = enrollments.filter(course__in=options['courses'])
+        updated = refresh_enrollment_progress(enrollments)
+        self.stdout.write(self.style.SUCCESS(f'Recomputed progress for {updated} enrollments'))
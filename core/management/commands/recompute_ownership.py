@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.ownership import refresh_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized course and teacher keys on lessons, assignments, submissions and progress'
+
+    def handle(self, *args, **options):
+        for name, updated in refresh_all().items():
+            self.stdout.write(self.style.SUCCESS(f'Recomputed {updated} {name}'))
@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from core.analytics import refresh
+
+
+class Command(BaseCommand):
+    help = 'Fold rows changed since the last run into the analytics rollups (runs until stopped unless --once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Refresh once and exit')
+        parser.add_argument('--full', action='store_true', help='Rebuild every rollup from scratch (implies --once)')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between refreshes')
+
+    def handle(self, *args, **options):
+        while True:
+            rewritten = refresh(full=options['full'])
+            if options['once'] or options['full']:
+                if rewritten is None:
+                    self.stdout.write(self.style.WARNING('Another refresh is running'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'Rewrote {rewritten} rollup buckets'))
+                return
+            time.sleep(options['interval'])
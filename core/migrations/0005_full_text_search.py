@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:41
+
+from django.db import migrations
+
+DOCUMENTS = {
+    'core_course': (('title', 'A'), ('category', 'B'), ('description', 'C')),
+    'core_lesson': (('title', 'A'), ('content', 'B')),
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, columns in DOCUMENTS.items():
+        if vendor == 'postgresql':
+            document = ' || '.join(
+                f"setweight(to_tsvector('simple'::regconfig, coalesce({column}, '')), '{weight}')"
+                for column, weight in columns
+            )
+            schema_editor.execute(
+                f'ALTER TABLE {table} ADD COLUMN search_vector tsvector '
+                f'GENERATED ALWAYS AS ({document}) STORED'
+            )
+            schema_editor.execute(f'CREATE INDEX {table}_search_idx ON {table} USING GIN (search_vector)')
+        elif vendor == 'sqlite':
+            names = ', '.join(column for column, _ in columns)
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table}_fts USING fts5({names}, tokenize='unicode61 remove_diacritics 2')"
+            )
+            schema_editor.execute(f'INSERT INTO {table}_fts (rowid, {names}) SELECT id, {names} FROM {table}')
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in DOCUMENTS:
+        if vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {table}_search_idx')
+            schema_editor.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
+        elif vendor == 'sqlite':
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:47
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Course = apps.get_model('core', 'Course')
+    Module = apps.get_model('core', 'Module')
+    Lesson = apps.get_model('core', 'Lesson')
+    Enrollment = apps.get_model('core', 'Enrollment')
+    Certificate = apps.get_model('core', 'Certificate')
+
+    def scalar(queryset, aggregate):
+        subquery = queryset.order_by().values('course_ref').annotate(value=aggregate).values('value')
+        return Coalesce(Subquery(subquery, output_field=IntegerField()), 0)
+
+    lessons = Lesson.objects.filter(
+        module__course=OuterRef('pk'), is_active=True, module__is_active=True
+    ).annotate(course_ref=F('module__course'))
+    Course.objects.update(
+        module_count=scalar(
+            Module.objects.filter(course=OuterRef('pk'), is_active=True).annotate(course_ref=F('course')),
+            Count('pk')
+        ),
+        lesson_count=scalar(lessons, Count('pk')),
+        total_duration=scalar(lessons, Sum('duration')),
+        enrollment_count=scalar(
+            Enrollment.objects.filter(course=OuterRef('pk')).annotate(course_ref=F('course')), Count('pk')
+        ),
+        certificate_count=scalar(
+            Certificate.objects.filter(course=OuterRef('pk')).annotate(course_ref=F('course')), Count('pk')
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_catalog_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='certificate_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Certificates'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Enrollments'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='lesson_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Active Lessons'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='module_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Active Modules'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='total_duration',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total Duration (minutes)'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
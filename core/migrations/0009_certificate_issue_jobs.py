@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='file',
+            field=models.FileField(blank=True, null=True, upload_to='certificates/', verbose_name='Certificate File'),
+        ),
+        migrations.CreateModel(
+            name='CertificateIssueJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_progress', models.PositiveSmallIntegerField(default=100, verbose_name='Minimum Progress (%)')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='Status')),
+                ('issued', models.PositiveIntegerField(default=0, verbose_name='Certificates Issued')),
+                ('rendered', models.PositiveIntegerField(default=0, verbose_name='Certificates Rendered')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='certificate_jobs', to='core.course', verbose_name='Course')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='certificate_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Requested By')),
+            ],
+            options={
+                'verbose_name': 'Certificate Issue Job',
+                'verbose_name_plural': 'Certificate Issue Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
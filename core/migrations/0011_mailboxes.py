@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_mailboxes(apps, schema_editor):
+    ConversationMember = apps.get_model('core', 'ConversationMember')
+    Mailbox = apps.get_model('core', 'Mailbox')
+    totals = ConversationMember.objects.order_by().values('user').annotate(total=Sum('unread_count'))
+    Mailbox.objects.bulk_create(
+        [Mailbox(user_id=row['user'], unread_count=row['total'] or 0) for row in totals], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_conversations'),
+        ('users', '0003_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Mailbox',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='mailbox', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+                ('unread_count', models.PositiveIntegerField(default=0, verbose_name='Unread Messages')),
+            ],
+            options={
+                'verbose_name': 'Mailbox',
+                'verbose_name_plural': 'Mailboxes',
+            },
+        ),
+        migrations.RunPython(backfill_mailboxes, migrations.RunPython.noop),
+    ]
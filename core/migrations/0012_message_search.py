@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:21
+
+from django.db import migrations
+
+
+def create_message_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        # btree_gin lets one GIN index hold the participant id next to the document.
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+        schema_editor.execute(
+            "ALTER TABLE core_message ADD COLUMN search_vector tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple'::regconfig, coalesce(content, ''))) STORED"
+        )
+        for column in ('sender_id', 'receiver_id'):
+            schema_editor.execute(
+                f'CREATE INDEX core_message_{column}_search_idx ON core_message USING GIN ({column}, search_vector)'
+            )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE core_message_fts USING fts5(content, participants, "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO core_message_fts (rowid, content, participants) "
+            "SELECT id, content, 'u' || sender_id || ' u' || receiver_id FROM core_message"
+        )
+
+
+def drop_message_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for column in ('sender_id', 'receiver_id'):
+            schema_editor.execute(f'DROP INDEX IF EXISTS core_message_{column}_search_idx')
+        schema_editor.execute('ALTER TABLE core_message DROP COLUMN IF EXISTS search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS core_message_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_mailboxes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_message_index, drop_message_index),
+    ]
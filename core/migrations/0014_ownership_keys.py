@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_ownership(apps, schema_editor):
+    Module = apps.get_model('core', 'Module')
+    # Parents first: each level copies from the one above it.
+    levels = [
+        ('Lesson', Module, 'module', 'course', 'course__teacher'),
+        ('Assignment', apps.get_model('core', 'Lesson'), 'lesson', 'course', 'teacher'),
+        ('Submission', apps.get_model('core', 'Assignment'), 'assignment', 'course', 'teacher'),
+        ('LessonProgress', apps.get_model('core', 'Lesson'), 'lesson', 'course', 'teacher'),
+    ]
+    for name, parent_model, field, course, teacher in levels:
+        parent = parent_model.objects.filter(pk=OuterRef(field))
+        apps.get_model('core', name).objects.update(
+            course=Subquery(parent.values(course)[:1]),
+            teacher=Subquery(parent.values(teacher)[:1]),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_telegram_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='course',
+            field=models.ForeignKey(null=True, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='core.course', verbose_name='Course'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='teacher',
+            field=models.ForeignKey(db_index=False, null=True, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Teacher'),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='course',
+            field=models.ForeignKey(null=True, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='core.course', verbose_name='Course'),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='teacher',
+            field=models.ForeignKey(db_index=False, null=True, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Teacher'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='course',
+            field=models.ForeignKey(null=True, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='core.course', verbose_name='Course'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='teacher',
+            field=models.ForeignKey(db_index=False, null=True, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Teacher'),
+        ),
+        migrations.AddField(
+            model_name='lessonprogress',
+            name='course',
+            field=models.ForeignKey(null=True, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='lesson_progresses', to='core.course', verbose_name='Course'),
+        ),
+        migrations.AddField(
+            model_name='lessonprogress',
+            name='teacher',
+            field=models.ForeignKey(db_index=False, null=True, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Teacher'),
+        ),
+        migrations.RunPython(backfill_ownership, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separate from the backfill: Postgres refuses to alter a table with pending FK checks.
+
+    dependencies = [
+        ('core', '0014_ownership_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lesson',
+            name='course',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='core.course', verbose_name='Course'),
+        ),
+        migrations.AlterField(
+            model_name='lesson',
+            name='teacher',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Teacher'),
+        ),
+        migrations.AlterField(
+            model_name='assignment',
+            name='course',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='core.course', verbose_name='Course'),
+        ),
+        migrations.AlterField(
+            model_name='assignment',
+            name='teacher',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Teacher'),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='course',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='core.course', verbose_name='Course'),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='teacher',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Teacher'),
+        ),
+        migrations.AlterField(
+            model_name='lessonprogress',
+            name='course',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='lesson_progresses', to='core.course', verbose_name='Course'),
+        ),
+        migrations.AlterField(
+            model_name='lessonprogress',
+            name='teacher',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Teacher'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['teacher', 'course'], name='lesson_teacher_course_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['teacher', 'course'], name='assignment_teacher_course_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['teacher', '-submission_date', '-id'], name='submission_teacher_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['course', 'student'], name='submission_course_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonprogress',
+            index=models.Index(fields=['teacher', '-completion_date', '-id'], name='progress_teacher_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonprogress',
+            index=models.Index(fields=['course', 'user', 'status'], name='progress_course_user_idx'),
+        ),
+    ]
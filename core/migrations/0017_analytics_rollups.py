@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_grading_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4, verbose_name='Granularity')),
+                ('bucket', models.DateTimeField(verbose_name='Bucket Start')),
+                ('enrollments', models.PositiveIntegerField(default=0, verbose_name='Enrollments')),
+                ('lessons_completed', models.PositiveIntegerField(default=0, verbose_name='Lessons Completed')),
+                ('time_spent', models.PositiveBigIntegerField(default=0, verbose_name='Time Spent (minutes)')),
+                ('time_spent_samples', models.PositiveIntegerField(default=0, verbose_name='Completions With Time Spent')),
+                ('submissions', models.PositiveIntegerField(default=0, verbose_name='Submissions')),
+                ('submissions_on_time', models.PositiveIntegerField(default=0, verbose_name='Submissions On Time')),
+                ('active_students', models.PositiveIntegerField(default=0, verbose_name='Active Students')),
+                ('stale', models.BooleanField(default=False, verbose_name='Stale')),
+            ],
+            options={
+                'verbose_name': 'Analytics Rollup',
+                'verbose_name_plural': 'Analytics Rollups',
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalyticsWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Name')),
+                ('value', models.DateTimeField(blank=True, null=True, verbose_name='Processed Through')),
+            ],
+            options={
+                'verbose_name': 'Analytics Watermark',
+                'verbose_name_plural': 'Analytics Watermarks',
+            },
+        ),
+        migrations.AddField(
+            model_name='lessonprogress',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Updated At'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Updated At'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonprogress',
+            index=models.Index(fields=['updated_at'], name='progress_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['updated_at'], name='submission_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='analyticsrollup',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='core.course', verbose_name='Course'),
+        ),
+        migrations.AddField(
+            model_name='analyticsrollup',
+            name='module',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='core.module', verbose_name='Module'),
+        ),
+        migrations.AddIndex(
+            model_name='analyticsrollup',
+            index=models.Index(fields=['course', 'granularity', 'bucket'], name='rollup_course_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='analyticsrollup',
+            index=models.Index(condition=models.Q(('stale', True)), fields=['granularity', 'bucket'], name='rollup_stale_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='analyticsrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('module', None)), fields=('course', 'granularity', 'bucket'), name='rollup_course_bucket_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='analyticsrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('module__isnull', False)), fields=('course', 'module', 'granularity', 'bucket'), name='rollup_module_bucket_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificateissuejob',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Locked Until'),
+        ),
+    ]
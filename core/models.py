@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from .validators import validate_file_size, validate_image_file_size
@@ -7,6 +8,12 @@ from .validators import validate_file_size, validate_image_file_size
 LESSON_TYPES = [('video', 'Video'), ('text', 'Text')]
 SUBMISSION_STATUSES = [('not_looked', 'Not Looked'), ('in_progress', 'In Progress'), ('looked', 'Looked')]
 PROGRESS_STATUSES = [('not_started', 'Not Started'), ('in_progress', 'In Progress'), ('completed', 'Completed')]
+JOB_STATUSES = [('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')]
+DELIVERY_STATUSES = [('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')]
+ROLLUP_GRANULARITIES = [('hour', 'Hour'), ('day', 'Day')]
+# Fields that feed the course counters and enrollment progress (core.counters).
+MODULE_COUNTED_FIELDS = ('course_id', 'is_active')
+LESSON_COUNTED_FIELDS = ('course_id', 'module_id', 'is_active', 'duration')
 
 class Course(models.Model):
     title = models.CharField("Course Title", max_length=255)
@@ -16,14 +23,31 @@ class Course(models.Model):
     level = models.CharField("Level", max_length=50, blank=True, null=True)
     image = models.ImageField("Course Image", upload_to='course_images/', blank=True, null=True,
                               validators=[validate_image_file_size])
+    image_variants = models.JSONField("Image Variants", default=dict, blank=True, editable=False)
     accessibility_features = models.TextField("Accessibility Features", blank=True, null=True)
     is_active = models.BooleanField("Active", default=True)
     created_at = models.DateTimeField("Created At", auto_now_add=True)
+    updated_at = models.DateTimeField("Updated At", auto_now=True)
+
+    # Denormalized catalog counters, maintained by core.signals (see core.counters).
+    module_count = models.PositiveIntegerField("Active Modules", default=0, editable=False)
+    lesson_count = models.PositiveIntegerField("Active Lessons", default=0, editable=False)
+    total_duration = models.PositiveIntegerField("Total Duration (minutes)", default=0, editable=False)
+    enrollment_count = models.PositiveIntegerField("Enrollments", default=0, editable=False)
+    certificate_count = models.PositiveIntegerField("Certificates", default=0, editable=False)
 
     class Meta:
         ordering = ['created_at']
         verbose_name = "Course"
         verbose_name_plural = "Courses"
+        indexes = [models.Index(fields=['created_at', 'id'], name='course_created_id_idx')]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets core.signals push a teacher change down to the denormalized copies.
+        instance._loaded_teacher_id = instance.__dict__.get('teacher_id')
+        return instance
 
     def clean(self):
         super().clean()
@@ -41,11 +65,13 @@ class Module(models.Model):
     start_date = models.DateField("Start Date", blank=True, null=True)
     end_date = models.DateField("End Date", blank=True, null=True)
     is_active = models.BooleanField("Active", default=True)
+    updated_at = models.DateTimeField("Updated At", auto_now=True)
 
     class Meta:
         ordering = ['order']
         verbose_name = "Module"
         verbose_name_plural = "Modules"
+        indexes = [models.Index(fields=['order', 'id'], name='module_order_id_idx')]
         unique_together = ('course', 'order')
 
     def clean(self):
@@ -56,50 +82,107 @@ class Module(models.Model):
     def __str__(self):
         return f'{self.course} - {self.order}. {self.title}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets core.signals skip counter refreshes for edits that cannot change them.
+        instance._loaded_counted = {f: instance.__dict__[f] for f in MODULE_COUNTED_FIELDS if f in instance.__dict__}
+        return instance
+
 class Lesson(models.Model):
     title = models.CharField("Lesson Title", max_length=255)
     content = models.TextField("Content")
     module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='lessons', verbose_name="Module")
+    # Copies of the owning course and its teacher (core.ownership), so teacher-scoped
+    # queries filter this table alone.
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lessons', editable=False,
+                               verbose_name="Course")
+    teacher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+',
+                                editable=False, db_index=False, verbose_name="Teacher")
     order = models.PositiveSmallIntegerField("Order", default=1, validators=[MinValueValidator(1)])
     lesson_type = models.CharField("Lesson Type", max_length=10, choices=LESSON_TYPES, default='text')
     duration = models.IntegerField("Duration (minutes)", blank=True, null=True)
     accessibility_features = models.TextField("Accessibility Features", blank=True, null=True)
     is_active = models.BooleanField("Active", default=True)
+    updated_at = models.DateTimeField("Updated At", auto_now=True)
 
     class Meta:
         ordering = ['order']
         verbose_name = "Lesson"
         verbose_name_plural = "Lessons"
+        indexes = [
+            models.Index(fields=['order', 'id'], name='lesson_order_id_idx'),
+            models.Index(fields=['teacher', 'course'], name='lesson_teacher_course_idx'),
+        ]
         unique_together = ('module', 'order')
 
     def __str__(self):
         return f'{self.module} - {self.order}. {self.title}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_counted = {f: instance.__dict__[f] for f in LESSON_COUNTED_FIELDS if f in instance.__dict__}
+        return instance
+
 class Assignment(models.Model):
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='assignments', verbose_name="Lesson")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='assignments', editable=False,
+                               verbose_name="Course")
+    teacher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+',
+                                editable=False, db_index=False, verbose_name="Teacher")
     title = models.CharField("Assignment Title", max_length=255)
     description = models.TextField("Assignment Description")
     due_date = models.DateField("Due Date", blank=True, null=True)
     is_active = models.BooleanField("Active", default=True)
+    updated_at = models.DateTimeField("Updated At", auto_now=True)
 
     class Meta:
         verbose_name = "Assignment"
         verbose_name_plural = "Assignments"
+        indexes = [
+            models.Index(fields=['due_date', 'id'], name='assignment_due_id_idx'),
+            models.Index(fields=['teacher', 'course'], name='assignment_teacher_course_idx'),
+        ]
 
     def __str__(self):
         return f'{self.lesson} - {self.title} ({self.due_date})'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets core.signals spot due date changes, which move submissions in or out of on time.
+        instance._loaded_due_date = instance.__dict__.get('due_date')
+        return instance
+
 class Submission(models.Model):
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='submissions', verbose_name="Assignment")
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='submissions', verbose_name="Student")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='submissions', editable=False,
+                               verbose_name="Course")
+    teacher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+',
+                                editable=False, db_index=False, verbose_name="Teacher")
     submitted_file = models.FileField("Submitted File", upload_to='submissions/', validators=[validate_file_size])
     submission_date = models.DateTimeField("Submission Date", auto_now_add=True)
     status = models.CharField("Submission Status", max_length=15, choices=SUBMISSION_STATUSES, default='not_looked')
-    
+    # Grading-queue lease (core.grading): another grader can take it over once it lapses.
+    claimed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='claimed_submissions', verbose_name="Claimed By")
+    claimed_until = models.DateTimeField("Claimed Until", blank=True, null=True)
+    updated_at = models.DateTimeField("Updated At", auto_now=True)
+
     class Meta:
         ordering = ['-submission_date']
         verbose_name = "Submission"
         verbose_name_plural = "Submissions"
+        indexes = [
+            models.Index(fields=['submission_date', 'id'], name='submission_date_id_idx'),
+            models.Index(fields=['teacher', '-submission_date', '-id'], name='submission_teacher_date_idx'),
+            models.Index(fields=['course', 'student'], name='submission_course_student_idx'),
+            models.Index(fields=['course', 'status', 'submission_date'], name='submission_queue_idx'),
+            models.Index(fields=['teacher', 'status', 'submission_date'], name='submission_teacher_queue_idx'),
+            models.Index(fields=['updated_at'], name='submission_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Submission {self.id} is {self.status}"
@@ -115,6 +198,7 @@ class Enrollment(models.Model):
         unique_together = ('user', 'course')
         verbose_name = "Enrollment"
         verbose_name_plural = "Enrollments"
+        indexes = [models.Index(fields=['enrollment_date', 'id'], name='enrollment_date_id_idx')]
 
     def __str__(self):
         return f"{self.user} enrolled in {self.course}"
@@ -122,34 +206,128 @@ class Enrollment(models.Model):
 class LessonProgress(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='lesson_progresses', verbose_name="User")
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='progresses', verbose_name="Lesson")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lesson_progresses', editable=False,
+                               verbose_name="Course")
+    teacher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+',
+                                editable=False, db_index=False, verbose_name="Teacher")
     status = models.CharField("Progress Status", max_length=15, choices=PROGRESS_STATUSES, default='not_started')
     completion_date = models.DateTimeField("Completion Date", blank=True, null=True)
     time_spent = models.PositiveSmallIntegerField("Time Spent (minutes)", blank=True, null=True)
+    updated_at = models.DateTimeField("Updated At", auto_now=True)
 
     class Meta:
         unique_together = ('user', 'lesson')
         verbose_name = "Lesson Progress"
         verbose_name_plural = "Lesson Progresses"
+        indexes = [
+            models.Index(fields=['completion_date', 'id'], name='progress_completion_id_idx'),
+            models.Index(fields=['teacher', '-completion_date', '-id'], name='progress_teacher_date_idx'),
+            models.Index(fields=['course', 'user', 'status'], name='progress_course_user_idx'),
+            models.Index(fields=['updated_at'], name='progress_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} progress on {self.lesson}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets core.signals spot status transitions without re-reading the row.
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_completion_date = instance.__dict__.get('completion_date')
+        return instance
+
 class Certificate(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='certificates', verbose_name="User")
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='certificates', verbose_name="Course")
     issue_date = models.DateTimeField("Issue Date", auto_now_add=True)
     certificate_number = models.CharField("Certificate Number", max_length=100, unique=True)
     accessibility_features = models.TextField("Accessibility Features", blank=True, null=True)
+    file = models.FileField("Certificate File", upload_to='certificates/', blank=True, null=True)
 
     class Meta:
         unique_together = ('user', 'course')
         verbose_name = "Certificate"
         verbose_name_plural = "Certificates"
+        indexes = [models.Index(fields=['issue_date', 'id'], name='certificate_issue_id_idx')]
 
     def __str__(self):
         return f"Certificate {self.certificate_number}"
 
+class CertificateIssueJob(models.Model):
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='certificate_jobs', verbose_name="Course")
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='certificate_jobs', verbose_name="Requested By")
+    min_progress = models.PositiveSmallIntegerField("Minimum Progress (%)", default=100)
+    status = models.CharField("Status", max_length=10, choices=JOB_STATUSES, default='pending')
+    issued = models.PositiveIntegerField("Certificates Issued", default=0)
+    rendered = models.PositiveIntegerField("Certificates Rendered", default=0)
+    error = models.TextField("Error", blank=True, default='')
+    locked_until = models.DateTimeField("Locked Until", null=True, blank=True)
+    created_at = models.DateTimeField("Created At", auto_now_add=True)
+    finished_at = models.DateTimeField("Finished At", blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Certificate Issue Job"
+        verbose_name_plural = "Certificate Issue Jobs"
+
+    def __str__(self):
+        return f"Certificate job {self.id} for {self.course} ({self.status})"
+
+class Conversation(models.Model):
+    """A pair of users; ``user_low`` always holds the smaller id."""
+    user_low = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', verbose_name="User (low id)")
+    user_high = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', verbose_name="User (high id)")
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Last Message")
+    last_message_at = models.DateTimeField("Last Message At", null=True, blank=True)
+    created_at = models.DateTimeField("Created At", auto_now_add=True)
+
+    class Meta:
+        ordering = ['-last_message_at']
+        verbose_name = "Conversation"
+        verbose_name_plural = "Conversations"
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='conversation_pair_unique'),
+            models.CheckConstraint(condition=models.Q(user_low__lt=models.F('user_high')), name='conversation_pair_ordered'),
+        ]
+
+    def __str__(self):
+        return f"Conversation between {self.user_low_id} and {self.user_high_id}"
+
+class ConversationMember(models.Model):
+    """One participant's view of a conversation: the inbox row and its unread count."""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='members', verbose_name="Conversation")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversation_memberships', verbose_name="User")
+    peer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', verbose_name="Peer")
+    unread_count = models.PositiveIntegerField("Unread Messages", default=0)
+    last_message_at = models.DateTimeField("Last Message At", null=True, blank=True)
+
+    class Meta:
+        ordering = ['-last_message_at']
+        verbose_name = "Conversation Member"
+        verbose_name_plural = "Conversation Members"
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='conversation_member_unique'),
+        ]
+        indexes = [models.Index(fields=['user', '-last_message_at', '-id'], name='conversation_inbox_idx')]
+
+    def __str__(self):
+        return f"{self.user} in conversation {self.conversation_id}"
+
+class Mailbox(models.Model):
+    """Per-user message totals, kept in step with ``ConversationMember`` on write."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='mailbox', verbose_name="User")
+    unread_count = models.PositiveIntegerField("Unread Messages", default=0)
+
+    class Meta:
+        verbose_name = "Mailbox"
+        verbose_name_plural = "Mailboxes"
+
+    def __str__(self):
+        return f"Mailbox of {self.user}"
+
 class Message(models.Model):
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, null=True, blank=True, related_name='messages', verbose_name="Conversation")
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='sent_messages', on_delete=models.CASCADE, verbose_name="Sender")
     receiver = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='received_messages', on_delete=models.CASCADE, verbose_name="Receiver")
     content = models.TextField("Message Content")
@@ -162,6 +340,88 @@ class Message(models.Model):
         ordering = ['timestamp']
         verbose_name = "Message"
         verbose_name_plural = "Messages"
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='message_timestamp_id_idx'),
+            models.Index(fields=['conversation', 'timestamp', 'id'], name='message_conversation_idx'),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender} to {self.receiver}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets core.signals keep the conversation index in step with edits.
+        instance._loaded_receiver_id = instance.__dict__.get('receiver_id')
+        instance._loaded_read_status = instance.__dict__.get('read_status')
+        return instance
+
+class TelegramDelivery(models.Model):
+    """Outbox row for a message to relay to the receiver's Telegram chat."""
+    message = models.OneToOneField(Message, on_delete=models.CASCADE, related_name='telegram_delivery', verbose_name="Message")
+    chat_id = models.CharField("Chat ID", max_length=64)
+    status = models.CharField("Status", max_length=10, choices=DELIVERY_STATUSES, default='pending')
+    attempts = models.PositiveSmallIntegerField("Attempts", default=0)
+    next_attempt_at = models.DateTimeField("Next Attempt At", default=timezone.now)
+    locked_until = models.DateTimeField("Locked Until", null=True, blank=True)
+    last_error = models.TextField("Last Error", blank=True)
+    created_at = models.DateTimeField("Created At", auto_now_add=True)
+    sent_at = models.DateTimeField("Sent At", null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        verbose_name = "Telegram Delivery"
+        verbose_name_plural = "Telegram Deliveries"
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='telegram_outbox_due_idx')]
+
+    def __str__(self):
+        return f"Telegram delivery of message {self.message_id} ({self.status})"
+
+class AnalyticsRollup(models.Model):
+    """
+    Activity of a course in one hour or day, kept by ``core.analytics``; ``module`` is
+    empty on the course-wide row. Counts are additive across buckets except
+    ``active_students``.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='rollups', verbose_name="Course")
+    module = models.ForeignKey(Module, on_delete=models.CASCADE, null=True, blank=True, related_name='rollups',
+                               verbose_name="Module")
+    granularity = models.CharField("Granularity", max_length=4, choices=ROLLUP_GRANULARITIES)
+    bucket = models.DateTimeField("Bucket Start")
+    enrollments = models.PositiveIntegerField("Enrollments", default=0)
+    lessons_completed = models.PositiveIntegerField("Lessons Completed", default=0)
+    time_spent = models.PositiveBigIntegerField("Time Spent (minutes)", default=0)
+    time_spent_samples = models.PositiveIntegerField("Completions With Time Spent", default=0)
+    submissions = models.PositiveIntegerField("Submissions", default=0)
+    submissions_on_time = models.PositiveIntegerField("Submissions On Time", default=0)
+    active_students = models.PositiveIntegerField("Active Students", default=0)
+    stale = models.BooleanField("Stale", default=False)
+
+    class Meta:
+        verbose_name = "Analytics Rollup"
+        verbose_name_plural = "Analytics Rollups"
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'granularity', 'bucket'], condition=models.Q(module=None),
+                                    name='rollup_course_bucket_uniq'),
+            models.UniqueConstraint(fields=['course', 'module', 'granularity', 'bucket'],
+                                    condition=models.Q(module__isnull=False), name='rollup_module_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['course', 'granularity', 'bucket'], name='rollup_course_idx'),
+            models.Index(fields=['granularity', 'bucket'], condition=models.Q(stale=True), name='rollup_stale_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course} {self.granularity} {self.bucket:%Y-%m-%d %H:%M}"
+
+class AnalyticsWatermark(models.Model):
+    """How far ``core.analytics`` has folded raw rows into the rollups."""
+    name = models.CharField("Name", max_length=50, unique=True)
+    value = models.DateTimeField("Processed Through", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Analytics Watermark"
+        verbose_name_plural = "Analytics Watermarks"
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
@@ -0,0 +1,63 @@
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Now
+from .models import Module, Lesson, Assignment, Submission, LessonProgress
+
+# Each model with denormalized ``course``/``teacher`` and the relation they are copied from.
+PARENTS = {
+    Lesson: (Module, 'module', 'course', 'course__teacher'),
+    Assignment: (Lesson, 'lesson', 'course', 'teacher'),
+    Submission: (Assignment, 'assignment', 'course', 'teacher'),
+    LessonProgress: (Lesson, 'lesson', 'course', 'teacher'),
+}
+OWNED_MODELS = tuple(PARENTS)
+
+
+def owner_of(instance):
+    """``(course_id, teacher_id)`` for an unsaved or moved row, from its parent."""
+    parent_model, field, course, teacher = PARENTS[type(instance)]
+    descriptor = getattr(type(instance), field)
+    parent_id = getattr(instance, f'{field}_id')
+    if descriptor.is_cached(instance) and getattr(instance, field).pk == parent_id:
+        parent = getattr(instance, field)
+        if parent_model is not Module:
+            return parent.course_id, parent.teacher_id
+        if Module.course.is_cached(parent) and parent.course.pk == parent.course_id:
+            return parent.course_id, parent.course.teacher_id
+    return parent_model.objects.filter(pk=parent_id).values_list(course, teacher).first() or (None, None)
+
+
+def refresh_ownership(queryset):
+    """
+    Re-copy ``course``/``teacher`` from each row's parent in one UPDATE, bumping
+    ``updated_at`` so the analytics rollups pick the rows up under their new course.
+    """
+    parent_model, field, course, teacher = PARENTS[queryset.model]
+    parent = parent_model.objects.filter(pk=OuterRef(field))
+    return queryset.update(
+        course=Subquery(parent.values(course)[:1]),
+        teacher=Subquery(parent.values(teacher)[:1]),
+        updated_at=Now(),
+    )
+
+
+def refresh_lesson_tree(lessons):
+    """Propagate the copies on ``lessons`` (ids or a queryset) to everything below them."""
+    refresh_ownership(Assignment.objects.filter(lesson__in=lessons))
+    refresh_ownership(Submission.objects.filter(assignment__lesson__in=lessons))
+    refresh_ownership(LessonProgress.objects.filter(lesson__in=lessons))
+
+
+def refresh_module_tree(module_id):
+    lessons = Lesson.objects.filter(module=module_id)
+    refresh_ownership(lessons)
+    refresh_lesson_tree(lessons.values('pk'))
+
+
+def reassign_teacher(course_id, teacher_id):
+    for model in OWNED_MODELS:
+        model.objects.filter(course=course_id).exclude(teacher=teacher_id).update(teacher=teacher_id)
+
+
+def refresh_all():
+    """Recompute every copy, parents first; for repairs after writes that skipped the signals."""
+    return {model._meta.verbose_name_plural: refresh_ownership(model.objects.all()) for model in OWNED_MODELS}
@@ -0,0 +1,269 @@
+import json
+from django.core import signing
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+def estimate_count(queryset):
+    """Planner row estimate on Postgres, exact COUNT(*) everywhere else."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seek pagination over the view's ordering plus ``id``.
+
+    Cursors are signed, opaque tokens holding the sort key of the boundary row,
+    so every page is an index range scan instead of ``COUNT(*)`` + ``OFFSET``.
+    ``NULL`` sorts as the greatest value in both directions (the Postgres default),
+    which keeps the ordering compatible with plain b-tree indexes.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    signing_salt = 'core.pagination.keyset'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.key = self.get_key(queryset)
+        self.count = self.get_count(queryset, request)
+
+        reverse, values = self.decode_cursor(request)
+        key = [(name, not desc, null) for name, desc, null in self.key] if reverse else self.key
+        queryset = queryset.order_by(*self.get_order_by(key))
+        if values is not None:
+            queryset = queryset.filter(self.get_after_filter(key, values))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else values is not None
+        self.has_previous = values is not None if not reverse else has_more
+        self.first_values = self.get_values(rows[0]) if rows else None
+        self.last_values = self.get_values(rows[-1]) if rows else None
+        if not rows and values is not None:
+            # Empty page past the boundary: keep the caller's position for the way back.
+            self.first_values = self.last_values = values
+        return rows
+
+    def get_paginated_response(self, data):
+        response = {}
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size) if self.max_page_size else size
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param, 'none')
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by)
+        if not ordering and queryset.query.default_ordering:
+            ordering = list(queryset.model._meta.ordering)
+        return ordering
+
+    def can_paginate(self, queryset):
+        """Whether every ordering term is a model field; annotations such as a search rank cannot be seeked on."""
+        return all(
+            isinstance(item, str) and self.resolve_field(queryset.model, item.lstrip('-')) is not None
+            for item in self.get_ordering(queryset)
+        )
+
+    def get_key(self, queryset):
+        model = queryset.model
+        ordering = [o for o in self.get_ordering(queryset) if isinstance(o, str)]
+
+        key = []
+        pk_desc = None
+        for item in ordering:
+            desc = item.startswith('-')
+            name = item.lstrip('-')
+            field = self.resolve_field(model, name)
+            if field is None:
+                continue
+            if field.primary_key:
+                pk_desc = desc
+                break
+            key.append((name, desc, field.null))
+        if pk_desc is None:
+            pk_desc = key[-1][1] if key else False
+        key.append(('pk', pk_desc, False))
+        return key
+
+    def resolve_field(self, model, path):
+        if path == 'pk':
+            return model._meta.pk
+        field = None
+        for part in path.split('__'):
+            if model is None:
+                return None
+            try:
+                field = model._meta.get_field(part)
+            except Exception:
+                return None
+            model = field.related_model if field.is_relation else None
+        return None if field.is_relation else field
+
+    def get_order_by(self, key):
+        order_by = []
+        for name, desc, null in key:
+            if not null:
+                order_by.append(f'-{name}' if desc else name)
+            elif desc:
+                order_by.append(F(name).desc(nulls_first=True))
+            else:
+                order_by.append(F(name).asc(nulls_last=True))
+        return order_by
+
+    def get_after_filter(self, key, values):
+        terms = []
+        prefix = Q()
+        for (name, desc, null), value in zip(key, values):
+            if value is None:
+                term = Q(**{f'{name}__isnull': False}) if desc else None
+                equal = Q(**{f'{name}__isnull': True})
+            else:
+                term = Q(**{f'{name}__lt' if desc else f'{name}__gt': value})
+                if null and not desc:
+                    term |= Q(**{f'{name}__isnull': True})
+                equal = Q(**{name: value})
+            if term is not None:
+                terms.append(prefix & term)
+            prefix &= equal
+        if not terms:
+            return Q(pk__in=[])
+        condition = terms[0]
+        for term in terms[1:]:
+            condition |= term
+        return condition
+
+    def get_values(self, instance):
+        values = []
+        for name, _, _ in self.key:
+            value = instance
+            for part in name.split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, values, reverse):
+        payload = {
+            'k': [name for name, _, _ in self.key],
+            'v': [v.isoformat() if hasattr(v, 'isoformat') else v for v in values],
+            'r': reverse,
+        }
+        return signing.dumps(payload, salt=self.signing_salt, compress=True)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return False, None
+        try:
+            payload = signing.loads(token, salt=self.signing_salt)
+            if payload['k'] != [name for name, _, _ in self.key]:
+                raise ValueError
+            values = []
+            for (name, _, _), raw in zip(self.key, payload['v']):
+                field = self.resolve_field(self.model, name)
+                values.append(None if raw is None else field.to_python(raw))
+            return bool(payload['r']), values
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or self.last_values is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   self.encode_cursor(self.last_values, False))
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_values is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   self.encode_cursor(self.first_values, True))
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset mode.
+
+    ``?pagination=cursor`` (or any ``?cursor=`` link) switches to
+    :class:`KeysetPagination`; ``?count=exact|estimate`` adds a total to it.
+    Querysets ordered by something the keyset cannot seek on, like the search
+    rank, stay in page mode so their order is kept.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.wants_keyset(request) and self.keyset_class().can_paginate(queryset):
+            self.keyset = self.keyset_class()
+            self.keyset.page_size = self.page_size
+            self.keyset.page_size_query_param = self.page_size_query_param
+            self.keyset.max_page_size = self.max_page_size
+            self.display_page_controls = False
+            return self.keyset.paginate_queryset(queryset, request, view=view)
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def wants_keyset(self, request):
+        params = request.query_params
+        return params.get(self.mode_query_param) == 'cursor' or self.keyset_class.cursor_query_param in params
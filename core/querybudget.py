@@ -0,0 +1,101 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)')
+WHITESPACE_RE = re.compile(r'\s+')
+IGNORED_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def fingerprint(sql):
+    sql = WHITESPACE_RE.sub(' ', sql).strip()
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """Counts queries on every connection and groups them by SQL fingerprint."""
+
+    def __init__(self, using=None):
+        self.aliases = [using] if using else list(connections)
+        self.fingerprints = Counter()
+        self.count = 0
+        self.duration = 0.0
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for alias in self.aliases:
+            self.stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            if not sql.lstrip().upper().startswith(IGNORED_PREFIXES):
+                self.count += 1
+                self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold=2):
+        return {sql: n for sql, n in self.fingerprints.items() if n >= threshold}
+
+    def report(self):
+        lines = [f'{self.count} queries in {self.duration * 1000:.1f} ms']
+        for sql, n in self.fingerprints.most_common():
+            lines.append(f'  {n}x {sql}')
+        return '\n'.join(lines)
+
+
+class QueryBudgetMiddleware:
+    """
+    Logs requests that exceed their query budget or repeat the same SQL (N+1).
+
+    The budget is the view's ``query_budget`` attribute or ``QUERY_BUDGET_DEFAULT``.
+    With ``DEBUG`` on, the count is also returned in the ``X-Query-Count`` header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.default_budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', 20)
+        self.duplicate_threshold = getattr(settings, 'QUERY_BUDGET_DUPLICATE_THRESHOLD', 3)
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        request.query_stats = recorder
+
+        budget = getattr(request, 'query_budget', None) or self.default_budget
+        duplicates = recorder.duplicates(self.duplicate_threshold)
+        if recorder.count > budget:
+            logger.warning(f"Query budget exceeded on {request.method} {request.path}: "
+                           f"{recorder.count} > {budget}\n{recorder.report()}")
+        elif duplicates:
+            logger.warning(f"Possible N+1 on {request.method} {request.path}: "
+                           f"{max(duplicates.values())} identical queries\n{recorder.report()}")
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        request.query_budget = getattr(view_class, 'query_budget', None)
+
+
+class QueryBudgetTestMixin:
+    @contextmanager
+    def assertMaxQueries(self, limit, allow_duplicates=False, using='default'):
+        with QueryRecorder(using=using) as recorder:
+            yield recorder
+        self.assertLessEqual(recorder.count, limit, msg=recorder.report())
+        if not allow_duplicates:
+            self.assertEqual(recorder.duplicates(), {}, msg=f'Repeated queries (N+1)\n{recorder.report()}')
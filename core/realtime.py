@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+RESYNC = {'type': 'resync'}
+
+
+class Subscription:
+    """One connected client: a bounded queue owned by the event loop serving it."""
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+
+    def put(self, event):
+        # Publishers run in worker threads; only the owning loop may touch the queue.
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # Loop already closed, the client is gone.
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client this far behind refetches instead of replaying the backlog.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class Hub:
+    """In-process fan-out from user ids to the subscriptions connected to this process."""
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    async def attach(self, user_id):
+        subscription = Subscription(asyncio.get_running_loop(), getattr(settings, 'REALTIME_QUEUE_SIZE', 100))
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+        await get_broker().listen()
+        return subscription
+
+    def detach(self, user_id, subscription):
+        with self.lock:
+            self.subscriptions[user_id].discard(subscription)
+            if not self.subscriptions[user_id]:
+                del self.subscriptions[user_id]
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        subscription = await self.attach(user_id)
+        try:
+            yield subscription
+        finally:
+            self.detach(user_id, subscription)
+
+    def dispatch(self, user_id, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def connected(self, user_id):
+        with self.lock:
+            return len(self.subscriptions.get(user_id, ()))
+
+
+class InMemoryBroker:
+    """Hands events straight to this process's hub: one process, or tests."""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, user_id, event):
+        self.hub.dispatch(user_id, event)
+
+    async def listen(self):
+        pass
+
+
+class RedisBroker:
+    """
+    Redis pub/sub between processes; every process relays what it hears to its own hub.
+
+    Needs the ``redis`` package and ``REALTIME_REDIS_URL``.
+    """
+    channel_prefix = 'wway:realtime:'
+
+    def __init__(self, hub):
+        import redis
+        self.hub = hub
+        self.url = settings.REALTIME_REDIS_URL
+        self.client = redis.Redis.from_url(self.url)
+        self.listener = None
+
+    def publish(self, user_id, event):
+        self.client.publish(f'{self.channel_prefix}{user_id}', json.dumps(event))
+
+    async def listen(self):
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.get_running_loop().create_task(self.relay())
+
+    async def relay(self):
+        import redis.asyncio
+        pubsub = redis.asyncio.Redis.from_url(self.url).pubsub()
+        await pubsub.psubscribe(f'{self.channel_prefix}*')
+        async for message in pubsub.listen():
+            if message['type'] != 'pmessage':
+                continue
+            user_id = int(message['channel'].decode()[len(self.channel_prefix):])
+            self.hub.dispatch(user_id, json.loads(message['data']))
+
+
+_hub = Hub()
+_broker = None
+
+
+def get_hub():
+    return _hub
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        backend = getattr(settings, 'REALTIME_BROKER', 'core.realtime.InMemoryBroker')
+        _broker = import_string(backend)(_hub)
+    return _broker
+
+
+def publish(user_ids, event):
+    """Send ``event`` to every connection of ``user_ids`` once the transaction commits."""
+    def send():
+        broker = get_broker()
+        for user_id in set(user_ids):
+            try:
+                broker.publish(user_id, event)
+            except Exception:
+                logger.exception(f"Realtime publish to user {user_id} failed")
+    transaction.on_commit(send)
+
+
+def message_event(message):
+    return {
+        'type': 'message',
+        'data': {
+            'id': message.id,
+            'conversation': message.conversation_id,
+            'sender': message.sender_id,
+            'receiver': message.receiver_id,
+            'content': message.content,
+            'timestamp': message.timestamp.isoformat(),
+            'read_status': message.read_status,
+        },
+    }
+
+
+def read_event(conversation_id, reader_id, read_at):
+    return {
+        'type': 'read',
+        'data': {'conversation': conversation_id, 'reader': reader_id, 'read_at': read_at.isoformat()},
+    }
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event.get('data', {}))}\n\n"
+
+
+async def event_stream(user_id):
+    """Server-Sent Events for one user, with comment heartbeats to keep proxies from timing out."""
+    heartbeat = getattr(settings, 'REALTIME_HEARTBEAT', 20)
+    hub = get_hub()
+    subscription = await hub.attach(user_id)
+    # Plain try/finally rather than ``subscribe()``: the server may close this
+    # generator from a finalizer, where a nested async generator can't be unwound.
+    try:
+        yield f"retry: {getattr(settings, 'REALTIME_RETRY_MS', 3000)}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            yield format_event(event)
+    finally:
+        hub.detach(user_id, subscription)
@@ -0,0 +1,199 @@
+import html
+import re
+from django.db import connections
+from django.db.models import F, FloatField, Q, TextField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+# Indexed columns and their weights per table. Migration 0005 builds the same documents.
+SEARCH_DOCUMENTS = {
+    'core_course': (('title', 'A'), ('category', 'B'), ('description', 'C')),
+    'core_lesson': (('title', 'A'), ('content', 'B')),
+}
+SEARCH_CONFIG = 'simple'
+BM25_WEIGHTS = {'A': 10.0, 'B': 4.0, 'C': 2.0, 'D': 1.0}
+TERM_RE = re.compile(r'\w+')
+
+# Messages are indexed per participant, so a search only ever touches the caller's matches.
+MESSAGE_TABLE = 'core_message'
+HIGHLIGHT_START, HIGHLIGHT_STOP = '\x02', '\x03'
+HEADLINE_OPTIONS = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=24, MinWords=8, MaxFragments=2'
+SNIPPET_TOKENS = 16
+
+
+def fts_table(db_table):
+    return f'{db_table}_fts'
+
+
+def update_index(instance, using='default'):
+    """Refresh the SQLite FTS5 row; Postgres keeps its generated tsvector column by itself."""
+    connection = connections[using]
+    table = instance._meta.db_table
+    if connection.vendor != 'sqlite' or table not in SEARCH_DOCUMENTS:
+        return
+    columns = [column for column, _ in SEARCH_DOCUMENTS[table]]
+    placeholders = ', '.join(['%s'] * (len(columns) + 1))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {fts_table(table)} WHERE rowid = %s', [instance.pk])
+        cursor.execute(
+            f'INSERT INTO {fts_table(table)} (rowid, {", ".join(columns)}) VALUES ({placeholders})',
+            [instance.pk] + [getattr(instance, column) or '' for column in columns]
+        )
+
+
+def remove_from_index(instance, using='default'):
+    connection = connections[using]
+    table = instance._meta.db_table
+    if connection.vendor != 'sqlite' or table not in SEARCH_DOCUMENTS:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {fts_table(table)} WHERE rowid = %s', [instance.pk])
+
+
+def rebuild_index(model, using='default'):
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor != 'sqlite' or table not in SEARCH_DOCUMENTS:
+        return
+    columns = ', '.join(column for column, _ in SEARCH_DOCUMENTS[table])
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {fts_table(table)}')
+        cursor.execute(f'INSERT INTO {fts_table(table)} (rowid, {columns}) SELECT id, {columns} FROM {table}')
+
+
+def message_participants(message):
+    return f'u{message.sender_id} u{message.receiver_id}'
+
+
+def index_message(instance, using='default'):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {fts_table(MESSAGE_TABLE)} WHERE rowid = %s', [instance.pk])
+        cursor.execute(
+            f'INSERT INTO {fts_table(MESSAGE_TABLE)} (rowid, content, participants) VALUES (%s, %s, %s)',
+            [instance.pk, instance.content or '', message_participants(instance)]
+        )
+
+
+def unindex_message(instance, using='default'):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {fts_table(MESSAGE_TABLE)} WHERE rowid = %s', [instance.pk])
+
+
+def rebuild_message_index(using='default'):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {fts_table(MESSAGE_TABLE)}')
+        cursor.execute(
+            f"INSERT INTO {fts_table(MESSAGE_TABLE)} (rowid, content, participants) "
+            f"SELECT id, content, 'u' || sender_id || ' u' || receiver_id FROM {MESSAGE_TABLE}"
+        )
+
+
+def search_messages(queryset, user, query):
+    """
+    Narrow ``queryset`` to the user's messages matching ``query`` and annotate ``snippet``.
+
+    Postgres scans the ``(sender_id, search_vector)`` and ``(receiver_id, search_vector)``
+    GIN indexes; SQLite matches the participant token and the terms in one FTS5 query.
+    Highlights in ``snippet`` are wrapped in ``HIGHLIGHT_START``/``HIGHLIGHT_STOP``.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        tsquery = 'websearch_to_tsquery(%s::regconfig, %s)'
+        matches = RawSQL(
+            f'SELECT id FROM {MESSAGE_TABLE} WHERE (sender_id = %s OR receiver_id = %s) '
+            f'AND search_vector @@ {tsquery}', [user.pk, user.pk, SEARCH_CONFIG, query]
+        )
+        snippet = RawSQL(
+            f'ts_headline(%s::regconfig, {MESSAGE_TABLE}.content, {tsquery}, %s)',
+            [SEARCH_CONFIG, SEARCH_CONFIG, query, HEADLINE_OPTIONS], output_field=TextField()
+        )
+    elif vendor == 'sqlite':
+        tokens = TERM_RE.findall(query)
+        if not tokens:
+            return queryset.none()
+        fts = fts_table(MESSAGE_TABLE)
+        terms = ' '.join(f'"{token}"' for token in tokens)
+        match = f'participants:u{user.pk} AND content:({terms})'
+        matches = RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [match])
+        snippet = RawSQL(
+            f'(SELECT snippet({fts}, 0, %s, %s, %s, %s) FROM {fts} '
+            f'WHERE {fts} MATCH %s AND rowid = {MESSAGE_TABLE}.id)',
+            [HIGHLIGHT_START, HIGHLIGHT_STOP, '…', SNIPPET_TOKENS, match], output_field=TextField()
+        )
+    else:
+        return queryset.filter(Q(sender=user) | Q(receiver=user), content__icontains=query).annotate(
+            snippet=F('content')
+        )
+    return queryset.filter(pk__in=matches).annotate(snippet=snippet)
+
+
+def render_snippet(snippet):
+    """HTML-escape a snippet, then turn the highlight markers into ``<mark>`` tags."""
+    return html.escape(snippet or '').replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+
+
+class MessageSearchFilter(filters.SearchFilter):
+    """``?search=`` for messages through the participant-scoped index instead of ``icontains``."""
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        return search_messages(queryset, request.user, ' '.join(search_terms))
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Ranked full-text search over the documents in ``SEARCH_DOCUMENTS``.
+
+    Uses the GIN-indexed ``search_vector`` column on Postgres and an FTS5 table on
+    SQLite. Results are ordered by relevance unless the client asks for an ordering.
+    Other databases and unindexed models fall back to ``SearchFilter``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        table = queryset.model._meta.db_table
+        vendor = connections[queryset.db].vendor
+        if not search_terms or table not in SEARCH_DOCUMENTS or vendor not in ('postgresql', 'sqlite'):
+            return super().filter_queryset(request, queryset, view)
+
+        if vendor == 'postgresql':
+            matches, rank = self.postgres_query(table, ' '.join(search_terms))
+        else:
+            tokens = TERM_RE.findall(' '.join(search_terms))
+            if not tokens:
+                return queryset.none()
+            matches, rank = self.sqlite_query(table, ' '.join(f'"{token}"' for token in tokens))
+
+        queryset = queryset.filter(pk__in=matches).annotate(search_rank=rank)
+        if api_settings.ORDERING_PARAM not in request.query_params:
+            queryset = queryset.order_by('-search_rank', 'pk')
+        return queryset
+
+    def postgres_query(self, table, query):
+        tsquery = 'websearch_to_tsquery(%s::regconfig, %s)'
+        matches = RawSQL(f'SELECT id FROM {table} WHERE search_vector @@ {tsquery}', [SEARCH_CONFIG, query])
+        rank = RawSQL(f'ts_rank({table}.search_vector, {tsquery})', [SEARCH_CONFIG, query],
+                      output_field=FloatField())
+        return matches, rank
+
+    def sqlite_query(self, table, query):
+        fts = fts_table(table)
+        weights = ', '.join(str(BM25_WEIGHTS[weight]) for _, weight in SEARCH_DOCUMENTS[table])
+        matches = RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [query])
+        rank = RawSQL(
+            f'(SELECT -bm25({fts}, {weights}) FROM {fts} WHERE {fts} MATCH %s AND rowid = {table}.id)',
+            [query], output_field=FloatField()
+        )
+        return matches, rank
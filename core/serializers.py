@@ -1,19 +1,42 @@
+from datetime import timedelta
+from django.utils import timezone
 from rest_framework import serializers
 from .models import (
     Course, Module, Lesson, Assignment,
-    Submission, Enrollment, LessonProgress, Certificate, Message
+    Submission, Enrollment, LessonProgress, Certificate, Message,
+    CertificateIssueJob, ConversationMember, PROGRESS_STATUSES
 )
 from users.serializers import UserSerializer
 from users.models import User
-import uuid
+from django.core import signing
+from .uploads import UPLOAD_KINDS, load_upload
+from .images import variant_url
+from .certificates import certificate_number
+from .search import render_snippet
+from .analytics import GRANULARITIES
 
 class CourseSerializer(serializers.ModelSerializer):
     teacher = UserSerializer(read_only=True)
+    image_small = serializers.SerializerMethodField(read_only=True)
+    image_medium = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Course
-        fields = ['id', 'title', 'description', 'category', 'level', 'image', 'accessibility_features', 'is_active', 'created_at', 'teacher']
-        read_only_fields = ['id', 'created_at', 'teacher']
+        fields = [
+            'id', 'title', 'description', 'category', 'level', 'image', 'image_small', 'image_medium',
+            'accessibility_features', 'is_active', 'created_at', 'teacher', 'module_count', 'lesson_count',
+            'total_duration', 'enrollment_count', 'certificate_count'
+        ]
+        read_only_fields = [
+            'id', 'created_at', 'teacher', 'module_count', 'lesson_count', 'total_duration',
+            'enrollment_count', 'certificate_count'
+        ]
+
+    def get_image_small(self, obj):
+        return variant_url(obj, 'small', self.context.get('request'))
+
+    def get_image_medium(self, obj):
+        return variant_url(obj, 'medium', self.context.get('request'))
 
     def validate(self, attrs):
         if self.context['request'].user.role not in ['admin', 'teacher']:
@@ -24,6 +47,34 @@ class CourseSerializer(serializers.ModelSerializer):
         validated_data['teacher'] = self.context['request'].user
         return super().create(validated_data)
 
+class AssignmentTreeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Assignment
+        fields = ['id', 'title', 'description', 'due_date']
+
+class LessonTreeSerializer(serializers.ModelSerializer):
+    assignments = AssignmentTreeSerializer(source='active_assignments', many=True, read_only=True)
+
+    class Meta:
+        model = Lesson
+        fields = [
+            'id', 'title', 'content', 'order', 'lesson_type',
+            'duration', 'accessibility_features', 'assignments'
+        ]
+
+class ModuleTreeSerializer(serializers.ModelSerializer):
+    lessons = LessonTreeSerializer(source='active_lessons', many=True, read_only=True)
+
+    class Meta:
+        model = Module
+        fields = ['id', 'title', 'description', 'order', 'start_date', 'end_date', 'lessons']
+
+class CourseTreeSerializer(CourseSerializer):
+    modules = ModuleTreeSerializer(source='active_modules', many=True, read_only=True)
+
+    class Meta(CourseSerializer.Meta):
+        fields = CourseSerializer.Meta.fields + ['modules']
+
 class ModuleSerializer(serializers.ModelSerializer):
     course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.filter(is_active=True), required=True)
     course_title = serializers.SerializerMethodField(read_only=True)
@@ -49,7 +100,9 @@ class ModuleSerializer(serializers.ModelSerializer):
         return data
 
 class LessonSerializer(serializers.ModelSerializer):
-    module = serializers.PrimaryKeyRelatedField(queryset=Module.objects.filter(is_active=True), required=True)
+    module = serializers.PrimaryKeyRelatedField(
+        queryset=Module.objects.filter(is_active=True).select_related('course'), required=True
+    )
     module_title = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -75,7 +128,9 @@ class LessonSerializer(serializers.ModelSerializer):
         return data
 
 class AssignmentSerializer(serializers.ModelSerializer):
-    lesson = serializers.PrimaryKeyRelatedField(queryset=Lesson.objects.filter(is_active=True), required=True)
+    lesson = serializers.PrimaryKeyRelatedField(
+        queryset=Lesson.objects.filter(is_active=True), required=True
+    )
 
     class Meta:
         model = Assignment
@@ -105,6 +160,40 @@ class SubmissionSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("You have already submitted this assignment")
         return data
 
+class GradingQueueSerializer(serializers.ModelSerializer):
+    assignment_title = serializers.CharField(source='assignment.title', read_only=True)
+    student = UserSerializer(read_only=True)
+
+    class Meta:
+        model = Submission
+        fields = ['id', 'course', 'assignment', 'assignment_title', 'student', 'submitted_file',
+                  'submission_date', 'status', 'claimed_by', 'claimed_until']
+        read_only_fields = fields
+
+class GradingClaimSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    course = serializers.IntegerField(min_value=1, required=False)
+
+class GradingBulkSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500)
+
+class CourseAnalyticsQuerySerializer(serializers.Serializer):
+    granularity = serializers.ChoiceField(choices=list(GRANULARITIES), default='day')
+    start = serializers.DateTimeField(required=False, help_text="Series start (default: 30 days or 48 hours back)")
+    end = serializers.DateTimeField(required=False, help_text="Series end, exclusive (default: now)")
+
+    MAX_BUCKETS = 1000
+    DEFAULT_SPANS = {'hour': timedelta(hours=48), 'day': timedelta(days=30)}
+
+    def validate(self, data):
+        data.setdefault('end', timezone.now())
+        data.setdefault('start', data['end'] - self.DEFAULT_SPANS[data['granularity']])
+        if data['start'] >= data['end']:
+            raise serializers.ValidationError("start must be before end")
+        if (data['end'] - data['start']) / GRANULARITIES[data['granularity']] > self.MAX_BUCKETS:
+            raise serializers.ValidationError(f"At most {self.MAX_BUCKETS} buckets per request")
+        return data
+
 class EnrollmentSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.filter(is_active=True), required=True)
@@ -112,7 +201,7 @@ class EnrollmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Enrollment
         fields = ['id', 'user', 'course', 'enrollment_date', 'progress', 'needs_accessibility_support']
-        read_only_fields = ['id', 'enrollment_date', 'user']
+        read_only_fields = ['id', 'enrollment_date', 'user', 'progress']
 
     def validate(self, data):
         course = data.get('course')
@@ -135,14 +224,21 @@ class LessonProgressSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Cannot track progress for inactive lesson")
         return data
 
+class LessonProgressBulkItemSerializer(serializers.Serializer):
+    # Plain ids: lesson existence and is_active are checked for the whole batch in one query.
+    lesson = serializers.IntegerField(min_value=1)
+    status = serializers.ChoiceField(choices=PROGRESS_STATUSES)
+    time_spent = serializers.IntegerField(min_value=0, max_value=32767, required=False, allow_null=True)
+    completion_date = serializers.DateTimeField(required=False, allow_null=True)
+
 class CertificateSerializer(serializers.ModelSerializer):
     course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.all(), required=True)
     user = UserSerializer(read_only=True)
 
     class Meta:
         model = Certificate
-        fields = ['id', 'user', 'course', 'issue_date', 'certificate_number', 'accessibility_features']
-        read_only_fields = ['user', 'issue_date', 'certificate_number']
+        fields = ['id', 'user', 'course', 'issue_date', 'certificate_number', 'accessibility_features', 'file']
+        read_only_fields = ['user', 'issue_date', 'certificate_number', 'file']
 
     def validate(self, attrs):
         course = attrs.get('course')
@@ -156,9 +252,28 @@ class CertificateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
-        validated_data['certificate_number'] = f"CRT-{uuid.uuid4().hex[:8].upper()}"
+        validated_data['certificate_number'] = certificate_number(validated_data['course'].pk, validated_data['user'].pk)
         return super().create(validated_data)
 
+class CertificateBulkIssueSerializer(serializers.Serializer):
+    course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.filter(is_active=True))
+    min_progress = serializers.IntegerField(min_value=1, max_value=100, default=100)
+
+    def validate_course(self, course):
+        user = self.context['request'].user
+        if user.role == 'teacher' and course.teacher_id != user.pk:
+            raise serializers.ValidationError("You can only issue certificates for your own courses")
+        return course
+
+class CertificateIssueJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CertificateIssueJob
+        fields = [
+            'id', 'course', 'min_progress', 'status', 'issued', 'rendered',
+            'error', 'created_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
 class MessageSerializer(serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
     receiver = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
@@ -173,3 +288,90 @@ class MessageSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("You cannot send a message to yourself")
         return data
 
+class MessageMarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False, max_length=500)
+    sender = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), required=False)
+    before = serializers.DateTimeField(required=False, help_text="With sender: mark everything up to this time (default: now)")
+
+    def validate(self, data):
+        if ('ids' in data) == ('sender' in data):
+            raise serializers.ValidationError("Provide either ids or sender")
+        if 'before' in data and 'sender' not in data:
+            raise serializers.ValidationError("before can only be combined with sender")
+        return data
+
+class ConversationMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Message
+        fields = ['id', 'sender', 'content', 'timestamp', 'read_status']
+        read_only_fields = fields
+
+class MessageSearchResultSerializer(serializers.ModelSerializer):
+    snippet = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = Message
+        fields = ['id', 'conversation', 'sender', 'receiver', 'snippet', 'timestamp', 'read_status']
+        read_only_fields = fields
+
+    def get_snippet(self, obj):
+        return render_snippet(obj.snippet)
+
+class ConversationSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='conversation_id', read_only=True)
+    peer = UserSerializer(read_only=True)
+    last_message = ConversationMessageSerializer(source='conversation.last_message', read_only=True)
+
+    class Meta:
+        model = ConversationMember
+        fields = ['id', 'peer', 'last_message', 'last_message_at', 'unread_count']
+        read_only_fields = fields
+
+class UploadTargetSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=list(UPLOAD_KINDS))
+    filename = serializers.CharField(max_length=150)
+    content_type = serializers.CharField(max_length=100)
+    target = serializers.IntegerField(required=False, help_text="Assignment id for submissions, course id for course images")
+
+    def validate(self, data):
+        user = self.context['request'].user
+        roles = UPLOAD_KINDS[data['kind']].roles
+        if roles and user.role not in roles:
+            raise serializers.ValidationError(f"Your role cannot upload a {data['kind']}")
+        content_types = UPLOAD_KINDS[data['kind']].content_types
+        if content_types and data['content_type'] not in content_types:
+            raise serializers.ValidationError(
+                {'content_type': f"Must be one of: {', '.join(content_types)}"}
+            )
+        if data['kind'] == 'avatar':
+            data['target'] = user.pk
+            return data
+        if 'target' not in data:
+            raise serializers.ValidationError({'target': "This field is required for this upload kind"})
+        if data['kind'] == 'submission':
+            assignment = Assignment.objects.filter(pk=data['target'], is_active=True).first()
+            if assignment is None:
+                raise serializers.ValidationError("Cannot submit to inactive assignment")
+            if Submission.objects.filter(student=user, assignment=assignment).exists():
+                raise serializers.ValidationError("You have already submitted this assignment")
+        elif data['kind'] == 'course_image':
+            course = Course.objects.filter(pk=data['target']).first()
+            if course is None:
+                raise serializers.ValidationError("Course not found")
+            if user.role == 'teacher' and course.teacher_id != user.pk:
+                raise serializers.ValidationError("You can only upload images for your own courses")
+        return data
+
+class UploadCompleteSerializer(serializers.Serializer):
+    token = serializers.CharField()
+
+    def validate_token(self, value):
+        try:
+            upload = load_upload(value)
+        except signing.SignatureExpired:
+            raise serializers.ValidationError("Upload token has expired")
+        except signing.BadSignature:
+            raise serializers.ValidationError("Invalid upload token")
+        if upload['user'] != self.context['request'].user.pk:
+            raise serializers.ValidationError("Invalid upload token")
+        return upload
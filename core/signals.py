@@ -0,0 +1,242 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import (
+    Course, Module, Lesson, Assignment, Submission, Enrollment, LessonProgress, Certificate, Message,
+    LESSON_COUNTED_FIELDS, MODULE_COUNTED_FIELDS,
+)
+from . import search
+from .images import needs_derivatives, schedule_derivatives
+from users.models import User
+from .counters import (
+    CONTENT_COUNTERS, adjust_course_counter, refresh_course_counters, refresh_enrollment_progress
+)
+from .conversations import get_conversation, record_message, refresh_conversations
+from .ownership import PARENTS, owner_of, reassign_teacher, refresh_lesson_tree, refresh_module_tree
+from . import analytics, realtime, telegram
+
+COUNTED_FIELDS = {Module: MODULE_COUNTED_FIELDS, Lesson: LESSON_COUNTED_FIELDS}
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+def update_search_index(sender, instance, using, **kwargs):
+    search.update_index(instance, using=using)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Lesson)
+def remove_search_index(sender, instance, using, **kwargs):
+    search.remove_from_index(instance, using=using)
+
+
+@receiver(pre_save, sender=Module)
+@receiver(pre_save, sender=Lesson)
+def remember_counted_fields(sender, instance, **kwargs):
+    # Rows loaded or saved through the ORM carry a snapshot already; others are read once.
+    if instance.pk and not hasattr(instance, '_loaded_counted'):
+        instance._loaded_counted = sender.objects.filter(pk=instance.pk).values(*COUNTED_FIELDS[sender]).first()
+
+
+def counted_changes(sender, instance, **kwargs):
+    """
+    ``{field: old value}`` for the counted fields an update changed. None for inserts,
+    deletes and rows with nothing to compare against, which always refresh.
+    """
+    loaded = getattr(instance, '_loaded_counted', None)
+    if kwargs.get('signal') is post_save:
+        instance._loaded_counted = {f: getattr(instance, f) for f in COUNTED_FIELDS[sender]}
+        if not kwargs.get('created') and loaded is not None:
+            return {f: value for f, value in loaded.items() if value != getattr(instance, f)}
+    return None
+
+
+@receiver(pre_save, sender=Lesson)
+@receiver(pre_save, sender=Assignment)
+@receiver(pre_save, sender=Submission)
+@receiver(pre_save, sender=LessonProgress)
+def copy_ownership(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and PARENTS[sender][1] not in update_fields:
+        return
+    instance.course_id, instance.teacher_id = owner_of(instance)
+
+
+@receiver(post_save, sender=Course)
+def propagate_teacher(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_teacher_id', instance.teacher_id)
+    if not created and loaded != instance.teacher_id:
+        reassign_teacher(instance.pk, instance.teacher_id)
+    instance._loaded_teacher_id = instance.teacher_id
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def refresh_module_counters(sender, instance, **kwargs):
+    changes = counted_changes(sender, instance, **kwargs)
+    if changes == {}:
+        return
+    previous = (changes or {}).get('course_id')
+    if previous is not None:
+        refresh_module_tree(instance.pk)
+        analytics.mark_course_stale(previous)
+    course_ids = {instance.course_id, previous}
+    refresh_course_counters(course_ids, fields=CONTENT_COUNTERS)
+    refresh_enrollment_progress(Enrollment.objects.filter(course__in=course_ids))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def refresh_lesson_counters(sender, instance, **kwargs):
+    changes = counted_changes(sender, instance, **kwargs)
+    if changes == {}:
+        return
+    previous = (changes or {}).get('course_id')
+    if previous is not None:
+        refresh_lesson_tree([instance.pk])
+        analytics.mark_course_stale(previous)
+    if changes and 'module_id' in changes:
+        # Module rollups are keyed by the lesson's module, so even a move within the course shows.
+        analytics.mark_course_stale(instance.course_id)
+    course_ids = {instance.course_id, previous}
+    refresh_course_counters(course_ids, fields=CONTENT_COUNTERS)
+    if changes is None or set(changes) - {'duration'}:
+        # Progress counts lessons, not minutes.
+        refresh_enrollment_progress(Enrollment.objects.filter(course__in=course_ids))
+
+
+@receiver(post_save, sender=Assignment)
+def propagate_assignment_owner(sender, instance, created, **kwargs):
+    if not created:
+        submissions = Submission.objects.filter(assignment=instance)
+        if getattr(instance, '_loaded_due_date', instance.due_date) == instance.due_date:
+            submissions = submissions.exclude(course=instance.course_id, teacher=instance.teacher_id)
+        # A new due date changes which submissions are on time; the bumped updated_at gets them recounted.
+        submissions.update(course=instance.course_id, teacher=instance.teacher_id, updated_at=timezone.now())
+    instance._loaded_due_date = instance.due_date
+
+
+@receiver(post_save, sender=Enrollment)
+def count_enrollment(sender, instance, created, **kwargs):
+    if created:
+        adjust_course_counter(instance.course_id, 'enrollment_count', 1)
+
+
+@receiver(post_delete, sender=Enrollment)
+def uncount_enrollment(sender, instance, **kwargs):
+    adjust_course_counter(instance.course_id, 'enrollment_count', -1)
+
+
+@receiver(post_save, sender=Certificate)
+def count_certificate(sender, instance, created, **kwargs):
+    if created:
+        adjust_course_counter(instance.course_id, 'certificate_count', 1)
+
+
+@receiver(post_delete, sender=Certificate)
+def uncount_certificate(sender, instance, **kwargs):
+    adjust_course_counter(instance.course_id, 'certificate_count', -1)
+
+
+@receiver(post_save, sender=LessonProgress)
+def track_lesson_completion(sender, instance, created, **kwargs):
+    if created:
+        changed = instance.status == 'completed'
+    else:
+        previous = getattr(instance, '_loaded_status', None)
+        changed = previous != instance.status and (previous is None or 'completed' in (previous, instance.status))
+    instance._loaded_status = instance.status
+    if changed:
+        refresh_enrollment_progress(
+            Enrollment.objects.filter(user_id=instance.user_id, course=instance.course_id)
+        )
+
+
+@receiver(post_delete, sender=LessonProgress)
+def untrack_lesson_completion(sender, instance, **kwargs):
+    if instance.status == 'completed':
+        refresh_enrollment_progress(
+            Enrollment.objects.filter(user_id=instance.user_id, course=instance.course_id)
+        )
+
+
+@receiver(post_save, sender=LessonProgress)
+def restale_completion(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_completion_date', None)
+    if not created and loaded is not None and loaded != instance.completion_date:
+        analytics.mark_stale(instance.course_id, loaded)
+    instance._loaded_completion_date = instance.completion_date
+
+
+@receiver(post_delete, sender=LessonProgress)
+def unroll_completion(sender, instance, **kwargs):
+    if instance.status == 'completed':
+        analytics.mark_stale(instance.course_id, instance.completion_date)
+
+
+@receiver(post_delete, sender=Submission)
+def unroll_submission(sender, instance, **kwargs):
+    analytics.mark_stale(instance.course_id, instance.submission_date)
+
+
+@receiver(post_delete, sender=Enrollment)
+def unroll_enrollment(sender, instance, **kwargs):
+    analytics.mark_stale(instance.course_id, instance.enrollment_date)
+
+
+@receiver(post_save, sender=Course)
+def queue_course_image_variants(sender, instance, **kwargs):
+    if needs_derivatives(instance):
+        schedule_derivatives(sender, instance.pk, instance.image.name)
+
+
+@receiver(post_save, sender=User)
+def queue_avatar_variants(sender, instance, **kwargs):
+    if needs_derivatives(instance):
+        schedule_derivatives(sender, instance.pk, instance.avatar.name)
+
+
+@receiver(pre_save, sender=Message)
+def assign_conversation(sender, instance, **kwargs):
+    receiver_changed = instance.pk and getattr(instance, '_loaded_receiver_id', None) != instance.receiver_id
+    if instance.conversation_id is None or receiver_changed:
+        instance._previous_conversation_id = instance.conversation_id
+        instance.conversation = get_conversation(instance.sender_id, instance.receiver_id)
+
+
+@receiver(post_save, sender=Message)
+def index_message(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_conversation_id', None)
+    participants = [instance.sender_id, instance.receiver_id]
+    if created:
+        record_message(instance)
+        realtime.publish(participants, realtime.message_event(instance))
+    elif previous or getattr(instance, '_loaded_read_status', None) != instance.read_status:
+        refresh_conversations({instance.conversation_id, previous})
+        if instance.read_status and not previous:
+            realtime.publish(participants, realtime.read_event(
+                instance.conversation_id, instance.receiver_id, timezone.now()
+            ))
+    instance._previous_conversation_id = None
+    instance._loaded_receiver_id = instance.receiver_id
+    instance._loaded_read_status = instance.read_status
+
+
+@receiver(post_delete, sender=Message)
+def unindex_message(sender, instance, **kwargs):
+    refresh_conversations([instance.conversation_id])
+
+
+@receiver(post_save, sender=Message)
+def update_message_search_index(sender, instance, using, **kwargs):
+    search.index_message(instance, using=using)
+
+
+@receiver(post_delete, sender=Message)
+def remove_message_search_index(sender, instance, using, **kwargs):
+    search.unindex_message(instance, using=using)
+
+
+@receiver(post_save, sender=Message)
+def enqueue_telegram_delivery(sender, instance, created, **kwargs):
+    if created and instance.via_telegram:
+        telegram.enqueue(instance)
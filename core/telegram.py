@@ -0,0 +1,206 @@
+import json
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# sendMessage's text limit; a longer message is a permanent 400.
+TEXT_LIMIT = 4096
+
+
+class TelegramError(Exception):
+    def __init__(self, message, retry_after=None, permanent=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.permanent = permanent
+
+
+class BotApiTransport:
+    """Bot API ``sendMessage`` over HTTPS; ``TELEGRAM_API_URL`` can point at a fake server."""
+
+    def __init__(self):
+        self.base_url = f"{settings.TELEGRAM_API_URL.rstrip('/')}/bot{settings.TELEGRAM_BOT_TOKEN}"
+        self.timeout = getattr(settings, 'TELEGRAM_TIMEOUT', 10)
+
+    def send(self, chat_id, text):
+        request = urllib.request.Request(
+            f'{self.base_url}/sendMessage',
+            data=json.dumps({'chat_id': chat_id, 'text': text}).encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.load(response)
+        except urllib.error.HTTPError as e:
+            try:
+                payload = json.load(e)
+            except ValueError:
+                payload = {}
+            retry_after = payload.get('parameters', {}).get('retry_after')
+            # 429 and 5xx are transient; other 4xx (blocked bot, bad chat) will not improve.
+            permanent = 400 <= e.code < 500 and e.code != 429
+            raise TelegramError(payload.get('description') or str(e), retry_after=retry_after, permanent=permanent)
+        except (urllib.error.URLError, TimeoutError, ValueError) as e:
+            raise TelegramError(str(e))
+        if not payload.get('ok'):
+            raise TelegramError(payload.get('description', 'Telegram returned ok=false'))
+        return str(payload['result']['message_id'])
+
+
+class InMemoryTransport:
+    """Records what would have been sent; for local runs without a bot."""
+    sent = []  # Class-level so the shell can inspect it after the worker ran.
+
+    def send(self, chat_id, text):
+        self.sent.append((chat_id, text))
+        return str(len(self.sent))
+
+
+def get_transport():
+    return import_string(getattr(settings, 'TELEGRAM_TRANSPORT', 'core.telegram.BotApiTransport'))()
+
+
+class RateLimiter:
+    """
+    Telegram's flood limits: ``per_chat`` seconds between messages to one chat and
+    ``global_rate`` messages per second overall. ``wait`` blocks the calling thread.
+    """
+
+    def __init__(self, per_chat=1.0, global_rate=30):
+        self.per_chat = per_chat
+        self.global_interval = 1.0 / global_rate if global_rate else 0
+        self.lock = threading.Lock()
+        self.next_for_chat = defaultdict(float)
+        self.next_global = 0.0
+
+    def wait(self, chat_id):
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_for_chat[chat_id], self.next_global)
+            self.next_for_chat[chat_id] = at + self.per_chat
+            self.next_global = at + self.global_interval
+        if at > now:
+            time.sleep(at - now)
+
+    def defer(self, chat_id, seconds):
+        with self.lock:
+            self.next_for_chat[chat_id] = max(self.next_for_chat[chat_id], time.monotonic() + seconds)
+
+
+def get_limiter():
+    return RateLimiter(getattr(settings, 'TELEGRAM_CHAT_INTERVAL', 1.0), getattr(settings, 'TELEGRAM_GLOBAL_RATE', 30))
+
+
+def enqueue(message):
+    """Outbox row for ``message``, written in the caller's transaction; returns None without a chat."""
+    from .models import TelegramDelivery
+    chat_id = message.receiver.telegram_chat_id
+    if not chat_id:
+        logger.info(f"Message {message.id} not relayed: receiver {message.receiver_id} has no Telegram chat")
+        return None
+    return TelegramDelivery.objects.create(message=message, chat_id=chat_id)
+
+
+def backoff(attempts):
+    base = getattr(settings, 'TELEGRAM_RETRY_BASE', 5)
+    cap = getattr(settings, 'TELEGRAM_RETRY_CAP', 3600)
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+
+
+def claim_batch(batch_size):
+    """Lease due deliveries to this worker; expired leases from crashed workers are taken over."""
+    from .models import TelegramDelivery
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'TELEGRAM_LEASE', 120))
+    with transaction.atomic():
+        due = TelegramDelivery.objects.filter(
+            Q(status='pending', next_attempt_at__lte=now) | Q(status='sending', locked_until__lt=now)
+        ).order_by('next_attempt_at').select_for_update(skip_locked=True)
+        ids = list(due.values_list('pk', flat=True)[:batch_size])
+        TelegramDelivery.objects.filter(pk__in=ids).update(status='sending', locked_until=now + lease)
+    return list(
+        TelegramDelivery.objects.filter(pk__in=ids).select_related('message__sender').order_by('next_attempt_at')
+    )
+
+
+def format_text(message):
+    sender = message.sender.full_name or message.sender.email
+    return clip(f'{sender}: {message.content}')
+
+
+def clip(text, limit=TEXT_LIMIT):
+    """Cut ``text`` to ``limit`` UTF-16 code units, which is how the Bot API counts; longer texts are refused."""
+    encoded = text.encode('utf-16-le')
+    if len(encoded) <= limit * 2:
+        return text
+    return encoded[:(limit - 1) * 2].decode('utf-16-le', errors='ignore') + '…'
+
+
+def dispatch_batch(transport=None, limiter=None):
+    """Claim one batch, send it concurrently, and write the outcomes back. Returns the batch size."""
+    from .models import Message, TelegramDelivery
+    deliveries = claim_batch(getattr(settings, 'TELEGRAM_BATCH_SIZE', 100))
+    if not deliveries:
+        return 0
+    transport = transport or get_transport()
+    limiter = limiter or get_limiter()
+    by_chat = defaultdict(list)
+    for delivery in deliveries:
+        by_chat[delivery.chat_id].append(delivery)
+
+    def send_chat(chat_deliveries):
+        # One chat's messages go out in order from a single thread.
+        for delivery in chat_deliveries:
+            limiter.wait(delivery.chat_id)
+            try:
+                delivery.result = transport.send(delivery.chat_id, format_text(delivery.message))
+            except TelegramError as e:
+                delivery.result = e
+                if e.retry_after:
+                    limiter.defer(delivery.chat_id, e.retry_after)
+            except Exception as e:
+                logger.exception(f"Telegram transport error on delivery {delivery.pk}")
+                delivery.result = TelegramError(str(e))
+
+    with ThreadPoolExecutor(max_workers=getattr(settings, 'TELEGRAM_CONCURRENCY', 8)) as pool:
+        list(pool.map(send_chat, by_chat.values()))
+
+    now = timezone.now()
+    max_attempts = getattr(settings, 'TELEGRAM_MAX_ATTEMPTS', 8)
+    sent_messages = []
+    for delivery in deliveries:
+        delivery.attempts += 1
+        delivery.locked_until = None
+        if not isinstance(delivery.result, TelegramError):
+            delivery.status, delivery.sent_at, delivery.last_error = 'sent', now, ''
+            sent_messages.append(Message(pk=delivery.message_id, telegram_message_id=delivery.result))
+            continue
+        delivery.last_error = str(delivery.result)
+        if delivery.result.permanent or delivery.attempts >= max_attempts:
+            delivery.status = 'failed'
+            logger.warning(f"Telegram delivery {delivery.pk} failed: {delivery.last_error}")
+        else:
+            delivery.status = 'pending'
+            delay = delivery.result.retry_after or backoff(delivery.attempts)
+            delivery.next_attempt_at = now + timedelta(seconds=delay)
+
+    with transaction.atomic():
+        TelegramDelivery.objects.bulk_update(
+            deliveries, ['status', 'attempts', 'locked_until', 'last_error', 'sent_at', 'next_attempt_at']
+        )
+        # bulk_update skips signals, so delivery receipts do not re-index the conversation.
+        Message.objects.bulk_update(sent_messages, ['telegram_message_id'])
+    logger.info(f"Telegram batch: {len(sent_messages)} of {len(deliveries)} deliveries sent")
+    return len(deliveries)
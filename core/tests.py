@@ -1,11 +1,22 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import shutil
+import threading
+import time
+import tempfile
+from PIL import Image
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from .models import (
     Course, Module, Lesson, Assignment, Submission,
-    Enrollment, LessonProgress, Certificate, Message
+    Enrollment, LessonProgress, Certificate, Message, CertificateIssueJob,
+    Conversation, ConversationMember, Mailbox, TelegramDelivery
 )
 from .serializers import (
     CourseSerializer, ModuleSerializer, LessonSerializer,
@@ -13,8 +24,26 @@ from .serializers import (
     LessonProgressSerializer, CertificateSerializer, MessageSerializer
 )
 from django.utils import timezone
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from unittest.mock import Mock
+from django.core.management import call_command
+from unittest.mock import Mock, patch
+from django.conf import settings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from asgiref.sync import async_to_sync, sync_to_async
+from rest_framework.authtoken.models import Token
+from users.authentication import token_cache
+from .views import LessonProgressViewSet, SubmissionViewSet
+from .throttling import CacheThrottleBackend, LocalThrottleBackend, UserRateThrottle, get_backend as get_throttle_backend
+from .querybudget import QueryBudgetTestMixin
+from . import analytics
+from .certificates import certificate_number, claim_job
+from .images import generate_derivatives
+from .uploads import SNIFF_BYTES, LocalUploadBackend
+from .realtime import RESYNC, Subscription, get_broker, get_hub
+from .telegram import RateLimiter, dispatch_batch
+from .urls import router
 
 User = get_user_model()
 
@@ -633,3 +662,1643 @@ class APITests(APITestCase):
             'content': 'Test Message'
         })
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+        self.student = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234569',
+            role='student'
+        )
+        Message.objects.bulk_create([
+            Message(sender=self.student, receiver=self.teacher, content=f'Message {i}')
+            for i in range(25)
+        ])
+        # Identical timestamps force the id tie-breaker to do the work.
+        Message.objects.update(timestamp=timezone.now())
+        self.client.force_authenticate(user=self.student)
+
+    def test_cursor_walk_visits_every_row_once(self):
+        url = reverse('message-list') + '?pagination=cursor&page_size=10'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get(reverse('message-list') + '?pagination=cursor&count=exact')
+        self.assertEqual(first.data['count'], 25)
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [item['id'] for item in back.data['results']],
+            [item['id'] for item in first.data['results']]
+        )
+
+    def test_tampered_cursor_is_rejected(self):
+        response = self.client.get(reverse('message-list') + '?cursor=bogus')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get(reverse('message-list'))
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+class FullTextSearchTests(APITestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+        self.python = Course.objects.create(
+            teacher=self.teacher, title='Python Basics', description='Variables and loops', category='Programming'
+        )
+        self.django = Course.objects.create(
+            teacher=self.teacher, title='Web Development', description='Django for Python developers',
+            category='Programming'
+        )
+        Course.objects.create(
+            teacher=self.teacher, title='Algebra', description='Equations', category='Math'
+        )
+
+    def search(self, term):
+        response = self.client.get(reverse('course-list'), {'search': term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_results_are_ranked_by_field_weight(self):
+        self.assertEqual(self.search('python'), [self.python.id, self.django.id])
+
+    def test_cursor_mode_keeps_the_ranking(self):
+        response = self.client.get(reverse('course-list'), {'search': 'python', 'pagination': 'cursor'})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.python.id, self.django.id])
+        # Relevance cannot be seeked on, so the response is paged by number instead.
+        self.assertEqual(response.data['count'], 2)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.django.title = 'Advanced Django'
+        self.django.save()
+        self.assertEqual(self.search('advanced'), [self.django.id])
+        self.django.delete()
+        self.assertEqual(self.search('django'), [])
+
+    def test_lesson_search(self):
+        module = Module.objects.create(course=self.python, title='Intro', description='Intro', order=1)
+        lesson = Lesson.objects.create(module=module, title='Loops', content='for and while statements', order=1)
+        response = self.client.get(reverse('lesson-list'), {'search': 'while'})
+        self.assertEqual([item['id'] for item in response.data['results']], [lesson.id])
+
+class CourseTreeTests(APITestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+        self.course = Course.objects.create(
+            teacher=self.teacher, title='Test Course', description='Test Description', category='Programming'
+        )
+        for module_order in (2, 1):
+            module = Module.objects.create(
+                course=self.course, title=f'Module {module_order}', description='Test', order=module_order
+            )
+            for lesson_order in (1, 2, 3):
+                lesson = Lesson.objects.create(
+                    module=module, title=f'Lesson {lesson_order}', content='Test', order=lesson_order,
+                    is_active=lesson_order != 3
+                )
+                Assignment.objects.create(lesson=lesson, title='Homework', description='Test')
+        Module.objects.create(course=self.course, title='Hidden', description='Test', order=3, is_active=False)
+
+    def test_tree_is_ordered_and_skips_inactive_rows(self):
+        response = self.client.get(reverse('course-tree', args=[self.course.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        modules = response.data['modules']
+        self.assertEqual([module['order'] for module in modules], [1, 2])
+        self.assertEqual([lesson['order'] for lesson in modules[0]['lessons']], [1, 2])
+        self.assertEqual(len(modules[0]['lessons'][0]['assignments']), 1)
+
+    def test_tree_query_count_is_constant(self):
+        with self.assertNumQueries(4):
+            self.client.get(reverse('course-tree', args=[self.course.id]))
+
+class QueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    # Maximum queries per list endpoint; pagination COUNT(*) plus one SELECT,
+    # and the ETag version aggregate on catalog endpoints.
+    LIST_BUDGETS = {
+        'course': 3, 'module': 3, 'lesson': 3, 'assignment': 3, 'submission': 2,
+        'enrollment': 2, 'lesson-progress': 2, 'certificate': 2, 'message': 2, 'grading-queue': 1,
+    }
+    STUDENT_ENDPOINTS = {'submission', 'enrollment', 'lesson-progress'}
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='admin123', phone_number='+998901234567', role='admin'
+        )
+        self.student = User.objects.create_user(
+            email='student@example.com', password='student123', phone_number='+998901234569', role='student'
+        )
+        for n in range(3):
+            teacher = User.objects.create_user(
+                email=f'teacher{n}@example.com', password='teacher123',
+                phone_number=f'+99890123450{n}', role='teacher'
+            )
+            course = Course.objects.create(
+                teacher=teacher, title=f'Course {n}', description='Test', category='Programming'
+            )
+            module = Module.objects.create(course=course, title='Module', description='Test', order=1)
+            lesson = Lesson.objects.create(module=module, title='Lesson', content='Test', order=1)
+            assignment = Assignment.objects.create(lesson=lesson, title='Homework', description='Test')
+            Submission.objects.create(assignment=assignment, student=self.student, submitted_file='submissions/a.txt')
+            Enrollment.objects.create(user=self.student, course=course)
+            LessonProgress.objects.create(user=self.student, lesson=lesson, status='completed')
+            Certificate.objects.create(user=self.student, course=course, certificate_number=f'TEST-{n}')
+            Message.objects.create(sender=self.student, receiver=teacher, content='Hello')
+
+    def test_every_router_list_endpoint_stays_within_budget(self):
+        for prefix, viewset, basename in router.registry:
+            with self.subTest(endpoint=basename):
+                user = self.student if basename in self.STUDENT_ENDPOINTS else self.admin
+                if basename == 'message':
+                    user = self.student
+                self.client.force_authenticate(user=user)
+                with self.assertMaxQueries(self.LIST_BUDGETS[basename]):
+                    response = self.client.get(reverse(f'{basename}-list'))
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(response.data['results']), 3)
+
+    def test_lesson_create_does_not_walk_relations(self):
+        self.client.force_authenticate(user=self.admin)
+        module = Module.objects.first()
+        with self.assertMaxQueries(8):
+            response = self.client.post(reverse('lesson-list'), {
+                'title': 'New Lesson', 'content': 'Test', 'module': module.id, 'order': 2
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+        self.course = Course.objects.create(
+            teacher=self.teacher, title='Test Course', description='Test Description', category='Programming'
+        )
+
+    def test_matching_etag_returns_304_without_serializing(self):
+        url = reverse('course-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_when_catalog_changes(self):
+        url = reverse('course-detail', args=[self.course.id])
+        etag = self.client.get(url)['ETag']
+        self.course.title = 'Renamed Course'
+        self.course.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_related_rows_are_part_of_the_version(self):
+        Module.objects.create(course=self.course, title='Module', description='Test', order=1)
+        url = reverse('module-list')
+        etag = self.client.get(url)['ETag']
+        Course.objects.filter(pk=self.course.pk).update(
+            title='Renamed Course', updated_at=timezone.now() + timezone.timedelta(seconds=1)
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+class CourseCounterTests(APITestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+        self.student = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234569',
+            role='student'
+        )
+        self.course = Course.objects.create(
+            teacher=self.teacher, title='Test Course', description='Test Description', category='Programming'
+        )
+        self.module = Module.objects.create(course=self.course, title='Module', description='Test', order=1)
+        self.lessons = [
+            Lesson.objects.create(module=self.module, title=f'Lesson {n}', content='Test', order=n, duration=10)
+            for n in (1, 2, 3)
+        ]
+
+    def test_counters_follow_writes(self):
+        Enrollment.objects.create(user=self.student, course=self.course)
+        Certificate.objects.create(user=self.student, course=self.course, certificate_number='TEST-001')
+        self.lessons[0].is_active = False
+        self.lessons[0].save()
+        self.lessons[1].delete()
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.module_count, 1)
+        self.assertEqual(self.course.lesson_count, 1)
+        self.assertEqual(self.course.total_duration, 10)
+        self.assertEqual(self.course.enrollment_count, 1)
+        self.assertEqual(self.course.certificate_count, 1)
+
+        Enrollment.objects.get().delete()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrollment_count, 0)
+
+    def test_moving_a_module_updates_both_courses(self):
+        other = Course.objects.create(
+            teacher=self.teacher, title='Other Course', description='Test', category='Programming'
+        )
+        self.module.course = other
+        self.module.save()
+        self.course.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.course.module_count, self.course.lesson_count), (0, 0))
+        self.assertEqual((other.module_count, other.lesson_count, other.total_duration), (1, 3, 30))
+
+    def test_lesson_moves_refresh_both_courses(self):
+        other = Course.objects.create(
+            teacher=self.teacher, title='Other Course', description='Test', category='Programming'
+        )
+        target = Module.objects.create(course=other, title='Module', description='Test', order=1)
+        lesson = Lesson.objects.get(pk=self.lessons[0].pk)
+        lesson.module = target
+        lesson.save()
+        self.course.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.course.lesson_count, self.course.total_duration), (2, 20))
+        self.assertEqual((other.lesson_count, other.total_duration), (1, 10))
+
+    def test_content_edits_leave_counters_alone(self):
+        Enrollment.objects.create(user=self.student, course=self.course)
+        for instance in (Lesson.objects.get(pk=self.lessons[0].pk), self.lessons[1], self.module):
+            instance.title = 'Typo fixed'
+            with CaptureQueriesContext(connection) as queries:
+                instance.save()
+            for query in queries.captured_queries:
+                self.assertNotIn('core_enrollment', query['sql'])
+                self.assertNotIn('lesson_count', query['sql'])
+
+    def test_recompute_command_repairs_drift(self):
+        Course.objects.update(lesson_count=99, enrollment_count=7)
+        call_command('recompute_course_counters', stdout=Mock())
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.lesson_count, self.course.enrollment_count), (3, 0))
+
+    def test_counters_are_filterable_and_orderable(self):
+        Course.objects.create(teacher=self.teacher, title='Empty', description='Test', category='Programming')
+        response = self.client.get(reverse('course-list'), {'lesson_count__gte': 1})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.course.id])
+        self.assertEqual(response.data['results'][0]['total_duration'], 30)
+        response = self.client.get(reverse('course-list'), {'ordering': '-lesson_count'})
+        self.assertEqual(response.data['results'][0]['id'], self.course.id)
+
+class EnrollmentProgressTests(APITestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+        self.student = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234569',
+            role='student'
+        )
+        self.course = Course.objects.create(
+            teacher=self.teacher, title='Test Course', description='Test Description', category='Programming'
+        )
+        module = Module.objects.create(course=self.course, title='Module', description='Test', order=1)
+        self.lessons = [
+            Lesson.objects.create(module=module, title=f'Lesson {n}', content='Test', order=n)
+            for n in (1, 2, 3, 4)
+        ]
+        self.enrollment = Enrollment.objects.create(user=self.student, course=self.course)
+
+    def progress(self):
+        self.enrollment.refresh_from_db()
+        return self.enrollment.progress
+
+    def test_completion_updates_progress(self):
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post(reverse('lesson-progress-list'), {
+            'lesson': self.lessons[0].id, 'status': 'completed'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.progress(), 25)
+
+        progress = LessonProgress.objects.create(user=self.student, lesson=self.lessons[1], status='in_progress')
+        self.assertEqual(self.progress(), 25)
+        progress = LessonProgress.objects.get(pk=progress.pk)
+        progress.status = 'completed'
+        progress.save()
+        self.assertEqual(self.progress(), 50)
+        progress.delete()
+        self.assertEqual(self.progress(), 25)
+
+    def test_new_lessons_rescale_progress(self):
+        LessonProgress.objects.create(user=self.student, lesson=self.lessons[0], status='completed')
+        self.lessons[3].delete()
+        self.assertEqual(self.progress(), 33)
+
+    def test_clients_cannot_set_progress(self):
+        self.client.force_authenticate(user=self.student)
+        response = self.client.patch(
+            reverse('enrollment-detail', args=[self.enrollment.id]), {'progress': 100}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.progress(), 0)
+
+    def test_backfill_command(self):
+        LessonProgress.objects.create(user=self.student, lesson=self.lessons[0], status='completed')
+        Enrollment.objects.update(progress=0)
+        call_command('recompute_enrollment_progress', stdout=Mock())
+        self.assertEqual(self.progress(), 25)
+
+class LessonProgressBulkTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+        self.student = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234569',
+            role='student'
+        )
+        self.course = Course.objects.create(
+            teacher=self.teacher, title='Test Course', description='Test Description', category='Programming'
+        )
+        module = Module.objects.create(course=self.course, title='Module', description='Test', order=1)
+        self.lessons = [
+            Lesson.objects.create(module=module, title=f'Lesson {n}', content='Test', order=n)
+            for n in range(1, 11)
+        ]
+        self.inactive = Lesson.objects.create(module=module, title='Hidden', content='Test', order=11, is_active=False)
+        self.enrollment = Enrollment.objects.create(user=self.student, course=self.course)
+        LessonProgress.objects.create(user=self.student, lesson=self.lessons[0], status='in_progress')
+        self.client.force_authenticate(user=self.student)
+
+    def test_bulk_upsert_reports_each_item(self):
+        items = [{'lesson': lesson.id, 'status': 'completed', 'time_spent': 5} for lesson in self.lessons[:5]]
+        items += [
+            {'lesson': self.inactive.id, 'status': 'completed'},
+            {'lesson': self.lessons[5].id, 'status': 'bogus'},
+        ]
+        with self.assertMaxQueries(6):
+            response = self.client.post(reverse('lesson-progress-bulk'), items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['result'] for r in response.data['results']],
+            ['updated', 'created', 'created', 'created', 'created', 'error', 'error']
+        )
+        self.assertEqual(LessonProgress.objects.filter(user=self.student, status='completed').count(), 5)
+        self.assertIsNotNone(LessonProgress.objects.get(lesson=self.lessons[0]).completion_date)
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.progress, 50)
+
+    def test_repeated_lesson_keeps_last_entry(self):
+        response = self.client.post(reverse('lesson-progress-bulk'), {'items': [
+            {'lesson': self.lessons[1].id, 'status': 'completed'},
+            {'lesson': self.lessons[1].id, 'status': 'in_progress', 'time_spent': 3},
+        ]}, format='json')
+        self.assertEqual([r['result'] for r in response.data['results']], ['superseded', 'created'])
+        self.assertEqual(LessonProgress.objects.get(lesson=self.lessons[1]).status, 'in_progress')
+
+    def test_empty_payload_is_rejected(self):
+        response = self.client.post(reverse('lesson-progress-bulk'), [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class DirectUploadTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(
+            UPLOAD_BACKEND='core.uploads.LocalUploadBackend', MEDIA_ROOT=self.media_root
+        )
+        self.override.enable()
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+        self.student = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234569',
+            role='student'
+        )
+        self.course = Course.objects.create(
+            teacher=self.teacher, title='Test Course', description='Test Description', category='Programming'
+        )
+        module = Module.objects.create(course=self.course, title='Module', description='Test', order=1)
+        lesson = Lesson.objects.create(module=module, title='Lesson', content='Test', order=1)
+        self.assignment = Assignment.objects.create(lesson=lesson, title='Homework', description='Test')
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, user, kind, body, target=None, content_type='text/plain'):
+        self.client.force_authenticate(user=user)
+        data = {'kind': kind, 'filename': 'answer.txt', 'content_type': content_type}
+        if target is not None:
+            data['target'] = target
+        response = self.client.post(reverse('upload-target'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        put = self.client.generic('PUT', response.data['url'], body, content_type=content_type)
+        return response.data, put
+
+    def png(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), color='navy').save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def test_submission_upload_flow(self):
+        target, put = self.upload(self.student, 'submission', b'my answer', target=self.assignment.id)
+        self.assertEqual(put.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.post(reverse('upload-complete'), {'token': target['token']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        submission = Submission.objects.get()
+        self.assertEqual(submission.submitted_file.name, target['key'])
+        self.assertEqual(submission.student, self.student)
+
+    def test_oversized_upload_is_refused(self):
+        target, put = self.upload(self.student, 'avatar', b'x' * (1024 * 1024 + 1), content_type='image/png')
+        self.assertEqual(put.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('upload-complete'), {'token': target['token']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_course_image_requires_ownership(self):
+        other = User.objects.create_user(
+            email='other@example.com', password='teacher123', phone_number='+998901234560', role='teacher'
+        )
+        self.client.force_authenticate(user=other)
+        response = self.client.post(reverse('upload-target'), {
+            'kind': 'course_image', 'filename': 'cover.png', 'content_type': 'image/png', 'target': self.course.id
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        target, put = self.upload(self.teacher, 'course_image', self.png(), target=self.course.id,
+                                  content_type='image/png')
+        response = self.client.post(reverse('upload-complete'), {'token': target['token']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.image.name, target['key'])
+
+    def test_image_kinds_only_take_images(self):
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post(reverse('upload-target'), {
+            'kind': 'avatar', 'filename': 'page.html', 'content_type': 'text/html'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('content_type', response.data)
+
+        target, _ = self.upload(self.student, 'avatar', b'<html></html>', content_type='image/png')
+        response = self.client.post(reverse('upload-complete'), {'token': target['token']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(default_storage.exists(target['key']))
+        self.student.refresh_from_db()
+        self.assertFalse(self.student.avatar)
+
+    @override_settings(IMAGE_MAX_PIXELS=32)
+    def test_image_dimensions_are_checked_from_the_header(self):
+        target, _ = self.upload(self.student, 'avatar', self.png(), content_type='image/png')
+        with patch.object(LocalUploadBackend, 'read_head', autospec=True,
+                          side_effect=LocalUploadBackend.read_head) as read_head:
+            response = self.client.post(reverse('upload-complete'), {'token': target['token']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(read_head.call_args.args[2], SNIFF_BYTES)
+
+    def test_assignment_closed_before_completion(self):
+        target, _ = self.upload(self.student, 'submission', b'my answer', target=self.assignment.id)
+        Assignment.objects.filter(pk=self.assignment.pk).update(is_active=False)
+        response = self.client.post(reverse('upload-complete'), {'token': target['token']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Submission.objects.exists())
+        self.assertFalse(default_storage.exists(target['key']))
+
+    def test_avatar_upload_drops_cached_token_snapshots(self):
+        token = Token.objects.create(user=self.student)
+        token_cache.set(token.key, {'user_id': self.student.pk, 'created': token.created, 'values': ()})
+        target, _ = self.upload(self.student, 'avatar', self.png(), content_type='image/png')
+        response = self.client.post(reverse('upload-complete'), {'token': target['token']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(token_cache.get(token.key))
+
+    def test_token_is_bound_to_its_user(self):
+        target, _ = self.upload(self.student, 'avatar', b'avatar', content_type='image/png')
+        self.client.force_authenticate(user=self.teacher)
+        response = self.client.post(reverse('upload-complete'), {'token': target['token']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ImageDerivativeTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_DERIVATIVES_ASYNC=False)
+        self.override.enable()
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+        self.client.force_authenticate(user=self.teacher)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def png(self, size=(1200, 800)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color='navy').save(buffer, format='PNG')
+        return SimpleUploadedFile('cover.png', buffer.getvalue(), content_type='image/png')
+
+    def create_course(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('course-list'), {
+                'title': 'Illustrated Course', 'description': 'Test', 'category': 'Programming',
+                'image': self.png()
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Course.objects.get(pk=response.data['id'])
+
+    def test_variants_are_generated_next_to_the_original(self):
+        course = self.create_course()
+        self.assertEqual(course.image_variants['source'], course.image.name)
+        small = course.image_variants['small']
+        self.assertTrue(small.endswith('_small.webp'))
+        with Image.open(f'{self.media_root}/{small}') as variant:
+            self.assertEqual(max(variant.size), 160)
+
+        response = self.client.get(reverse('course-detail', args=[course.id]))
+        self.assertTrue(response.data['image_small'].endswith('_small.webp'))
+        self.assertTrue(response.data['image_medium'].endswith('_medium.webp'))
+
+    def test_landing_variants_moves_the_etag_on(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post(reverse('course-list'), {
+                'title': 'Illustrated Course', 'description': 'Test', 'category': 'Programming',
+                'image': self.png()
+            }, format='multipart')
+        url = reverse('course-detail', args=[response.data['id']])
+        # As if the upload happened a minute before the variants were done.
+        Course.objects.filter(pk=response.data['id']).update(updated_at=timezone.now() - timezone.timedelta(minutes=1))
+        etag = self.client.get(url)['ETag']
+        for callback in callbacks:
+            callback()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['image_small'].endswith('_small.webp'))
+
+    def test_non_image_sources_are_skipped(self):
+        name = default_storage.save('course_images/page.png', ContentFile(b'<html></html>'))
+        course = Course.objects.create(title='A', description='A', teacher=self.teacher, category='Programming')
+        Course.objects.filter(pk=course.pk).update(image=name)
+        with self.assertLogs('core.images', level='WARNING'):
+            self.assertIsNone(generate_derivatives('core.course', course.pk, name))
+        course.refresh_from_db()
+        self.assertEqual(course.image_variants, {})
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_oversized_images_are_not_decoded(self):
+        course = self.create_course()
+        self.assertEqual(course.image_variants, {})
+        response = self.client.get(reverse('course-detail', args=[course.id]))
+        self.assertEqual(response.data['image_small'], response.data['image'])
+
+
+class CertificateIssueTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=self.media_root, CERTIFICATE_WORKERS=1
+        )
+        self.override.enable()
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+        self.other_teacher = User.objects.create_user(
+            email='other@example.com',
+            password='other123',
+            phone_number='+998901234569',
+            role='teacher'
+        )
+        self.course = Course.objects.create(
+            title='Test Course', description='Test', teacher=self.teacher, category='Programming'
+        )
+        self.students = []
+        for n, progress in enumerate([100, 100, 40]):
+            student = User.objects.create_user(
+                email=f'student{n}@example.com',
+                password='student123',
+                phone_number=f'+99890123457{n}',
+                role='student'
+            )
+            enrollment = Enrollment.objects.create(user=student, course=self.course)
+            Enrollment.objects.filter(pk=enrollment.pk).update(progress=progress)
+            self.students.append(student)
+        self.client.force_authenticate(user=self.teacher)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def issue(self, **data):
+        return self.client.post(reverse('certificate-issue-bulk'), {'course': self.course.id, **data})
+
+    def run_jobs(self):
+        call_command('issue_certificates', '--once', stdout=io.StringIO())
+
+    def test_bulk_issue_renders_pdfs_for_completed_enrollments(self):
+        response = self.issue()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['issued'], 2)
+        self.assertEqual(response.data['status'], 'pending')
+        self.run_jobs()
+
+        certificates = Certificate.objects.filter(course=self.course)
+        self.assertEqual({c.user_id for c in certificates}, {self.students[0].id, self.students[1].id})
+        for certificate in certificates:
+            with open(f'{self.media_root}/{certificate.file.name}', 'rb') as pdf:
+                self.assertEqual(pdf.read(4), b'%PDF')
+
+        job = self.client.get(reverse('certificate-job', args=[response.data['id']]))
+        self.assertEqual(job.data['status'], 'done')
+        self.assertEqual(job.data['rendered'], 2)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.certificate_count, 2)
+
+    def test_bulk_issue_skips_existing_certificates(self):
+        self.issue()
+        self.run_jobs()
+        response = self.issue(min_progress=40)
+        self.assertEqual(response.data['issued'], 1)
+        self.assertEqual(Certificate.objects.filter(course=self.course).count(), 3)
+        self.run_jobs()
+        self.assertEqual(CertificateIssueJob.objects.get(pk=response.data['id']).rendered, 1)
+
+    def test_issued_counts_only_inserted_certificates(self):
+        # A row already holding the first student's number makes that insert a skipped conflict.
+        Certificate.objects.create(user=self.other_teacher, course=self.course,
+                                   certificate_number=certificate_number(self.course.pk, self.students[0].pk))
+        response = self.issue()
+        self.assertEqual(response.data['issued'], 1)
+        self.assertEqual(Certificate.objects.filter(course=self.course).count(), 2)
+
+    def test_abandoned_jobs_are_resumed(self):
+        job_id = self.issue().data['id']
+        # A worker died after rendering one certificate; its lease has run out.
+        rendered = Certificate.objects.filter(course=self.course).first()
+        Certificate.objects.filter(pk=rendered.pk).update(file='certificates/rendered.pdf')
+        CertificateIssueJob.objects.filter(pk=job_id).update(
+            status='running', rendered=1, locked_until=timezone.now() - timezone.timedelta(seconds=1)
+        )
+        self.run_jobs()
+        job = CertificateIssueJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.rendered, job.locked_until), ('done', 2, None))
+        self.assertEqual(Certificate.objects.get(pk=rendered.pk).file.name, 'certificates/rendered.pdf')
+
+    def test_one_job_per_course_at_a_time(self):
+        first = self.issue().data['id']
+        second = CertificateIssueJob.objects.create(course=self.course, requested_by=self.teacher)
+        self.assertEqual(claim_job().pk, first)
+        # The first job's lease is live, so the second waits instead of rendering the same certificates.
+        self.assertIsNone(claim_job())
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'pending')
+
+    def test_certificate_numbers_are_deterministic(self):
+        self.issue()
+        certificate = Certificate.objects.get(course=self.course, user=self.students[0])
+        self.assertTrue(certificate.certificate_number.startswith(f'CRT-{self.course.id}-{self.students[0].id}-'))
+
+    def test_teacher_cannot_issue_for_foreign_course(self):
+        self.client.force_authenticate(user=self.other_teacher)
+        response = self.issue()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(CertificateIssueJob.objects.exists())
+
+    def test_jobs_are_private_to_the_requester(self):
+        job_id = self.issue().data['id']
+        self.client.force_authenticate(user=self.other_teacher)
+        response = self.client.get(reverse('certificate-job', args=[job_id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ConversationTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234567',
+            role='student'
+        )
+        self.teachers = [
+            User.objects.create_user(
+                email=f'teacher{n}@example.com',
+                password='teacher123',
+                phone_number=f'+99890123458{n}',
+                role='teacher'
+            )
+            for n in range(3)
+        ]
+        self.client.force_authenticate(user=self.student)
+
+    def send(self, sender, receiver, content):
+        return Message.objects.create(sender=sender, receiver=receiver, content=content)
+
+    def test_messages_are_indexed_by_conversation(self):
+        self.send(self.student, self.teachers[0], 'Hello')
+        reply = self.send(self.teachers[0], self.student, 'Hi there')
+        self.send(self.teachers[0], self.student, 'How can I help?')
+
+        conversation = Conversation.objects.get()
+        self.assertEqual(conversation.messages.count(), 3)
+        mine = ConversationMember.objects.get(user=self.student)
+        theirs = ConversationMember.objects.get(user=self.teachers[0])
+        self.assertEqual((mine.unread_count, theirs.unread_count), (2, 1))
+
+        reply.read_status = True
+        reply.save()
+        mine.refresh_from_db()
+        self.assertEqual(mine.unread_count, 1)
+
+        Message.objects.filter(conversation=conversation).order_by('-id').first().delete()
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message_id, reply.id)
+
+    def test_inbox_lists_threads_by_latest_message(self):
+        for teacher in self.teachers:
+            self.send(teacher, self.student, f'From {teacher.email}')
+        self.send(self.student, self.teachers[0], 'Reply')
+
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('message-conversations'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([item['peer']['id'] for item in results],
+                         [self.teachers[0].id, self.teachers[2].id, self.teachers[1].id])
+        self.assertEqual(results[0]['last_message']['content'], 'Reply')
+        self.assertEqual([item['unread_count'] for item in results], [1, 1, 1])
+
+    def test_history_is_cursor_paginated(self):
+        for n in range(15):
+            self.send(self.teachers[0], self.student, f'Message {n}')
+        self.send(self.teachers[1], self.student, 'Elsewhere')
+        conversation = Conversation.objects.get(user_high=self.teachers[0])
+
+        url = reverse('message-conversation', args=[conversation.id])
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(item['content'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [f'Message {n}' for n in reversed(range(15))])
+
+    def test_history_is_private_to_participants(self):
+        self.send(self.teachers[0], self.teachers[1], 'Staff only')
+        conversation = Conversation.objects.get()
+        response = self.client.get(reverse('message-conversation', args=[conversation.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_recompute_attaches_bulk_created_messages(self):
+        Message.objects.bulk_create([
+            Message(sender=self.teachers[0], receiver=self.student, content=f'Bulk {n}') for n in range(3)
+        ])
+        call_command('recompute_conversations', stdout=io.StringIO())
+        member = ConversationMember.objects.get(user=self.student)
+        self.assertEqual(member.unread_count, 3)
+        self.assertEqual(member.conversation.messages.count(), 3)
+
+
+class UnreadCounterTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234567',
+            role='student'
+        )
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com',
+            password='other123',
+            phone_number='+998901234569',
+            role='teacher'
+        )
+        self.messages = [
+            Message.objects.create(sender=self.teacher, receiver=self.student, content=f'Message {n}')
+            for n in range(4)
+        ]
+        Message.objects.create(sender=self.other, receiver=self.student, content='Other')
+        Message.objects.create(sender=self.student, receiver=self.teacher, content='Outgoing')
+        self.client.force_authenticate(user=self.student)
+
+    def unread(self):
+        return self.client.get(reverse('message-unread-count')).data['unread_count']
+
+    def test_unread_count_is_served_from_the_mailbox(self):
+        with self.assertMaxQueries(1):
+            self.assertEqual(self.unread(), 5)
+        self.assertEqual(Mailbox.objects.get(user=self.teacher).unread_count, 1)
+
+    def test_mark_read_by_ids(self):
+        ids = [self.messages[0].id, self.messages[1].id, Message.objects.get(content='Outgoing').id]
+        response = self.client.post(reverse('message-mark-read'), {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The outgoing message is not the student's to mark.
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['unread_count'], 3)
+        self.assertEqual(ConversationMember.objects.get(user=self.student, peer=self.teacher).unread_count, 2)
+        self.assertFalse(Message.objects.get(content='Outgoing').read_status)
+
+    def test_mark_read_up_to_timestamp_from_sender(self):
+        Message.objects.filter(pk__in=[m.id for m in self.messages[2:]]).update(
+            timestamp=timezone.now() + timezone.timedelta(hours=1)
+        )
+        with self.assertMaxQueries(8):
+            response = self.client.post(reverse('message-mark-read'), {
+                'sender': self.teacher.id, 'before': timezone.now().isoformat()
+            }, format='json')
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(self.unread(), 3)
+        self.assertEqual(ConversationMember.objects.get(user=self.student, peer=self.other).unread_count, 1)
+
+    def test_mark_read_requires_one_selector(self):
+        response = self.client.post(reverse('message-mark-read'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RealtimeTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234567',
+            role='student'
+        )
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+
+    def send(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(sender=self.student, receiver=self.teacher, content=content)
+
+    def test_new_messages_are_pushed_to_both_participants(self):
+        async def scenario():
+            hub = get_hub()
+            async with hub.subscribe(self.teacher.pk) as teacher, hub.subscribe(self.student.pk) as student:
+                message = await sync_to_async(self.send)('Hello')
+                received = await asyncio.wait_for(teacher.get(), 1)
+                echoed = await asyncio.wait_for(student.get(), 1)
+            return message, received, echoed
+
+        message, received, echoed = async_to_sync(scenario)()
+        self.assertEqual(received, echoed)
+        self.assertEqual(received['type'], 'message')
+        self.assertEqual(received['data']['id'], message.id)
+        self.assertEqual(received['data']['conversation'], message.conversation_id)
+        self.assertEqual(get_hub().connected(self.teacher.pk), 0)
+
+    def test_mark_read_pushes_a_receipt_to_the_sender(self):
+        message = self.send('Hello')
+        self.client.force_authenticate(user=self.teacher)
+
+        def mark_read():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('message-mark-read'), {'ids': [message.id]}, format='json')
+
+        async def scenario():
+            async with get_hub().subscribe(self.student.pk) as student:
+                await sync_to_async(mark_read)()
+                return await asyncio.wait_for(student.get(), 1)
+
+        receipt = async_to_sync(scenario)()
+        self.assertEqual(receipt['type'], 'read')
+        self.assertEqual(receipt['data']['conversation'], message.conversation_id)
+        self.assertEqual(receipt['data']['reader'], self.teacher.id)
+
+    def test_slow_clients_are_told_to_resync(self):
+        async def scenario():
+            subscription = Subscription(asyncio.get_running_loop(), maxsize=2)
+            for n in range(3):
+                subscription.put({'type': 'message', 'data': {'id': n}})
+            await asyncio.sleep(0)
+            return await subscription.get()
+
+        self.assertEqual(async_to_sync(scenario)(), RESYNC)
+
+    async def test_stream_delivers_server_sent_events(self):
+        token = await sync_to_async(Token.objects.create)(user=self.teacher)
+        response = await self.async_client.get(
+            reverse('message-stream'), headers={'authorization': f'Token {token.key}'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        try:
+            self.assertTrue((await anext(stream)).startswith(b'retry:'))
+            get_broker().publish(self.teacher.pk, {'type': 'read', 'data': {'conversation': 1}})
+            self.assertEqual(await anext(stream), b'event: read\ndata: {"conversation": 1}\n\n')
+        finally:
+            await stream.aclose()
+
+    async def test_stream_requires_authentication(self):
+        response = await self.async_client.get(reverse('message-stream'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class MessageSearchTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234567',
+            role='student'
+        )
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher'
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com',
+            password='other123',
+            phone_number='+998901234569',
+            role='teacher'
+        )
+        for n in range(12):
+            Message.objects.create(sender=self.teacher, receiver=self.student, content=f'Homework {n} is due <soon>')
+        Message.objects.create(sender=self.student, receiver=self.teacher, content='Where is the homework?')
+        Message.objects.create(sender=self.student, receiver=self.teacher, content='Unrelated note')
+        Message.objects.create(sender=self.teacher, receiver=self.other, content='Homework for staff only')
+        self.client.force_authenticate(user=self.student)
+
+    def test_search_is_scoped_to_the_callers_mailbox(self):
+        url = reverse('message-search') + '?q=homework'
+        seen = []
+        while url:
+            with self.assertMaxQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 13)
+        self.assertEqual([item['id'] for item in seen], sorted((item['id'] for item in seen), reverse=True))
+        self.assertNotIn('staff', ' '.join(item['snippet'] for item in seen))
+
+    def test_snippets_highlight_matches_and_escape_content(self):
+        response = self.client.get(reverse('message-search') + '?q=due')
+        snippet = response.data['results'][0]['snippet']
+        self.assertIn('<mark>due</mark>', snippet)
+        self.assertIn('&lt;soon&gt;', snippet)
+
+    def test_search_within_a_conversation(self):
+        conversation = Conversation.objects.get(user_low=self.student, user_high=self.teacher)
+        response = self.client.get(reverse('message-search') + f'?q=homework&conversation={conversation.id}&page_size=50')
+        self.assertEqual(len(response.data['results']), 13)
+
+    def test_list_search_uses_the_index(self):
+        response = self.client.get(reverse('message-list') + '?search=unrelated')
+        self.assertEqual(response.data['count'], 1)
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(reverse('message-list') + '?search=unrelated')
+        self.assertEqual(response.data['count'], 0)
+
+    def test_deleted_messages_leave_the_index(self):
+        Message.objects.get(content='Unrelated note').delete()
+        response = self.client.get(reverse('message-search') + '?q=unrelated')
+        self.assertEqual(response.data['results'], [])
+
+    def test_empty_query_is_rejected(self):
+        response = self.client.get(reverse('message-search'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FakeTelegramServer:
+    """Local stand-in for the Bot API: records sendMessage calls and replays scripted errors."""
+
+    def __init__(self):
+        self.requests = []
+        self.errors = {}  # chat_id -> (status, payload) for the next call
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                server.requests.append((self.path, body))
+                status_code, payload = server.errors.pop(body['chat_id'], (200, None))
+                if len(body['text'].encode('utf-16-le')) > 4096 * 2:
+                    status_code, payload = 400, {'ok': False, 'description': 'Bad Request: message is too long'}
+                if payload is None:
+                    payload = {'ok': True, 'result': {'message_id': 1000 + len(server.requests)}}
+                data = json.dumps(payload).encode()
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TelegramOutboxTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234567',
+            role='student',
+            full_name='Student'
+        )
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            phone_number='+998901234568',
+            role='teacher',
+            telegram_chat_id='5001'
+        )
+        self.client.force_authenticate(user=self.student)
+        self.server = FakeTelegramServer().__enter__()
+        self.override = override_settings(
+            TELEGRAM_API_URL=self.server.url, TELEGRAM_BOT_TOKEN='test-token',
+            TELEGRAM_TRANSPORT='core.telegram.BotApiTransport', TELEGRAM_CHAT_INTERVAL=0
+        )
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        self.server.__exit__()
+
+    def send(self, content, receiver=None):
+        response = self.client.post(reverse('message-list'), {
+            'receiver': (receiver or self.teacher).id, 'content': content, 'via_telegram': True
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Message.objects.get(pk=response.data['id'])
+
+    def test_message_creation_enqueues_without_sending(self):
+        message = self.send('Hello')
+        delivery = TelegramDelivery.objects.get(message=message)
+        self.assertEqual((delivery.status, delivery.chat_id), ('pending', '5001'))
+        self.assertEqual(self.server.requests, [])
+
+    def test_receivers_without_a_chat_are_skipped(self):
+        other = User.objects.create_user(
+            email='other@example.com', password='other123', phone_number='+998901234569', role='teacher'
+        )
+        self.send('Hello', receiver=other)
+        self.assertFalse(TelegramDelivery.objects.exists())
+
+    def test_dispatch_sends_and_writes_back_message_ids(self):
+        first, second = self.send('Hello'), self.send('Are you there?')
+        self.assertEqual(dispatch_batch(), 2)
+
+        self.assertEqual([body['text'] for _, body in self.server.requests],
+                         ['Student: Hello', 'Student: Are you there?'])
+        self.assertTrue(self.server.requests[0][0].startswith('/bottest-token/sendMessage'))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.telegram_message_id, second.telegram_message_id), ('1001', '1002'))
+        self.assertFalse(TelegramDelivery.objects.exclude(status='sent').exists())
+        self.assertEqual(dispatch_batch(), 0)
+
+    def test_flood_errors_are_retried_after_the_requested_delay(self):
+        message = self.send('Hello')
+        self.server.errors['5001'] = (429, {'ok': False, 'description': 'Too Many Requests',
+                                            'parameters': {'retry_after': 30}})
+        dispatch_batch()
+        delivery = TelegramDelivery.objects.get(message=message)
+        self.assertEqual((delivery.status, delivery.attempts), ('pending', 1))
+        self.assertGreater(delivery.next_attempt_at, timezone.now() + timezone.timedelta(seconds=25))
+        self.assertEqual(dispatch_batch(), 0)
+
+        TelegramDelivery.objects.update(next_attempt_at=timezone.now())
+        dispatch_batch()
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'sent')
+
+    def test_long_messages_are_clipped_to_the_limit(self):
+        message = self.send('😀' * 3000)
+        dispatch_batch()
+        self.assertEqual(TelegramDelivery.objects.get(message=message).status, 'sent')
+        text = self.server.requests[0][1]['text']
+        self.assertEqual(len(text.encode('utf-16-le')), 4096 * 2)
+        self.assertTrue(text.endswith('😀…'))
+
+    def test_permanent_errors_fail_the_delivery(self):
+        message = self.send('Hello')
+        self.server.errors['5001'] = (403, {'ok': False, 'description': 'Forbidden: bot was blocked by the user'})
+        dispatch_batch()
+        delivery = TelegramDelivery.objects.get(message=message)
+        self.assertEqual(delivery.status, 'failed')
+        self.assertIn('blocked', delivery.last_error)
+
+    def test_rate_limiter_spaces_messages_per_chat(self):
+        limiter = RateLimiter(per_chat=0.05, global_rate=0)
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.wait('5001')
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        # Another chat is not held back by the first one's spacing.
+        start = time.monotonic()
+        limiter.wait('5002')
+        self.assertLess(time.monotonic() - start, 0.05)
+
+    def test_dispatcher_keeps_one_limiter_across_batches(self):
+        with patch('core.management.commands.dispatch_telegram.dispatch_batch', side_effect=[2, 1, 0]) as batch, \
+                patch('core.management.commands.dispatch_telegram.time.sleep', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('dispatch_telegram', stdout=io.StringIO())
+        limiters = {call.kwargs['limiter'] for call in batch.call_args_list}
+        self.assertEqual(len(batch.call_args_list), 3)
+        self.assertEqual(len(limiters), 1)
+        self.assertIsInstance(limiters.pop(), RateLimiter)
+
+
+def throttle_settings(**rates):
+    return override_settings(
+        THROTTLE_ENABLED=True,
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates},
+    )
+
+
+class ThrottlingTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        get_throttle_backend().clear()
+        self.student = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234567',
+            role='student'
+        )
+
+    @throttle_settings(login='3/min')
+    def test_login_is_throttled_per_ip_with_retry_after(self):
+        url = reverse('login')
+        for _ in range(3):
+            self.client.post(url, {'email': 'student@example.com', 'password': 'wrong'})
+        response = self.client.post(url, {'email': 'student@example.com', 'password': 'student123'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertLessEqual(int(response['Retry-After']), 120)
+        other_ip = self.client.post(url, {'email': 'student@example.com', 'password': 'student123'},
+                                    REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other_ip.status_code, status.HTTP_200_OK)
+
+    @throttle_settings(login='1/min')
+    def test_forwarded_for_cannot_dodge_the_ip_limit(self):
+        url = reverse('login')
+        data = {'email': 'student@example.com', 'password': 'wrong'}
+        self.client.post(url, data, HTTP_X_FORWARDED_FOR='203.0.113.1')
+        response = self.client.post(url, data, HTTP_X_FORWARDED_FOR='203.0.113.2')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @throttle_settings(ip='2/min', user='100/min')
+    def test_anonymous_ip_limit_spares_authenticated_users(self):
+        url = reverse('course-list')
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.client.force_authenticate(user=self.student)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    @throttle_settings(messages='1/min')
+    def test_scopes_only_charge_writes(self):
+        self.client.force_authenticate(user=self.student)
+        teacher = User.objects.create_user(
+            email='teacher@example.com', password='teacher123', phone_number='+998901234568', role='teacher'
+        )
+        url = reverse('message-list')
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post(url, {'receiver': teacher.id, 'content': 'Hi'}).status_code,
+                         status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(url, {'receiver': teacher.id, 'content': 'Hi'}).status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @throttle_settings(user='10/min')
+    def test_previous_window_fades_out(self):
+        throttle = UserRateThrottle()
+        request = Mock(user=self.student)
+        start = 600 * 60 + 50
+        with patch('core.throttling.time.time', return_value=start):
+            self.assertEqual(sum(throttle.allow_request(request, None) for _ in range(12)), 10)
+            # Six seconds into the next window the full one weighs 9: room for one more.
+            self.assertEqual(throttle.wait(), 16)
+        # A quarter into the next window, the last one still weighs 7.5.
+        with patch('core.throttling.time.time', return_value=start + 25):
+            self.assertEqual(sum(throttle.allow_request(request, None) for _ in range(5)), 3)
+
+    @throttle_settings(user='1000/min')
+    def test_throttling_costs_no_query(self):
+        self.client.force_authenticate(user=self.student)
+        url = reverse('message-unread-count')
+        self.client.get(url)
+        with self.assertMaxQueries(1):
+            self.client.get(url)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                       THROTTLE_BACKEND='core.throttling.CacheThrottleBackend')
+    @throttle_settings(user='2/min')
+    def test_cache_backend_shares_counters(self):
+        request = Mock(user=self.student)
+        with patch('core.throttling.time.time', return_value=120):
+            self.assertTrue(UserRateThrottle().allow_request(request, None))
+            self.assertTrue(UserRateThrottle().allow_request(request, None))
+            self.assertFalse(UserRateThrottle().allow_request(request, None))
+            # What another process's backend reads.
+            self.assertEqual(CacheThrottleBackend().get(f'user:{self.student.pk}', 2), (2, 0))
+
+    def test_local_backend_drops_expired_keys_by_their_own_clock(self):
+        now = time.time()
+        minute, hour = int(now // 60), int(now // 3600)
+        backend = LocalThrottleBackend(maxsize=2)
+        backend.incr('register:ip1', hour, 3600)
+        backend.incr('ip:old', minute - 5, 60)
+        backend.incr('ip:new', minute, 60)
+        self.assertEqual(list(backend.counters), ['register:ip1', 'ip:new'])
+        self.assertEqual(backend.get('register:ip1', hour), (1, 0))
+        self.assertEqual(backend.get('ip:new', minute + 1), (0, 1))
+
+    def test_local_backend_sweeps_at_most_once_per_interval(self):
+        minute = int(time.time() // 60)
+        backend = LocalThrottleBackend(maxsize=2)
+        backend.incr('a', minute, 60)
+        backend.incr('b', minute, 60)
+        with patch.object(backend.counters, 'items', wraps=backend.counters.items) as items:
+            for key in 'cdef':
+                backend.incr(key, minute, 60)
+        self.assertEqual(items.call_count, 1)
+        # Over the limit with every key live, the least recently counted go first.
+        self.assertEqual(list(backend.counters), ['e', 'f'])
+
+
+class OwnershipTests(APITestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com', password='teacher123', phone_number='+998901234568', role='teacher'
+        )
+        self.other_teacher = User.objects.create_user(
+            email='other@example.com', password='teacher123', phone_number='+998901234569', role='teacher'
+        )
+        self.student = User.objects.create_user(
+            email='student@example.com', password='student123', phone_number='+998901234567', role='student'
+        )
+        self.course = Course.objects.create(title='A', description='A', teacher=self.teacher, category='Programming')
+        self.other_course = Course.objects.create(
+            title='B', description='B', teacher=self.other_teacher, category='Programming'
+        )
+        self.module = Module.objects.create(course=self.course, title='Module', description='Test', order=1)
+        self.lesson = Lesson.objects.create(module=self.module, title='Lesson', content='Test', order=1)
+        self.assignment = Assignment.objects.create(lesson=self.lesson, title='Homework', description='Test')
+        self.submission = Submission.objects.create(
+            assignment=self.assignment, student=self.student, submitted_file='submissions/a.txt'
+        )
+        self.progress = LessonProgress.objects.create(user=self.student, lesson=self.lesson, status='completed')
+
+    def owners(self):
+        return {
+            (obj.course_id, obj.teacher_id)
+            for obj in (
+                Lesson.objects.get(pk=self.lesson.pk), Assignment.objects.get(pk=self.assignment.pk),
+                Submission.objects.get(pk=self.submission.pk), LessonProgress.objects.get(pk=self.progress.pk),
+            )
+        }
+
+    def test_rows_copy_their_course_and_teacher(self):
+        self.assertEqual(self.owners(), {(self.course.pk, self.teacher.pk)})
+
+    def test_moving_a_module_moves_everything_below_it(self):
+        self.module.course = self.other_course
+        self.module.save()
+        self.assertEqual(self.owners(), {(self.other_course.pk, self.other_teacher.pk)})
+
+    def test_moving_a_lesson_moves_its_assignments_and_progress(self):
+        other_module = Module.objects.create(course=self.other_course, title='Module', description='Test', order=1)
+        self.lesson.module = other_module
+        self.lesson.save()
+        self.assertEqual(self.owners(), {(self.other_course.pk, self.other_teacher.pk)})
+
+    def test_reassigning_the_course_teacher(self):
+        course = Course.objects.get(pk=self.course.pk)
+        course.teacher = self.other_teacher
+        course.save()
+        self.assertEqual(self.owners(), {(self.course.pk, self.other_teacher.pk)})
+
+    def test_teacher_querysets_skip_the_join_chain(self):
+        for viewset, expected in ((SubmissionViewSet, self.submission), (LessonProgressViewSet, self.progress)):
+            queryset = viewset(request=Mock(user=self.teacher)).get_queryset()
+            self.assertNotIn('core_module', str(queryset.query))
+            self.assertEqual(list(queryset), [expected])
+            self.assertFalse(viewset(request=Mock(user=self.other_teacher)).get_queryset().exists())
+
+    def test_bulk_progress_and_recompute_command(self):
+        self.client.force_authenticate(user=self.student)
+        lesson = Lesson.objects.create(module=self.module, title='Second', content='Test', order=2)
+        response = self.client.post(reverse('lesson-progress-bulk'), {'items': [
+            {'lesson': lesson.pk, 'status': 'completed'}
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        progress = LessonProgress.objects.get(lesson=lesson)
+        self.assertEqual((progress.course_id, progress.teacher_id), (self.course.pk, self.teacher.pk))
+
+        Submission.objects.filter(pk=self.submission.pk).update(teacher=self.other_teacher)
+        call_command('recompute_ownership', stdout=io.StringIO())
+        self.assertEqual(self.owners(), {(self.course.pk, self.teacher.pk)})
+
+
+class GradingQueueTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com', password='teacher123', phone_number='+998901234568', role='teacher'
+        )
+        self.grader = User.objects.create_user(
+            email='grader@example.com', password='admin123', phone_number='+998901234569', role='admin'
+        )
+        self.student = User.objects.create_user(
+            email='student@example.com', password='student123', phone_number='+998901234567', role='student'
+        )
+        course = Course.objects.create(title='A', description='A', teacher=self.teacher, category='Programming')
+        module = Module.objects.create(course=course, title='Module', description='Test', order=1)
+        lesson = Lesson.objects.create(module=module, title='Lesson', content='Test', order=1)
+        self.submissions = [
+            Submission.objects.create(
+                assignment=Assignment.objects.create(lesson=lesson, title=f'Homework {i}', description='Test'),
+                student=self.student, submitted_file=f'submissions/{i}.txt'
+            )
+            for i in range(4)
+        ]
+        self.submissions[3].status = 'looked'
+        self.submissions[3].save()
+        self.url = reverse('grading-queue-list')
+
+    def ids(self, response):
+        return [item['id'] for item in response.data['results']]
+
+    def test_queue_lists_ungraded_work_of_own_courses_oldest_first(self):
+        self.client.force_authenticate(user=self.teacher)
+        with self.assertMaxQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ids(response), [s.pk for s in self.submissions[:3]])
+
+        other = User.objects.create_user(
+            email='other@example.com', password='teacher123', phone_number='+998901234570', role='teacher'
+        )
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.ids(self.client.get(self.url)), [])
+        self.client.force_authenticate(user=self.student)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_claims_do_not_overlap_and_expired_leases_are_taken_over(self):
+        self.client.force_authenticate(user=self.teacher)
+        response = self.client.post(reverse('grading-queue-claim'), {'count': 2}, format='json')
+        self.assertEqual(self.ids(response), [s.pk for s in self.submissions[:2]])
+        self.assertTrue(all(item['status'] == 'in_progress' for item in response.data['results']))
+
+        self.client.force_authenticate(user=self.grader)
+        response = self.client.post(reverse('grading-queue-claim'), {'count': 5}, format='json')
+        self.assertEqual(self.ids(response), [self.submissions[2].pk])
+        response = self.client.get(self.url, {'available': 'true'})
+        self.assertEqual(self.ids(response), [self.submissions[2].pk])
+
+        Submission.objects.filter(pk=self.submissions[0].pk).update(
+            claimed_until=timezone.now() - timezone.timedelta(seconds=1)
+        )
+        response = self.client.post(reverse('grading-queue-claim'), {'count': 5}, format='json')
+        self.assertEqual(self.ids(response), [self.submissions[0].pk])
+
+    def test_release_returns_claims_to_the_queue(self):
+        self.client.force_authenticate(user=self.teacher)
+        self.client.post(reverse('grading-queue-claim'), {'count': 1}, format='json')
+        ids = [self.submissions[0].pk]
+        self.client.force_authenticate(user=self.grader)
+        self.assertEqual(self.client.post(reverse('grading-queue-release'), {'ids': ids}, format='json').data,
+                         {'released': 0})
+        self.client.force_authenticate(user=self.teacher)
+        self.assertEqual(self.client.post(reverse('grading-queue-release'), {'ids': ids}, format='json').data,
+                         {'released': 1})
+        submission = Submission.objects.get(pk=ids[0])
+        self.assertEqual((submission.status, submission.claimed_by_id), ('not_looked', None))
+
+    def test_mark_looked_is_one_update_and_respects_other_claims(self):
+        self.client.force_authenticate(user=self.grader)
+        self.client.post(reverse('grading-queue-claim'), {'count': 1}, format='json')
+
+        self.client.force_authenticate(user=self.teacher)
+        ids = [s.pk for s in self.submissions]
+        with self.assertMaxQueries(1):
+            response = self.client.post(reverse('grading-queue-mark-looked'), {'ids': ids}, format='json')
+        self.assertEqual(response.data, {'updated': 2, 'skipped': 2})
+        self.assertEqual(
+            dict(Submission.objects.values_list('pk', 'status')),
+            {ids[0]: 'in_progress', ids[1]: 'looked', ids[2]: 'looked', ids[3]: 'looked'}
+        )
+        self.assertEqual(self.client.post(reverse('grading-queue-mark-looked'), {'ids': []}, format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+
+class AnalyticsRollupTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com', password='teacher123', phone_number='+998901234568', role='teacher'
+        )
+        self.students = [
+            User.objects.create_user(
+                email=f'student{n}@example.com', password='student123', phone_number=f'+99890123457{n}',
+                role='student'
+            )
+            for n in range(2)
+        ]
+        self.course = Course.objects.create(title='A', description='A', teacher=self.teacher, category='Programming')
+        self.modules, self.lessons = [], []
+        for n in range(2):
+            module = Module.objects.create(course=self.course, title=f'Module {n}', description='Test', order=n)
+            self.modules.append(module)
+            self.lessons.append(Lesson.objects.create(module=module, title='Lesson', content='Test', order=1))
+        self.moment = timezone.now().replace(minute=30, second=0, microsecond=0) - timezone.timedelta(hours=1)
+        on_time = Assignment.objects.create(
+            lesson=self.lessons[0], title='On time', description='Test', due_date=self.moment.date()
+        )
+        late = Assignment.objects.create(
+            lesson=self.lessons[0], title='Late', description='Test',
+            due_date=self.moment.date() - timezone.timedelta(days=1)
+        )
+        for student, assignment in zip(self.students, (on_time, late)):
+            Enrollment.objects.create(user=student, course=self.course)
+            Submission.objects.create(assignment=assignment, student=student, submitted_file='submissions/a.txt')
+        Enrollment.objects.update(enrollment_date=self.moment)
+        Submission.objects.update(submission_date=self.moment)
+        self.progress = [
+            LessonProgress.objects.create(user=self.students[0], lesson=self.lessons[0], status='completed',
+                                          time_spent=30, completion_date=self.moment),
+            LessonProgress.objects.create(user=self.students[1], lesson=self.lessons[0], status='completed',
+                                          time_spent=10, completion_date=self.moment),
+            LessonProgress.objects.create(user=self.students[0], lesson=self.lessons[1], status='completed',
+                                          completion_date=self.moment),
+        ]
+        self.url = reverse('course-analytics', args=[self.course.pk])
+
+    def fetch(self, **params):
+        self.client.force_authenticate(user=self.teacher)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_dashboard_reads_only_the_rollups(self):
+        self.assertEqual(analytics.refresh(), 2 * 1)
+        self.client.force_authenticate(user=self.teacher)
+        with CaptureQueriesContext(connection) as queries, self.assertMaxQueries(5):
+            response = self.client.get(self.url)
+        for query in queries.captured_queries:
+            for table in ('core_lessonprogress', 'core_submission', 'core_enrollment'):
+                self.assertNotIn(table, query['sql'])
+
+        data = response.data
+        self.assertEqual(data['summary'], {
+            'enrolled': 2, 'lesson_count': 2, 'enrollments': 2, 'lessons_completed': 3, 'time_spent': 40,
+            'time_spent_samples': 2, 'submissions': 2, 'submissions_on_time': 1,
+            'average_time_spent': 20.0, 'on_time_rate': 0.5, 'completion_rate': 0.75,
+        })
+        self.assertEqual([(b['lessons_completed'], b['active_students']) for b in data['series']], [(3, 2)])
+        self.assertEqual(
+            [(m['id'], m['lessons_completed'], m['completion_rate'], m['on_time_rate']) for m in data['modules']],
+            [(self.modules[0].pk, 2, 1.0, 0.5), (self.modules[1].pk, 1, 0.5, None)]
+        )
+        hourly = self.fetch(granularity='hour')['series']
+        self.assertEqual([b['bucket'] for b in hourly], [self.moment.replace(minute=0)])
+
+    def test_refresh_only_rewrites_touched_buckets(self):
+        analytics.refresh()
+        earlier = self.moment - timezone.timedelta(days=3)
+        self.progress[0].completion_date = earlier
+        self.progress[0].save()
+        self.progress[1].delete()
+        self.assertEqual(analytics.refresh(), 2 * 2)
+        with override_settings(ANALYTICS_OVERLAP=0):
+            self.assertEqual(analytics.refresh(), 0)
+
+        data = self.fetch()
+        self.assertEqual(data['summary']['lessons_completed'], 2)
+        self.assertEqual(data['summary']['average_time_spent'], 30.0)
+        self.assertEqual(
+            [(b['bucket'].date(), b['lessons_completed']) for b in data['series']],
+            [(timezone.localtime(earlier).date(), 1), (timezone.localtime(self.moment).date(), 1)]
+        )
+        rebuilt = self.fetch()
+        call_command('refresh_analytics', '--full', stdout=io.StringIO())
+        self.assertEqual(self.fetch()['summary'], rebuilt['summary'])
+
+    def test_bulk_progress_moves_completions_between_buckets(self):
+        analytics.refresh()
+        self.client.force_authenticate(user=self.students[0])
+        response = self.client.post(reverse('lesson-progress-bulk'), [
+            {'lesson': self.lessons[0].pk, 'status': 'in_progress'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        analytics.refresh()
+        self.assertEqual(self.fetch()['summary']['lessons_completed'], 2)
+
+    def test_bulk_progress_marks_every_left_bucket_in_one_update(self):
+        analytics.refresh()
+        self.client.force_authenticate(user=self.students[0])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('lesson-progress-bulk'), [
+                {'lesson': lesson.pk, 'status': 'in_progress'} for lesson in self.lessons
+            ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stale_updates = [q for q in queries.captured_queries
+                         if q['sql'].startswith('UPDATE "core_analyticsrollup"')]
+        self.assertEqual(len(stale_updates), 1)
+        with override_settings(ANALYTICS_OVERLAP=0):
+            analytics.refresh()
+        self.assertEqual(self.fetch()['summary']['lessons_completed'], 1)
+
+    def test_due_date_changes_recount_on_time_submissions(self):
+        analytics.refresh()
+        late = Assignment.objects.get(title='Late')
+        late.due_date = self.moment.date()
+        late.save()
+        with override_settings(ANALYTICS_OVERLAP=0):
+            analytics.refresh()
+        self.assertEqual(self.fetch()['summary']['on_time_rate'], 1.0)
+
+    def test_only_the_course_teacher_and_admins(self):
+        analytics.refresh()
+        other = User.objects.create_user(
+            email='other@example.com', password='teacher123', phone_number='+998901234569', role='teacher'
+        )
+        for user in (other, self.students[0]):
+            self.client.force_authenticate(user=user)
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+        admin = User.objects.create_user(
+            email='admin@example.com', password='admin123', phone_number='+998901234560', role='admin'
+        )
+        self.client.force_authenticate(user=admin)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url, {'granularity': 'week'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
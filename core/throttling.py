@@ -0,0 +1,194 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``'100/min'`` -> ``(100, 60)``; None means unthrottled."""
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class LocalThrottleBackend:
+    """
+    Counters in this process's memory: no I/O per request, but every worker
+    counts on its own, so the effective limit is the rate times the workers.
+
+    Each key carries the wall-clock time its counts stop mattering (the end of the
+    window after its last one), so keys of scopes with different periods expire
+    on their own clocks. Expired keys are swept at most every ``sweep_interval``
+    seconds; past ``maxsize`` live keys the least recently counted are dropped.
+    """
+
+    def __init__(self, maxsize=100000, sweep_interval=60):
+        self.maxsize = maxsize
+        self.sweep_interval = sweep_interval
+        self.counters = OrderedDict()  # key -> (window, current, previous, expires), least recent first
+        self.next_sweep = 0.0
+        self.lock = threading.Lock()
+
+    def get(self, key, window):
+        with self.lock:
+            return self._read(key, window)
+
+    def incr(self, key, window, duration):
+        with self.lock:
+            current, previous = self._read(key, window)
+            self.counters[key] = (window, current + 1, previous, (window + 2) * duration)
+            self.counters.move_to_end(key)
+            if len(self.counters) > self.maxsize:
+                now = time.time()
+                if now >= self.next_sweep:
+                    self.next_sweep = now + self.sweep_interval
+                    for stale in [k for k, v in self.counters.items() if v[3] <= now]:
+                        del self.counters[stale]
+                while len(self.counters) > self.maxsize:
+                    self.counters.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.next_sweep = 0.0
+
+    def _read(self, key, window):
+        stored, current, previous, _ = self.counters.get(key, (None, 0, 0, 0))
+        if stored == window:
+            return current, previous
+        if stored == window - 1:
+            return 0, current
+        return 0, 0
+
+
+class CacheThrottleBackend:
+    """Counters in a Django cache shared by every process; ``THROTTLE_CACHE`` picks the alias."""
+
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+
+    def name(self, key, window):
+        return f'throttle:{key}:{window}'
+
+    def get(self, key, window):
+        names = [self.name(key, window), self.name(key, window - 1)]
+        values = self.cache.get_many(names)
+        return values.get(names[0], 0), values.get(names[1], 0)
+
+    def incr(self, key, window, duration):
+        name = self.name(key, window)
+        # Live through the next window too, where this one is the "previous" count.
+        if not self.cache.add(name, 1, 2 * duration):
+            try:
+                self.cache.incr(name)
+            except ValueError:
+                self.cache.set(name, 1, 2 * duration)
+
+    def clear(self):
+        pass
+
+
+_backends = {}
+
+
+def get_backend():
+    path = getattr(settings, 'THROTTLE_BACKEND', 'core.throttling.LocalThrottleBackend')
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Sliding-window counter: the previous fixed window's count, weighted by how much
+    of it still overlaps the sliding window, plus the current one. Two counters per
+    key instead of a timestamp per request, and rejected requests are not counted.
+
+    Rates come from ``DEFAULT_THROTTLE_RATES`` by scope; a scope without a rate is
+    not throttled.
+    """
+    scope = None
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_ident_key(self, request, view):
+        raise NotImplementedError('.get_ident_key() must be overridden')
+
+    def allow_request(self, request, view):
+        if not getattr(settings, 'THROTTLE_ENABLED', True):
+            return True
+        scope = self.get_scope(request, view)
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope)) if scope else None
+        if rate is None:
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+        self.limit, self.duration = rate
+        key = f'{scope}:{ident}'
+        now = time.time()
+        window = int(now // self.duration)
+        self.elapsed = now / self.duration - window
+        backend = get_backend()
+        self.current, self.previous = backend.get(key, window)
+        if self.previous * (1 - self.elapsed) + self.current >= self.limit:
+            return False
+        backend.incr(key, window, self.duration)
+        return True
+
+    def wait(self):
+        """Seconds until the weighted count drops below the limit again."""
+        room = self.limit - 1
+        if self.current > room:
+            # Not before the next window, and then only once this one's weight has faded.
+            fraction = 1 + max(0.0, 1 - room / self.current)
+        else:
+            fraction = 1 - (room - self.current) / self.previous
+        return max(1, math.ceil((fraction - self.elapsed) * self.duration))
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    """Anonymous requests, per client IP (``NUM_PROXIES`` decides how X-Forwarded-For is read)."""
+    scope = 'ip'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.get_ident(request)
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    """Authenticated requests, per user; the id comes from the credentials, not a query."""
+    scope = 'user'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class ScopedRateThrottle(SlidingWindowThrottle):
+    """
+    Writes to views with a ``throttle_scope`` (login, register, uploads, messages),
+    per user or, for anonymous requests, per IP. Reads are left to the general limits.
+    """
+
+    def get_scope(self, request, view):
+        if request.method in SAFE_METHODS:
+            return None
+        return getattr(view, 'throttle_scope', None)
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user-{request.user.pk}'
+        return f'ip-{self.get_ident(request)}'
@@ -0,0 +1,145 @@
+import io
+import uuid
+from collections import namedtuple
+from PIL import Image, UnidentifiedImageError
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from django.utils.text import get_valid_filename
+from .validators import validate_file_size, validate_image_file_size, FILE_MAX_SIZE_KB, IMAGE_MAX_SIZE_KB
+from users.validators import validate_avatar_size, AVATAR_MAX_SIZE_KB
+
+IMAGE_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp')
+IMAGE_FORMATS = ('JPEG', 'PNG', 'WEBP')
+# Bytes read from the start of an image upload to identify it; covers the headers
+# (EXIF and ICC segments included) of the formats above.
+SNIFF_BYTES = 256 * 1024
+# What each upload kind stores, where, who may upload it and as what content types
+# (None: any authenticated user / any type). Image kinds also have their header checked on completion.
+UploadKind = namedtuple('UploadKind', ['prefix', 'validator', 'max_size', 'roles', 'content_types'])
+UPLOAD_KINDS = {
+    'submission': UploadKind('submissions/', validate_file_size, FILE_MAX_SIZE_KB * 1024, ('student',), None),
+    'avatar': UploadKind('avatars/', validate_avatar_size, AVATAR_MAX_SIZE_KB * 1024, None, IMAGE_CONTENT_TYPES),
+    'course_image': UploadKind('course_images/', validate_image_file_size, IMAGE_MAX_SIZE_KB * 1024,
+                               ('admin', 'teacher'), IMAGE_CONTENT_TYPES),
+}
+# Stand-in for a file object: the size validators only look at ``.size``.
+StoredObject = namedtuple('StoredObject', ['name', 'size'])
+
+TOKEN_SALT = 'core.uploads'
+LOCAL_TOKEN_SALT = 'core.uploads.local'
+
+
+def get_upload_backend():
+    return import_string(settings.UPLOAD_BACKEND)()
+
+
+def upload_expiry():
+    return getattr(settings, 'UPLOAD_URL_EXPIRES', 900)
+
+
+def build_key(kind, filename):
+    return f'{UPLOAD_KINDS[kind].prefix}{uuid.uuid4().hex}/{get_valid_filename(filename)}'
+
+
+def sign_upload(user, kind, key, target=None):
+    return signing.dumps({'user': user.pk, 'kind': kind, 'key': key, 'target': target}, salt=TOKEN_SALT)
+
+
+def load_upload(token):
+    return signing.loads(token, salt=TOKEN_SALT, max_age=upload_expiry())
+
+
+def is_image(backend, key):
+    """
+    Whether the stored object starts like an accepted image of a sane size. Only its
+    first ``SNIFF_BYTES`` are read: ``Image.open`` parses the header alone, and the
+    pixels are decoded later, off the request path, by core.images.
+    """
+    try:
+        with Image.open(io.BytesIO(backend.read_head(key, SNIFF_BYTES))) as image:
+            width, height = image.size
+            max_pixels = getattr(settings, 'IMAGE_MAX_PIXELS', 40_000_000)
+            return image.format in IMAGE_FORMATS and width * height <= max_pixels
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        return False
+
+
+class S3UploadBackend:
+    """Presigned POST straight to the media bucket; the API never sees the bytes."""
+
+    def __init__(self):
+        import boto3
+        self.client = boto3.client(
+            's3',
+            region_name=settings.AWS_S3_REGION_NAME,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        )
+        self.bucket = settings.AWS_STORAGE_BUCKET_NAME
+        self.location = getattr(settings, 'AWS_LOCATION', '')
+
+    def object_key(self, key):
+        return f'{self.location}/{key}' if self.location else key
+
+    def presign(self, request, key, content_type, max_size):
+        post = self.client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=self.object_key(key),
+            Fields={'Content-Type': content_type},
+            Conditions=[['content-length-range', 1, max_size], {'Content-Type': content_type}],
+            ExpiresIn=upload_expiry(),
+        )
+        return {'method': 'POST', 'url': post['url'], 'fields': post['fields']}
+
+    def size(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))['ContentLength']
+        except ClientError:
+            return None
+
+    def read_head(self, key, length):
+        response = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key), Range=f'bytes=0-{length - 1}')
+        return response['Body'].read(length)
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+
+class LocalUploadBackend:
+    """
+    Filesystem stand-in for local runs and tests.
+
+    The "presigned" URL is ``LocalUploadView``, which accepts a raw ``PUT`` body and
+    writes it to ``default_storage``, enforcing the size limit like S3's policy does.
+    """
+
+    def presign(self, request, key, content_type, max_size):
+        token = signing.dumps({'key': key, 'max_size': max_size}, salt=LOCAL_TOKEN_SALT)
+        url = request.build_absolute_uri(reverse('upload-local', args=[token]))
+        return {'method': 'PUT', 'url': url, 'fields': {'Content-Type': content_type}}
+
+    def size(self, key):
+        if not default_storage.exists(key):
+            return None
+        return default_storage.size(key)
+
+    def read_head(self, key, length):
+        with default_storage.open(key, 'rb') as stream:
+            return stream.read(length)
+
+    def delete(self, key):
+        default_storage.delete(key)
+
+    @staticmethod
+    def receive(token, body):
+        data = signing.loads(token, salt=LOCAL_TOKEN_SALT, max_age=upload_expiry())
+        if not body or len(body) > data['max_size']:
+            raise ValueError('Upload size is outside the allowed range')
+        if default_storage.exists(data['key']):
+            default_storage.delete(data['key'])
+        return default_storage.save(data['key'], ContentFile(body))
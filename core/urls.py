@@ -2,8 +2,9 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from django.http import HttpResponse
 from .views import (
-    CourseViewSet, ModuleViewSet, LessonViewSet, AssignmentViewSet, SubmissionViewSet,
-    EnrollmentViewSet, LessonProgressViewSet, CertificateViewSet, MessageViewSet
+    CourseViewSet, ModuleViewSet, LessonViewSet, AssignmentViewSet, SubmissionViewSet, GradingQueueViewSet,
+    EnrollmentViewSet, LessonProgressViewSet, CertificateViewSet, MessageViewSet,
+    UploadTargetView, UploadCompleteView, LocalUploadView, MessageStreamView
 )
 
 router = DefaultRouter()
@@ -13,13 +14,19 @@ router.register(r'modules', ModuleViewSet, basename='module')
 router.register(r'lessons', LessonViewSet, basename='lesson')
 router.register(r'assignments', AssignmentViewSet, basename='assignment')
 router.register(r'submissions', SubmissionViewSet, basename='submission')
+router.register(r'grading-queue', GradingQueueViewSet, basename='grading-queue')
 router.register(r'enrollments', EnrollmentViewSet, basename='enrollment')
 router.register(r'lesson-progress', LessonProgressViewSet, basename='lesson-progress')
 router.register(r'certificates', CertificateViewSet, basename='certificate')
 router.register(r'messages', MessageViewSet, basename='message')
 
 urlpatterns = [
+    # Ahead of the router so "stream" is not taken for a message id.
+    path('messages/stream/', MessageStreamView.as_view(), name='message-stream'),
     path('', include(router.urls)),
+    path('uploads/', UploadTargetView.as_view(), name='upload-target'),
+    path('uploads/complete/', UploadCompleteView.as_view(), name='upload-complete'),
+    path('uploads/local/<str:token>/', LocalUploadView.as_view(), name='upload-local'),
     # Health check endpoint
     path('health/', lambda request: HttpResponse('OK'), name='health-check'),
 ]
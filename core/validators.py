@@ -1,14 +1,17 @@
 from django.core.exceptions import ValidationError
 from django.template.defaultfilters import filesizeformat
 
+FILE_MAX_SIZE_KB = 2048
+IMAGE_MAX_SIZE_KB = 1024
+
 def validate_file_size(file):
-    max_size_kb = 2048
+    max_size_kb = FILE_MAX_SIZE_KB
 
     if file.size > max_size_kb * 1024:
         raise ValidationError(f'File size must not exceed {filesizeformat(max_size_kb * 1024)}')
     
 def validate_image_file_size(image):
-    max_size_kb = 1024
+    max_size_kb = IMAGE_MAX_SIZE_KB
 
     if image.size > max_size_kb * 1024:
         raise ValidationError(f'Image size must not exceed {filesizeformat(max_size_kb * 1024)}')
\ No newline at end of file
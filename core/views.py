@@ -1,26 +1,55 @@
 from rest_framework import viewsets, permissions, filters
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.exceptions import ValidationError
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.exceptions import AuthenticationFailed
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError, NotFound, PermissionDenied
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Q, Prefetch
+from django.utils import timezone
 import logging
 from .models import (
     Course, Module, Lesson, Assignment, Submission,
-    Enrollment, LessonProgress, Certificate, Message
+    Enrollment, LessonProgress, Certificate, Message, CertificateIssueJob, ConversationMember, Mailbox
 )
 from .serializers import (
     CourseSerializer, ModuleSerializer, LessonSerializer,
     AssignmentSerializer, SubmissionSerializer, EnrollmentSerializer,
-    LessonProgressSerializer, CertificateSerializer, MessageSerializer
+    LessonProgressSerializer, CertificateSerializer, MessageSerializer,
+    CourseTreeSerializer, LessonProgressBulkItemSerializer,
+    UploadTargetSerializer, UploadCompleteSerializer,
+    CertificateBulkIssueSerializer, CertificateIssueJobSerializer, ConversationSerializer,
+    MessageMarkReadSerializer, MessageSearchResultSerializer,
+    GradingQueueSerializer, GradingClaimSerializer, GradingBulkSerializer, CourseAnalyticsQuerySerializer
 )
+from .pagination import KeysetPagination, StandardResultsSetPagination
+from .search import FullTextSearchFilter, MessageSearchFilter, search_messages
+from .conditional import ConditionalGetMixin
+from .counters import refresh_course_counters, refresh_enrollment_progress
+from .certificates import certificate_number
+from .conversations import mark_read as mark_messages_read
+from .uploads import (
+    UPLOAD_KINDS, StoredObject, LocalUploadBackend, build_key, get_upload_backend, is_image, sign_upload,
+    upload_expiry
+)
+from .images import schedule_derivatives
+from .realtime import event_stream
+from .analytics import course_analytics, mark_stale_many as mark_rollups_stale
+from . import grading
+from users.models import User
+from users.authentication import invalidate_user
 
 logger = logging.getLogger(__name__)
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
 class IsAdminOrTeacherOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
@@ -31,16 +60,74 @@ class IsStudent(permissions.BasePermission):
     def has_permission(self, request, view):
         return bool(request.user and request.user.is_authenticated and request.user.role == 'student')
 
-class CourseViewSet(viewsets.ModelViewSet):
+class IsAdminOrTeacher(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.role in ['admin', 'teacher'])
+
+class CourseViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Course.objects.select_related('teacher').all()
     serializer_class = CourseSerializer
     permission_classes = [IsAdminOrTeacherOrReadOnly]
     pagination_class = StandardResultsSetPagination
-    filter_backends = (DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter)
-    filterset_fields = ['category', 'level']
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter)
+    filterset_fields = {
+        'category': ['exact'],
+        'level': ['exact'],
+        'module_count': ['exact', 'gte', 'lte'],
+        'lesson_count': ['exact', 'gte', 'lte'],
+        'total_duration': ['exact', 'gte', 'lte'],
+        'enrollment_count': ['exact', 'gte', 'lte'],
+        'certificate_count': ['exact', 'gte', 'lte'],
+    }
     search_fields = ['title', 'description', 'category']
-    ordering_fields = ['created_at', 'title']
+    ordering_fields = [
+        'created_at', 'title', 'module_count', 'lesson_count', 'total_duration',
+        'enrollment_count', 'certificate_count'
+    ]
     ordering = ['-created_at']
+    etag_dependencies = ['teacher__updated_at']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'tree':
+            # One query per level: modules, lessons and assignments, active rows only.
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'modules',
+                    queryset=Module.objects.filter(is_active=True).order_by('order', 'id'),
+                    to_attr='active_modules'
+                ),
+                Prefetch(
+                    'active_modules__lessons',
+                    queryset=Lesson.objects.filter(is_active=True).order_by('order', 'id'),
+                    to_attr='active_lessons'
+                ),
+                Prefetch(
+                    'active_modules__active_lessons__assignments',
+                    queryset=Assignment.objects.filter(is_active=True).order_by('due_date', 'id'),
+                    to_attr='active_assignments'
+                ),
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'tree':
+            return CourseTreeSerializer
+        return super().get_serializer_class()
+
+    @action(detail=True, methods=['get'])
+    def tree(self, request, pk=None):
+        serializer = self.get_serializer(self.get_object())
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAdminOrTeacher])
+    def analytics(self, request, pk=None):
+        course = self.get_object()
+        if request.user.role != 'admin' and course.teacher_id != request.user.pk:
+            raise PermissionDenied("Only the course teacher can see its analytics")
+        serializer = CourseAnalyticsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(course_analytics(course, **serializer.validated_data))
 
     def perform_create(self, serializer):
         try:
@@ -49,13 +136,8 @@ class CourseViewSet(viewsets.ModelViewSet):
                 category=serializer.validated_data['category']
             ).exists():
                 raise ValidationError("A course with this title already exists in this category")
-            
-            # Handle image upload
-            image = serializer.validated_data.get('image')
-            if image:
-                # You can add additional image processing here if needed
-                pass
-                
+
+            # Image variants are rendered off the request path (see core.images / core.signals).
             serializer.save(teacher=self.request.user)
             logger.info(f"Course created: {serializer.instance.title} by {self.request.user.email}")
         except Exception as e:
@@ -64,19 +146,13 @@ class CourseViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         try:
-            # Handle image update
-            image = serializer.validated_data.get('image')
-            if image:
-                # You can add additional image processing here if needed
-                pass
-                
             serializer.save()
             logger.info(f"Course updated: {serializer.instance.title}")
         except Exception as e:
             logger.error(f"Error updating course: {str(e)}")
             raise
 
-class ModuleViewSet(viewsets.ModelViewSet):
+class ModuleViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Module.objects.select_related('course').all()
     serializer_class = ModuleSerializer
     permission_classes = [IsAdminOrTeacherOrReadOnly]
@@ -86,36 +162,38 @@ class ModuleViewSet(viewsets.ModelViewSet):
     search_fields = ['title', 'description']
     ordering_fields = ['start_date', 'title', 'order']
     ordering = ['order']
+    etag_dependencies = ['course__updated_at']
 
     def perform_create(self, serializer):
         course = serializer.validated_data['course']
         if not course.is_active:
             raise ValidationError("Cannot create module for inactive course")
-        if self.request.user.role == 'teacher' and course.teacher != self.request.user:
+        if self.request.user.role == 'teacher' and course.teacher_id != self.request.user.id:
             raise ValidationError("You can only create modules for your own courses")
         serializer.save()
 
-class LessonViewSet(viewsets.ModelViewSet):
-    queryset = Lesson.objects.select_related('module').all()
+class LessonViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Lesson.objects.select_related('module__course').all()
     serializer_class = LessonSerializer
     permission_classes = [IsAdminOrTeacherOrReadOnly]
     pagination_class = StandardResultsSetPagination
-    filter_backends = (DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter)
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter)
     filterset_fields = ['module', 'lesson_type']
     search_fields = ['title', 'content']
     ordering_fields = ['duration', 'order']
     ordering = ['order']
+    etag_dependencies = ['module__updated_at', 'module__course__updated_at']
 
     def perform_create(self, serializer):
         module = serializer.validated_data['module']
         if not module.is_active:
             raise ValidationError("Cannot create lesson for inactive module")
-        if self.request.user.role == 'teacher' and module.course.teacher != self.request.user:
+        if self.request.user.role == 'teacher' and module.course.teacher_id != self.request.user.id:
             raise ValidationError("You can only create lessons for your own courses")
         serializer.save()
 
-class AssignmentViewSet(viewsets.ModelViewSet):
-    queryset = Assignment.objects.select_related('lesson').all()
+class AssignmentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Assignment.objects.select_related('lesson__module__course').all()
     serializer_class = AssignmentSerializer
     permission_classes = [IsAdminOrTeacherOrReadOnly]
     pagination_class = StandardResultsSetPagination
@@ -129,7 +207,7 @@ class AssignmentViewSet(viewsets.ModelViewSet):
         lesson = serializer.validated_data['lesson']
         if not lesson.is_active:
             raise ValidationError("Cannot create assignment for inactive lesson")
-        if self.request.user.role == 'teacher' and lesson.module.course.teacher != self.request.user:
+        if self.request.user.role == 'teacher' and lesson.teacher_id != self.request.user.id:
             raise ValidationError("You can only create assignments for your own courses")
         serializer.save()
 
@@ -138,18 +216,20 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     serializer_class = SubmissionSerializer
     permission_classes = [IsStudent]
     pagination_class = StandardResultsSetPagination
+    throttle_scope = 'uploads'
     filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
     filterset_fields = ['assignment', 'student', 'status']
     ordering_fields = ['submission_date', 'status']
     ordering = ['-submission_date']
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         user = self.request.user
         if user.role == 'student':
-            return Submission.objects.filter(student=user)
+            return queryset.filter(student=user)
         if user.role == 'teacher':
-            return Submission.objects.filter(assignment__lesson__module__course__teacher=user)
-        return super().get_queryset()
+            return queryset.filter(teacher=user)
+        return queryset
 
     def perform_create(self, serializer):
         try:
@@ -164,6 +244,53 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             logger.error(f"Error creating submission: {str(e)}")
             raise
 
+class GradingQueueViewSet(viewsets.GenericViewSet):
+    """
+    Submissions waiting for a grade, oldest first. Graders ``claim`` a batch (a lease
+    of ``GRADING_LEASE`` seconds) so two of them never open the same work, and
+    ``mark-looked`` grades many at once.
+    """
+    serializer_class = GradingQueueSerializer
+    permission_classes = [IsAdminOrTeacher]
+    pagination_class = KeysetPagination
+    filter_backends = (DjangoFilterBackend,)
+    filterset_fields = ['course', 'assignment', 'status']
+
+    def get_queryset(self):
+        return grading.queue_for(self.request.user).select_related(
+            'assignment', 'student'
+        ).order_by('submission_date', 'id')
+
+    def list(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        if request.query_params.get('available') in ('1', 'true'):
+            queryset = queryset.filter(grading.claimable_by(request.user, timezone.now()))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=['post'])
+    def claim(self, request):
+        serializer = GradingClaimSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = grading.claim(request.user, serializer.validated_data['count'], serializer.validated_data.get('course'))
+        claimed = self.get_queryset().filter(pk__in=ids)
+        return Response({'results': self.get_serializer(claimed, many=True).data})
+
+    @action(detail=False, methods=['post'])
+    def release(self, request):
+        serializer = GradingBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'released': grading.release(request.user, serializer.validated_data['ids'])})
+
+    @action(detail=False, methods=['post'], url_path='mark-looked')
+    def mark_looked(self, request):
+        serializer = GradingBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        updated = grading.mark_looked(request.user, ids)
+        logger.info(f"{request.user.email} marked {updated} of {len(ids)} submissions looked")
+        return Response({'updated': updated, 'skipped': len(ids) - updated})
+
 class EnrollmentViewSet(viewsets.ModelViewSet):
     queryset = Enrollment.objects.select_related('user', 'course').all()
     serializer_class = EnrollmentSerializer
@@ -175,12 +302,13 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
     ordering = ['-enrollment_date']
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         user = self.request.user
         if user.role == 'student':
-            return Enrollment.objects.filter(user=user)
+            return queryset.filter(user=user)
         if user.role == 'teacher':
-            return Enrollment.objects.filter(course__teacher=user)
-        return super().get_queryset()
+            return queryset.filter(course__teacher=user)
+        return queryset
 
     def perform_create(self, serializer):
         course = serializer.validated_data['course']
@@ -199,14 +327,16 @@ class LessonProgressViewSet(viewsets.ModelViewSet):
     filterset_fields = ['user', 'lesson', 'status']
     ordering_fields = ['completion_date', 'time_spent']
     ordering = ['-completion_date']
+    bulk_max_items = 500
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         user = self.request.user
         if user.role == 'student':
-            return LessonProgress.objects.filter(user=user)
+            return queryset.filter(user=user)
         if user.role == 'teacher':
-            return LessonProgress.objects.filter(lesson__module__course__teacher=user)
-        return super().get_queryset()
+            return queryset.filter(teacher=user)
+        return queryset
 
     def perform_create(self, serializer):
         lesson = serializer.validated_data['lesson']
@@ -214,6 +344,76 @@ class LessonProgressViewSet(viewsets.ModelViewSet):
             raise ValidationError("Cannot track progress for inactive lesson")
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        items = request.data.get('items') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError("Expected a non-empty list of progress items")
+        if len(items) > self.bulk_max_items:
+            raise ValidationError(f"At most {self.bulk_max_items} items can be sent at once")
+
+        results = [None] * len(items)
+        valid = {}
+        for index, item in enumerate(items):
+            serializer = LessonProgressBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                # A lesson repeated in one batch keeps its last entry.
+                valid[serializer.validated_data['lesson']] = (index, serializer.validated_data)
+            else:
+                results[index] = {'index': index, 'result': 'error', 'errors': serializer.errors}
+
+        active = {pk: (course_id, teacher_id) for pk, course_id, teacher_id in Lesson.objects.filter(
+            pk__in=valid, is_active=True).values_list('pk', 'course_id', 'teacher_id')}
+        previous, previous_dates = {}, {}
+        for lesson_id, progress_status, completion_date in LessonProgress.objects.filter(
+                user=request.user, lesson__in=active).values_list('lesson_id', 'status', 'completion_date'):
+            previous[lesson_id], previous_dates[lesson_id] = progress_status, completion_date
+        rows = []
+        for lesson_id, (index, data) in valid.items():
+            if lesson_id not in active:
+                results[index] = {'index': index, 'lesson': lesson_id, 'result': 'error',
+                                  'errors': {'lesson': ["Lesson does not exist or is inactive"]}}
+                continue
+            completion_date = data.get('completion_date')
+            if data['status'] == 'completed' and completion_date is None:
+                completion_date = timezone.now()
+            # bulk_create skips the signals that copy the lesson's course and teacher.
+            course_id, teacher_id = active[lesson_id]
+            rows.append(LessonProgress(
+                user=request.user, lesson_id=lesson_id, course_id=course_id, teacher_id=teacher_id,
+                status=data['status'],
+                time_spent=data.get('time_spent'), completion_date=completion_date
+            ))
+            results[index] = {'index': index, 'lesson': lesson_id,
+                              'result': 'updated' if lesson_id in previous else 'created'}
+        for index, item in enumerate(items):
+            if results[index] is None:
+                results[index] = {'index': index, 'lesson': item.get('lesson'), 'result': 'superseded'}
+
+        completed_changed = {
+            row.course_id for row in rows
+            if (row.status == 'completed') != (previous.get(row.lesson_id) == 'completed')
+        }
+        with transaction.atomic():
+            LessonProgress.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['user', 'lesson'],
+                update_fields=['status', 'time_spent', 'completion_date', 'updated_at']
+            )
+            # Rows moved off a completion date leave its rollup bucket behind.
+            mark_rollups_stale(
+                (row.course_id, previous_dates[row.lesson_id]) for row in rows
+                if previous_dates.get(row.lesson_id) not in (None, row.completion_date)
+            )
+            if completed_changed:
+                refresh_enrollment_progress(Enrollment.objects.filter(
+                    user=request.user, course__in=completed_changed
+                ))
+        logger.info(f"Bulk progress sync by {request.user.email}: {len(rows)} of {len(items)} items written")
+
+        summary = {key: sum(1 for r in results if r['result'] == key)
+                   for key in ('created', 'updated', 'superseded', 'error')}
+        return Response({'results': results, **summary})
+
 class CertificateViewSet(viewsets.ModelViewSet):
     queryset = Certificate.objects.select_related('user', 'course').all()
     serializer_class = CertificateSerializer
@@ -225,12 +425,13 @@ class CertificateViewSet(viewsets.ModelViewSet):
     ordering = ['-issue_date']
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         user = self.request.user
         if user.role == 'student':
-            return Certificate.objects.filter(user=user)
+            return queryset.filter(user=user)
         if user.role == 'teacher':
-            return Certificate.objects.filter(course__teacher=user)
-        return super().get_queryset()
+            return queryset.filter(course__teacher=user)
+        return queryset
 
     def perform_create(self, serializer):
         course = serializer.validated_data['course']
@@ -240,12 +441,54 @@ class CertificateViewSet(viewsets.ModelViewSet):
             raise ValidationError("Certificate already exists for this course")
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post'], url_path='issue-bulk')
+    def issue_bulk(self, request):
+        serializer = CertificateBulkIssueSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        course = serializer.validated_data['course']
+        min_progress = serializer.validated_data['min_progress']
+
+        with transaction.atomic():
+            # Certificate inserts for the course wait on its row lock (their FK check), so the
+            # before/after counts below only differ by the rows this request inserted.
+            Course.objects.select_for_update().filter(pk=course.pk).exists()
+            existing = Certificate.objects.filter(course=course).count()
+            eligible = list(
+                Enrollment.objects.filter(course=course, progress__gte=min_progress)
+                .exclude(user__certificates__course=course)
+                .values_list('user_id', flat=True)
+            )
+            Certificate.objects.bulk_create([
+                Certificate(user_id=user_id, course=course, certificate_number=certificate_number(course.pk, user_id))
+                for user_id in eligible
+            ], batch_size=1000, ignore_conflicts=True)
+            issued = Certificate.objects.filter(course=course).count() - existing
+            refresh_course_counters([course.pk], fields=['certificate_count'])
+            # Rendered by the issue_certificates worker.
+            job = CertificateIssueJob.objects.create(
+                course=course, requested_by=request.user, min_progress=min_progress, issued=issued
+            )
+        logger.info(f"Bulk certificate issuance for course {course.id} by {request.user.email}: {issued} issued")
+        return Response(CertificateIssueJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>\d+)',
+            permission_classes=[permissions.IsAuthenticated])
+    def job(self, request, job_id=None):
+        jobs = CertificateIssueJob.objects.all()
+        if request.user.role != 'admin':
+            jobs = jobs.filter(requested_by=request.user)
+        job = jobs.filter(pk=job_id).first()
+        if job is None:
+            raise NotFound()
+        return Response(CertificateIssueJobSerializer(job).data)
+
 class MessageViewSet(viewsets.ModelViewSet):
     queryset = Message.objects.select_related('sender', 'receiver').all()
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
-    filter_backends = (DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter)
+    throttle_scope = 'messages'
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter, MessageSearchFilter)
     filterset_fields = ['sender', 'receiver', 'read_status']
     search_fields = ['content']
     ordering_fields = ['timestamp', 'read_status']
@@ -260,4 +503,165 @@ class MessageViewSet(viewsets.ModelViewSet):
         receiver = serializer.validated_data['receiver']
         if receiver == self.request.user:
             raise ValidationError("Cannot send message to yourself")
-        serializer.save(sender=self.request.user)
+        # One transaction with the conversation index and the Telegram outbox row.
+        with transaction.atomic():
+            serializer.save(sender=self.request.user)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError("Provide a search query in 'q'")
+        messages = search_messages(Message.objects.all(), request.user, query)
+        conversation = request.query_params.get('conversation')
+        if conversation:
+            if not conversation.isdigit():
+                raise ValidationError("conversation must be an id")
+            messages = messages.filter(conversation_id=conversation)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(messages.order_by('-timestamp', '-id'), request, view=self)
+        return paginator.get_paginated_response(MessageSearchResultSerializer(page, many=True).data)
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        count = Mailbox.objects.filter(user=request.user).values_list('unread_count', flat=True).first()
+        return Response({'unread_count': count or 0})
+
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        serializer = MessageMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if 'ids' in data:
+            messages = Message.objects.filter(pk__in=data['ids'])
+        else:
+            messages = Message.objects.filter(sender=data['sender'], timestamp__lte=data.get('before') or timezone.now())
+        updated = mark_messages_read(request.user, messages)
+        count = Mailbox.objects.filter(user=request.user).values_list('unread_count', flat=True).first()
+        return Response({'updated': updated, 'unread_count': count or 0})
+
+    @action(detail=False, methods=['get'])
+    def conversations(self, request):
+        memberships = ConversationMember.objects.filter(user=request.user).select_related(
+            'peer', 'conversation__last_message'
+        ).order_by('-last_message_at', '-id')
+        page = self.paginate_queryset(memberships)
+        serializer = ConversationSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path=r'conversations/(?P<conversation_id>\d+)')
+    def conversation(self, request, conversation_id=None):
+        if not ConversationMember.objects.filter(conversation_id=conversation_id, user=request.user).exists():
+            raise NotFound()
+        messages = Message.objects.filter(conversation_id=conversation_id).select_related(
+            'sender'
+        ).order_by('-timestamp', '-id')
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(messages, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+class UploadTargetView(APIView):
+    """Phase one of a direct upload: hand out a presigned target for the object."""
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'uploads'
+
+    def post(self, request):
+        serializer = UploadTargetSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        kind = UPLOAD_KINDS[data['kind']]
+        key = build_key(data['kind'], data['filename'])
+        target = get_upload_backend().presign(request, key, data['content_type'], kind.max_size)
+        return Response({
+            'token': sign_upload(request.user, data['kind'], key, data.get('target')),
+            'key': key,
+            'max_size': kind.max_size,
+            'expires_in': upload_expiry(),
+            **target,
+        }, status=status.HTTP_201_CREATED)
+
+class UploadCompleteView(APIView):
+    """Phase two: check the stored object against the field validator and attach it."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = UploadCompleteSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['token']
+        key, target = upload['key'], upload['target']
+        backend = get_upload_backend()
+
+        size = backend.size(key)
+        if size is None:
+            raise ValidationError("Uploaded file not found")
+        try:
+            UPLOAD_KINDS[upload['kind']].validator(StoredObject(key, size))
+        except DjangoValidationError as e:
+            backend.delete(key)
+            raise ValidationError(e.messages)
+        if UPLOAD_KINDS[upload['kind']].content_types and not is_image(backend, key):
+            backend.delete(key)
+            raise ValidationError("Upload a valid image")
+
+        if upload['kind'] == 'submission':
+            # The assignment may have closed since the upload was presigned.
+            if not Assignment.objects.filter(pk=target, is_active=True).exists():
+                backend.delete(key)
+                raise ValidationError("Cannot submit to inactive assignment")
+            if Submission.objects.filter(student=request.user, assignment_id=target).exists():
+                raise ValidationError("You have already submitted this assignment")
+            submission = Submission.objects.create(assignment_id=target, student=request.user, submitted_file=key)
+            logger.info(f"Submission created for assignment {target} by {request.user.email} via direct upload")
+            return Response(SubmissionSerializer(submission, context={'request': request}).data,
+                            status=status.HTTP_201_CREATED)
+        if upload['kind'] == 'avatar':
+            User.objects.filter(pk=request.user.pk).update(avatar=key, updated_at=timezone.now())
+            invalidate_user(request.user.pk)
+            schedule_derivatives(User, request.user.pk, key)
+        else:
+            Course.objects.filter(pk=target).update(image=key, updated_at=timezone.now())
+            schedule_derivatives(Course, target, key)
+            logger.info(f"Course {target} image replaced by {request.user.email} via direct upload")
+        return Response({'kind': upload['kind'], 'key': key, 'size': size})
+
+class LocalUploadView(APIView):
+    """Receives PUT bodies for ``LocalUploadBackend``; the token is the authorization."""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def put(self, request, token):
+        try:
+            LocalUploadBackend.receive(token, request.body)
+        except signing.BadSignature:
+            return Response({'error': 'Invalid upload token'}, status=status.HTTP_403_FORBIDDEN)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+def _stream_user(request):
+    # Same authenticators as the API, so access tokens, API tokens and sessions all work.
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except AuthenticationFailed:
+        return None
+    return user if user.is_authenticated else None
+
+class MessageStreamView(View):
+    """
+    Server-Sent Events push of new messages and read receipts.
+
+    One long-lived connection per client replaces polling ``messages/``. Needs the
+    ASGI server; events are ``message``, ``read`` and ``resync`` (refetch, the client
+    fell too far behind).
+    """
+
+    async def get(self, request):
+        user = await sync_to_async(_stream_user)(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        response = StreamingHttpResponse(event_stream(user.pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
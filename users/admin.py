@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import RefreshToken, User
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -15,7 +15,7 @@ class UserAdmin(BaseUserAdmin):
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         ('Personal info', {
-            'fields': ('full_name', 'phone_number', 'age', 'avatar', 'gender', 'bio')
+            'fields': ('full_name', 'phone_number', 'age', 'avatar', 'gender', 'bio', 'telegram_chat_id')
         }),
         ('Roles & Permissions', {
             'fields': ('role', 'is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')
@@ -29,3 +29,12 @@ class UserAdmin(BaseUserAdmin):
             'fields': ('email', 'phone_number', 'password1', 'password2', 'role', 'is_active', 'is_staff', 'is_superuser')}
         ),
     )
+
+
+@admin.register(RefreshToken)
+class RefreshTokenAdmin(admin.ModelAdmin):
+    list_display = ('jti', 'user', 'family', 'created_at', 'expires_at', 'revoked_at')
+    list_filter = ('revoked_at',)
+    search_fields = ('jti', 'family', 'user__email')
+    raw_id_fields = ('user',)
+    readonly_fields = ('jti', 'family', 'created_at', 'replaced_by')
@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from .models import User
+from .tokens import decode_access
+
+# Everything but the password hash, which stays deferred and out of any cache.
+SNAPSHOT_FIELDS = [field.attname for field in User._meta.concrete_fields if field.attname != 'password']
+
+
+class TokenCache:
+    """
+    Token key -> user snapshot, in a bounded in-process LRU with an optional shared tier.
+
+    A snapshot is the raw row the database returned, so rebuilding the user is the
+    same ``from_db`` call a query would make. Saves and deletes of the user or token
+    drop the entries here and in the shared tier; other processes' LRUs expire
+    within ``ttl``.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60, shared_alias=None, shared_ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self.shared_ttl = shared_ttl
+        self.entries = OrderedDict()
+        self.keys_by_user = defaultdict(set)
+        self.lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def shared_key(self, key):
+        return f'users.token:{key}'
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, snapshot = entry
+                if expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    return snapshot
+                self._discard(key)
+        if self.shared is not None:
+            snapshot = self.shared.get(self.shared_key(key))
+            if snapshot is not None:
+                self._store(key, snapshot)
+                return snapshot
+        return None
+
+    def set(self, key, snapshot):
+        self._store(key, snapshot)
+        if self.shared is not None:
+            self.shared.set(self.shared_key(key), snapshot, self.shared_ttl)
+
+    def invalidate(self, keys=(), user_id=None):
+        keys = set(keys)
+        with self.lock:
+            if user_id is not None:
+                keys |= self.keys_by_user.get(user_id, set())
+            for key in keys:
+                self._discard(key)
+        if self.shared is not None and keys:
+            self.shared.delete_many([self.shared_key(key) for key in keys])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_user.clear()
+
+    def _store(self, key, snapshot):
+        with self.lock:
+            self._discard(key)
+            self.entries[key] = (time.monotonic() + self.ttl, snapshot)
+            self.keys_by_user[snapshot['user_id']].add(key)
+            while len(self.entries) > self.maxsize:
+                self._discard(next(iter(self.entries)))
+
+    def _discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1]['user_id']
+        self.keys_by_user[user_id].discard(key)
+        if not self.keys_by_user[user_id]:
+            del self.keys_by_user[user_id]
+
+
+token_cache = TokenCache(
+    maxsize=getattr(settings, 'TOKEN_AUTH_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 60),
+    shared_alias=getattr(settings, 'TOKEN_AUTH_SHARED_CACHE', None),
+    shared_ttl=getattr(settings, 'TOKEN_AUTH_SHARED_TTL', 300),
+)
+
+
+def invalidate_user(user_id):
+    """Drop every cached snapshot of a user, for writes that skip ``post_save``."""
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    token_cache.invalidate(keys, user_id=user_id)
+
+
+def load_snapshot(key):
+    row = Token.objects.filter(key=key).values_list(
+        'user_id', 'created', *[f'user__{name}' for name in SNAPSHOT_FIELDS]
+    ).first()
+    if row is None:
+        return None
+    return {'user_id': row[0], 'created': row[1], 'values': row[2:]}
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` that costs no query for tokens seen recently."""
+
+    def authenticate_credentials(self, key):
+        snapshot = token_cache.get(key)
+        if snapshot is None:
+            snapshot = load_snapshot(key)
+            if snapshot is None:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            token_cache.set(key, snapshot)
+
+        user = User.from_db(DEFAULT_DB_ALIAS, SNAPSHOT_FIELDS, snapshot['values'])
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        token = Token.from_db(DEFAULT_DB_ALIAS, ['key', 'user_id', 'created'],
+                              [key, snapshot['user_id'], snapshot['created']])
+        token.user = user
+        return (user, token)
+
+
+class AccessTokenAuthentication(BaseAuthentication):
+    """
+    ``Authorization: Bearer <access token>``: a signature check, no query and no hashing.
+
+    ``request.user`` is built from the claims (id, role, staff flags); other fields
+    load lazily if a view touches them. ``request.auth`` is the claims dict.
+
+    The user is taken as active without asking the database: deactivating someone
+    shuts them out when their access token expires (``ACCESS_TOKEN_LIFETIME``, five
+    minutes by default), since refreshing checks ``is_active``. Keep the lifetime
+    short, or revoke the tokens too when that is not soon enough.
+    """
+    keyword = 'Bearer'
+    claim_fields = ['id', 'role', 'is_staff', 'is_superuser', 'is_active']
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+        claims = decode_access(token)
+        user = User.from_db(DEFAULT_DB_ALIAS, self.claim_fields, [
+            claims['user_id'], claims['role'], claims['is_staff'], claims['is_superuser'], True
+        ])
+        return (user, claims)
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from .tokens import LOCAL_CACHE_BACKENDS, revocation_alias
+
+
+@register(Tags.security, deploy=True)
+def check_revocation_cache(app_configs, **kwargs):
+    """A logout has to reach every worker, so revoked tokens need a cache they all share."""
+    alias = revocation_alias()
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend is None:
+        return [Error(f"TOKEN_REVOCATION_CACHE names an unknown cache alias '{alias}'.", id='users.E001')]
+    if backend in LOCAL_CACHE_BACKENDS:
+        return [Error(
+            f"TOKEN_REVOCATION_CACHE '{alias}' is a per-process {backend.rsplit('.', 1)[-1]}: revoked access "
+            f"tokens stay valid in every other worker.",
+            hint="Point it at a shared cache (e.g. SHARED_CACHE_URL), or silence users.E002 for a "
+                 "single-process deployment.",
+            id='users.E002',
+        )]
+    return []
@@ -0,0 +1,53 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Course
+from users.importing import UserImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create users from a CSV or JSON Lines file, optionally enrolling them into a course'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV (with a header row) or .jsonl file; '-' reads stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: from the file extension, csv for stdin)')
+        parser.add_argument('--course', type=int, help='Enroll the imported students into this course id')
+        parser.add_argument('--role', default='student', help='Role for rows that do not set one')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Password hashing processes (default: CPU count; 0 hashes in-process)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, create nothing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        course = None
+        if options['course'] is not None:
+            course = Course.objects.filter(pk=options['course']).first()
+            if course is None:
+                raise CommandError(f"Course {options['course']} does not exist")
+
+        def progress(report):
+            self.stdout.write(f'{report.rows} rows, {report.created} created, {len(report.errors)} errors '
+                              f'({report.rate:.0f} rows/s)')
+
+        importer = UserImporter(
+            batch_size=options['batch_size'], workers=options['workers'], course=course,
+            default_role=options['role'], dry_run=options['dry_run'], progress=progress,
+        )
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        try:
+            report = importer.run(read_rows(stream, fmt))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line, message in report.errors:
+            self.stderr.write(f'line {line}: {message}')
+        verb = 'Validated' if options['dry_run'] else 'Created'
+        summary = f'{verb} {report.created} of {report.rows} users in {report.elapsed:.1f}s ({report.rate:.0f} rows/s)'
+        if course is not None:
+            summary += f', enrolled {report.enrolled} into {course.title}'
+        self.stdout.write(self.style.SUCCESS(summary) if not report.errors else self.style.WARNING(
+            f'{summary}, {len(report.errors)} rows rejected'
+        ))
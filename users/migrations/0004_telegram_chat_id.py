@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='telegram_chat_id',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='Telegram Chat ID'),
+        ),
+    ]
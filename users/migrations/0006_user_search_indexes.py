@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:40
+
+from django.db import migrations
+
+TRIGRAM_COLUMNS = ('email', 'full_name', 'phone_number')
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # CONCURRENTLY keeps sign-ups and logins writing while a large table is indexed.
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS users_user_{column}_trgm_idx '
+            f'ON users_user USING GIN ({column} gin_trgm_ops)'
+        )
+    schema_editor.execute(
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS users_user_phone_prefix_idx '
+        'ON users_user (phone_number varchar_pattern_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS users_user_{column}_trgm_idx')
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS users_user_phone_prefix_idx')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('users', '0005_refresh_tokens'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
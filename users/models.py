@@ -56,9 +56,11 @@ class User(AbstractBaseUser, PermissionsMixin):
                                            validators=[MinValueValidator(1), MaxValueValidator(101)])
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True, verbose_name='Avatar',
                                validators=[validate_avatar_size])
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Avatar Variants')
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, default='M', verbose_name='Gender')
     role = models.CharField(max_length=10, choices=USER_ROLES, default='student', verbose_name='Role')
     bio = models.TextField(blank=True, null=True, verbose_name='Biography')
+    telegram_chat_id = models.CharField(max_length=64, blank=True, null=True, verbose_name='Telegram Chat ID')
     
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
@@ -79,12 +81,19 @@ class User(AbstractBaseUser, PermissionsMixin):
         if self.age is not None and (self.age < 1 or self.age > 101):
             raise ValidationError({'age': 'Enter a valid age between 1 and 101.'})
     
-    def save(self, *args, **kwargs):
+    def sync_staff_flag(self):
         if not self.is_superuser:
             if self.role == 'admin':
                 self.is_staff = True
             elif self.role in ['student', 'teacher']:
                 self.is_staff = False
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Password rehashes and login stamps change nothing full_clean() would check.
+        if update_fields is not None and set(update_fields) <= {'password', 'last_login'}:
+            return super().save(*args, **kwargs)
+        self.sync_staff_flag()
         self.full_clean()
         super().save(*args, **kwargs)
 
@@ -92,3 +101,25 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name = 'User'
         verbose_name_plural = 'Users'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['full_name', 'id'], name='user_full_name_id_idx'),
+            models.Index(fields=['created_at', 'id'], name='user_created_id_idx'),
+        ]
+
+class RefreshToken(models.Model):
+    """Server-side record of an issued refresh token; ``family`` links a chain of rotations."""
+    jti = models.CharField(max_length=32, unique=True, verbose_name='Token ID')
+    family = models.CharField(max_length=32, db_index=True, verbose_name='Family')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='refresh_tokens', verbose_name='User')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Created At')
+    expires_at = models.DateTimeField(verbose_name='Expires At')
+    revoked_at = models.DateTimeField(blank=True, null=True, verbose_name='Revoked At')
+    replaced_by = models.CharField(max_length=32, blank=True, verbose_name='Replaced By')
+
+    class Meta:
+        verbose_name = 'Refresh Token'
+        verbose_name_plural = 'Refresh Tokens'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'Refresh token {self.jti} for {self.user_id}'
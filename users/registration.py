@@ -0,0 +1,42 @@
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework.authtoken.models import Token
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+
+def register_user(password, **fields):
+    """One hash and one INSERT; the ``REGISTRATION_HOOKS`` run once the user is committed."""
+    with transaction.atomic():
+        user = User.objects.create_user(password=password, **fields)
+        transaction.on_commit(lambda: after_registration(user))
+    return user
+
+
+def after_registration(user):
+    for path in settings.REGISTRATION_HOOKS:
+        try:
+            import_string(path)(user)
+        except Exception:
+            # The account exists either way; a failed extra must not turn signup into an error.
+            logger.exception(f"Registration hook {path} failed for user {user.pk}")
+
+
+def create_auth_token(user):
+    Token.objects.get_or_create(user=user)
+
+
+def send_welcome_message(user):
+    sender_email = getattr(settings, 'WELCOME_MESSAGE_SENDER', None)
+    if not sender_email:
+        return
+    from core.models import Message
+    sender = User.objects.filter(email=sender_email).first()
+    if sender is None:
+        logger.warning(f"Welcome message sender {sender_email} does not exist")
+        return
+    with transaction.atomic():
+        Message.objects.create(sender=sender, receiver=user, content=settings.WELCOME_MESSAGE_TEXT)
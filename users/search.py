@@ -0,0 +1,78 @@
+import re
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+from .models import USER_ROLES
+
+USER_TABLE = 'users_user'
+ROLES = {value for value, _ in USER_ROLES}
+# '+998…' or '998…' with at least the operator code: a prefix the phone index can seek to.
+PHONE_PREFIX_RE = re.compile(r'^\+?998\d{2,9}$')
+# pg_trgm needs three characters to pick trigrams out of a pattern.
+TRIGRAM_MIN_LENGTH = 3
+
+
+def phone_prefix(term):
+    if PHONE_PREFIX_RE.match(term):
+        return f"+{term.lstrip('+')}"
+    return None
+
+
+def like_escape(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class UserSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` for users, one clause per term (all must match):
+
+    - ``+998…`` phone prefixes seek the ``varchar_pattern_ops`` index on ``phone_number``;
+    - a role name matches the role exactly;
+    - anything else is a substring of email, name or phone, or a fuzzy match on the
+      name, served by the ``pg_trgm`` GIN indexes (migration 0006) and ranked by
+      similarity unless the client asks for an ordering.
+
+    Other databases get ``icontains`` for the last case.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        postgres = connections[queryset.db].vendor == 'postgresql'
+        ranks = []
+        for term in search_terms:
+            prefix = phone_prefix(term)
+            if prefix:
+                queryset = queryset.filter(phone_number__startswith=prefix)
+            elif term.lower() in ROLES:
+                queryset = queryset.filter(role=term.lower())
+            elif postgres and len(term) >= TRIGRAM_MIN_LENGTH:
+                matches, rank = self.trigram_query(term)
+                queryset = queryset.filter(pk__in=matches)
+                ranks.append(rank)
+            else:
+                queryset = queryset.filter(
+                    Q(email__icontains=term) | Q(full_name__icontains=term) | Q(phone_number__icontains=term)
+                )
+        if ranks:
+            queryset = queryset.annotate(search_rank=sum(ranks[1:], ranks[0]))
+            if api_settings.ORDERING_PARAM not in request.query_params:
+                queryset = queryset.order_by('-search_rank', 'pk')
+        return queryset
+
+    def trigram_query(self, term):
+        pattern = f'%{like_escape(term)}%'
+        # ``%s <%% full_name``: ``term`` is similar to some word of the name (typos included).
+        matches = RawSQL(
+            f'SELECT id FROM {USER_TABLE} WHERE email ILIKE %s OR full_name ILIKE %s '
+            f'OR phone_number LIKE %s OR %s <%% full_name',
+            [pattern, pattern, pattern, term]
+        )
+        rank = RawSQL(
+            f'GREATEST(word_similarity(%s, {USER_TABLE}.full_name), similarity(%s, {USER_TABLE}.email))',
+            [term, term], output_field=FloatField()
+        )
+        return matches, rank
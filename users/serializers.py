@@ -2,6 +2,8 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from .models import User
+from .registration import register_user
+from core.images import variant_url
 
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -28,12 +30,8 @@ class RegisterSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        password = validated_data.pop('password')
         validated_data['role'] = 'student'
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
-        user.save()
-        return user
+        return register_user(**validated_data)
 
     def validate(self, data):
         if 'role' in data or 'is_staff' in data or 'is_superuser' in data:
@@ -41,18 +39,28 @@ class RegisterSerializer(serializers.ModelSerializer):
         return data
 
 class BaseUserSerializer(serializers.ModelSerializer):
+    avatar_small = serializers.SerializerMethodField(read_only=True)
+    avatar_medium = serializers.SerializerMethodField(read_only=True)
+
     class Meta:
         model = User
         fields = [
-            'id', 'email', 'phone_number', 'full_name', 'age', 'avatar',
-            'gender', 'role', 'bio', 'is_active', 'created_at', 'updated_at'
+            'id', 'email', 'phone_number', 'full_name', 'age', 'avatar', 'avatar_small', 'avatar_medium',
+            'gender', 'role', 'bio', 'telegram_chat_id', 'is_active', 'created_at', 'updated_at'
         ]
         read_only_fields = ('id', 'created_at', 'updated_at')
         extra_kwargs = {
             'role': {'read_only': True},
             'is_active': {'read_only': True},
+            'telegram_chat_id': {'write_only': True},
         }
 
+    def get_avatar_small(self, obj):
+        return variant_url(obj, 'small', self.context.get('request'))
+
+    def get_avatar_medium(self, obj):
+        return variant_url(obj, 'medium', self.context.get('request'))
+
 class UserSerializer(BaseUserSerializer):
     password = serializers.CharField(write_only=True, required=False)
 
@@ -68,13 +76,9 @@ class UserSerializer(BaseUserSerializer):
         return value
 
     def create(self, validated_data):
-        password = validated_data.pop('password', None)
+        password = validated_data.pop('password', None) or None
         validated_data.setdefault('role', 'student')
-        user = User.objects.create_user(**validated_data)
-        if password:
-            user.set_password(password)
-            user.save()
-        return user
+        return register_user(password, **validated_data)
 
 class UserDetailSerializer(BaseUserSerializer):
     def update(self, instance, validated_data):
@@ -1,3 +1,352 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import time
+from unittest import mock
+from django.core import signing
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from core.models import Course, Enrollment, Message
+from core.querybudget import QueryBudgetTestMixin
+from .authentication import CachedTokenAuthentication, TokenCache, load_snapshot, token_cache
+from .checks import check_revocation_cache
+from .models import RefreshToken, User
+from . import tokens
+from .hashers import TunedArgon2PasswordHasher
 
-# Create your tests here.
+
+class CachedTokenAuthenticationTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234567',
+            role='student'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('message-unread-count')
+
+    def test_hot_tokens_cost_no_query(self):
+        with self.assertMaxQueries(2):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        # Only the view's own mailbox lookup is left.
+        with self.assertMaxQueries(1):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_deactivating_the_user_invalidates_the_entry(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleting_the_token_invalidates_the_entry(self):
+        self.client.get(self.url)
+        self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_user_saves_keep_the_password(self):
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        user.full_name = 'Renamed'
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.full_name, 'Renamed')
+        self.assertTrue(self.user.check_password('student123'))
+
+
+class TokenCacheTests(TestCase):
+    def snapshot(self, user_id):
+        return {'user_id': user_id, 'created': None, 'values': ()}
+
+    def test_lru_is_bounded(self):
+        cache = TokenCache(maxsize=2)
+        cache.set('a', self.snapshot(1))
+        cache.set('b', self.snapshot(1))
+        cache.get('a')
+        cache.set('c', self.snapshot(2))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        cache.invalidate(user_id=1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(set(cache.keys_by_user), {2})
+
+    def test_entries_expire(self):
+        cache = TokenCache(ttl=-1)
+        cache.set('a', self.snapshot(1))
+        self.assertIsNone(cache.get('a'))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_shared_tier_fills_other_processes(self):
+        user = User.objects.create_user(
+            email='teacher@example.com', password='teacher123', phone_number='+998901234568', role='teacher'
+        )
+        key = Token.objects.create(user=user).key
+        TokenCache(shared_alias='default').set(key, load_snapshot(key))
+        other_process = TokenCache(shared_alias='default')
+        self.assertEqual(other_process.get(key)['user_id'], user.pk)
+        other_process.invalidate([key])
+        self.assertIsNone(TokenCache(shared_alias='default').get(key))
+
+
+class AccessTokenTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='student@example.com',
+            password='student123',
+            phone_number='+998901234567',
+            role='student'
+        )
+        response = self.client.post(reverse('login'), {'email': 'student@example.com', 'password': 'student123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.issued = response.data
+        self.url = reverse('message-unread-count')
+
+    def bearer(self, token=None):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token or self.issued['access']}")
+
+    def test_login_keeps_the_legacy_token(self):
+        self.assertEqual(self.issued['token'], Token.objects.get(user=self.user).key)
+        self.assertEqual(self.issued['access_expires_in'], tokens.access_lifetime())
+
+    def test_access_token_costs_no_auth_query(self):
+        self.bearer()
+        with self.assertMaxQueries(1):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_role_checks_read_the_claims(self):
+        self.bearer()
+        response = self.client.post(reverse('course-list'), {'title': 'Course'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_tampered_and_expired_tokens_are_rejected(self):
+        self.bearer(self.issued['access'][:-2] + 'xx')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+        with mock.patch('users.tokens.time.time', return_value=time.time() + tokens.access_lifetime() + 1):
+            self.bearer()
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deploy_check_wants_a_shared_revocation_cache(self):
+        shared = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}
+        with override_settings(TOKEN_REVOCATION_CACHE='default'):
+            self.assertEqual([e.id for e in check_revocation_cache(None)], ['users.E002'])
+            with override_settings(CACHES={'default': shared}):
+                self.assertEqual(check_revocation_cache(None), [])
+        with override_settings(TOKEN_REVOCATION_CACHE='missing'):
+            self.assertEqual([e.id for e in check_revocation_cache(None)], ['users.E001'])
+        # Plain ``check`` and every other command still run on a per-process cache.
+        call_command('check', stdout=io.StringIO())
+
+    def test_refresh_token_is_not_an_access_token(self):
+        self.bearer(self.issued['refresh'])
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rotates_and_reuse_revokes_the_family(self):
+        url = reverse('token-refresh')
+        rotated = self.client.post(url, {'refresh': self.issued['refresh']})
+        self.assertEqual(rotated.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(rotated.data['refresh'], self.issued['refresh'])
+        self.bearer(rotated.data['access'])
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+        # A replayed refresh token means it leaked: the newer one stops working too.
+        replay = self.client.post(url, {'refresh': self.issued['refresh']})
+        self.assertEqual(replay.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            self.client.post(url, {'refresh': rotated.data['refresh']}).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        self.assertFalse(RefreshToken.objects.filter(revoked_at__isnull=True).exists())
+
+    def test_forged_refresh_token_is_rejected(self):
+        forged = signing.dumps({'jti': 'unknown'}, salt=tokens.REFRESH_SALT)
+        response = self.client.post(reverse('token-refresh'), {'refresh': forged})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_both_tokens(self):
+        self.bearer()
+        response = self.client.post(reverse('logout'), {'refresh': self.issued['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        response = self.client.post(reverse('token-refresh'), {'refresh': self.issued['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ImportUsersTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher@example.com', password='teacher123', phone_number='+998901234500', role='teacher'
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def run_import(self, path, **options):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_users', path, workers=0, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_rows_are_validated_and_reported_per_line(self):
+        path = self.write('users.csv', '\n'.join([
+            'email,phone_number,full_name,age,password',
+            'a@example.com,+998901234501,Ann,20,secret-a',
+            'teacher@example.com,+998901234502,Taken,,x',
+            'b@example.com,+998901234501,Same Phone,,x',
+            'c@example.com,12345,Bad Phone,,x',
+            'd@example.com,+998901234504,No Password,,',
+            'e@example.com,+998901234505,Bad Age,abc,x',
+        ]) + '\n')
+        out, err = self.run_import(path, batch_size=2)
+        self.assertIn('Created 2 of 6 users', out)
+        self.assertIn('line 7: age:', err)
+        self.assertIn('line 3: email: teacher@example.com is already taken.', err)
+        self.assertIn('line 4: phone_number: +998901234501 is already taken.', err)
+        self.assertIn('line 5: phone_number:', err)
+        ann = User.objects.get(email='a@example.com')
+        self.assertEqual((ann.full_name, ann.age, ann.role, ann.is_staff), ('Ann', 20, 'student', False))
+        self.assertTrue(ann.check_password('secret-a'))
+        self.assertFalse(User.objects.get(email='d@example.com').has_usable_password())
+
+    def test_jsonl_import_enrolls_students(self):
+        course = Course.objects.create(title='Course', description='Description', teacher=self.teacher,
+                                       category='Programming')
+        rows = [{'email': f's{i}@example.com', 'phone_number': f'+9989000000{i:02d}'} for i in range(3)]
+        rows.append({'email': 't2@example.com', 'phone_number': '+998900000099', 'role': 'teacher'})
+        path = self.write('users.jsonl', '\n'.join(json.dumps(row) for row in rows) + '\nnot json\n')
+        out, err = self.run_import(path, course=course.pk)
+        self.assertIn('enrolled 3 into Course', out)
+        self.assertIn('line 5: invalid JSON', err)
+        self.assertEqual(Enrollment.objects.filter(course=course).count(), 3)
+        course.refresh_from_db()
+        self.assertEqual(course.enrollment_count, 3)
+
+    def test_queries_do_not_grow_with_rows(self):
+        lines = ['email,phone_number'] + [f'u{i}@example.com,+9989100000{i:02d}' for i in range(60)]
+        path = self.write('users.csv', '\n'.join(lines) + '\n')
+        # One lookup of existing users, then one INSERT per batch of 20.
+        with self.assertMaxQueries(1 + 3, allow_duplicates=True):
+            self.run_import(path, batch_size=20)
+        self.assertEqual(User.objects.filter(email__startswith='u').count(), 60)
+
+    def test_dry_run_creates_nothing(self):
+        path = self.write('users.csv', 'email,phone_number\nx@example.com,+998901234599\n')
+        out, _ = self.run_import(path, dry_run=True)
+        self.assertIn('Validated 1 of 1 users', out)
+        self.assertFalse(User.objects.filter(email='x@example.com').exists())
+
+    def test_passwords_hash_in_a_process_pool(self):
+        path = self.write('users.csv', 'email,phone_number,password\np@example.com,+998901234598,pooled\n')
+        call_command('import_users', path, workers=2, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertTrue(User.objects.get(email='p@example.com').check_password('pooled'))
+
+
+class UserSearchTests(APITestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', password='admin123', phone_number='+998900000001'
+        )
+        self.client.force_authenticate(user=admin)
+        self.ali = User.objects.create_user(
+            email='ali@example.com', password='x', phone_number='+998901234567', full_name='Ali Valiyev'
+        )
+        self.teacher = User.objects.create_user(
+            email='t@example.com', password='x', phone_number='+998911990123', full_name='Student Advisor',
+            role='teacher'
+        )
+
+    def search(self, term):
+        response = self.client.get(reverse('user-list'), {'search': term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {row['email'] for row in response.data['results']}
+
+    def test_phone_prefix_fast_path(self):
+        self.assertEqual(self.search('+9989012'), {'ali@example.com'})
+        self.assertEqual(self.search('99891'), {'t@example.com'})
+
+    def test_phone_fragment_and_name_substring(self):
+        self.assertEqual(self.search('4567'), {'ali@example.com'})
+        self.assertEqual(self.search('valiy'), {'ali@example.com'})
+
+    def test_role_matches_exactly_and_terms_combine(self):
+        self.assertEqual(self.search('teacher'), {'t@example.com'})
+        self.assertEqual(self.search('student'), {'ali@example.com'})
+        self.assertEqual(self.search('student ali'), {'ali@example.com'})
+        self.assertEqual(self.search('teacher ali'), set())
+
+
+class RegistrationTests(APITestCase):
+    payload = {
+        'email': 'new@example.com',
+        'phone_number': '+998901112233',
+        'full_name': 'New Student',
+        'password': 'Kd83-wq!pLm',
+    }
+
+    def test_signup_hashes_once_and_writes_once(self):
+        with mock.patch.object(TunedArgon2PasswordHasher, 'encode', autospec=True,
+                               side_effect=TunedArgon2PasswordHasher.encode) as encode, \
+                CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('register'), self.payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(encode.call_count, 1)
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith(('INSERT INTO "users_user"',
+                                                                                        'UPDATE "users_user"'))]
+        self.assertEqual(len(writes), 1)
+        user = User.objects.get(email='new@example.com')
+        self.assertTrue(user.password.startswith('argon2$argon2id$v=19$m=19456,t=2,p=1$'))
+        self.assertEqual(user.role, 'student')
+
+    def test_token_is_created_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(reverse('register'), self.payload)
+        user = User.objects.get(email='new@example.com')
+        self.assertFalse(Token.objects.filter(user=user).exists())
+        for callback in callbacks:
+            callback()
+        self.assertTrue(Token.objects.filter(user=user).exists())
+
+    def test_welcome_message_from_the_configured_sender(self):
+        sender = User.objects.create_user(
+            email='support@example.com', password='x', phone_number='+998900000002', role='admin'
+        )
+        with override_settings(WELCOME_MESSAGE_SENDER='support@example.com'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('register'), self.payload)
+        message = Message.objects.get(sender=sender)
+        self.assertEqual(message.receiver.email, 'new@example.com')
+
+    @override_settings(REGISTRATION_HOOKS=['users.registration.missing_hook', 'users.registration.create_auth_token'])
+    def test_failing_hook_does_not_fail_signup(self):
+        with self.assertLogs('users.registration', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('register'), self.payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Token.objects.filter(user__email='new@example.com').exists())
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        user = User.objects.create_user(email='old@example.com', password='x', phone_number='+998900000003')
+        User.objects.filter(pk=user.pk).update(password=make_password('legacy-pass', hasher='pbkdf2_sha256'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('login'), {'email': 'old@example.com', 'password': 'legacy-pass'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$'))
+        self.assertTrue(user.check_password('legacy-pass'))
+        # The rehash writes the password alone, without full_clean's uniqueness lookups.
+        self.assertFalse([q for q in queries.captured_queries if 'phone_number" = ' in q['sql']])
@@ -0,0 +1,118 @@
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from .models import RefreshToken
+
+ACCESS_SALT = 'users.tokens.access'
+REFRESH_SALT = 'users.tokens.refresh'
+# Cache backends whose entries only the current process sees.
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def access_lifetime():
+    return getattr(settings, 'ACCESS_TOKEN_LIFETIME', 300)
+
+
+def refresh_lifetime():
+    return getattr(settings, 'REFRESH_TOKEN_LIFETIME', 14 * 24 * 3600)
+
+
+def revocation_alias():
+    return getattr(settings, 'TOKEN_REVOCATION_CACHE', None) or 'default'
+
+
+def revocation_cache():
+    return caches[revocation_alias()]
+
+
+def new_id():
+    return uuid.uuid4().hex
+
+
+def issue_access(user):
+    claims = {
+        'user_id': user.pk,
+        'role': user.role,
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+        'exp': int(time.time()) + access_lifetime(),
+        'jti': new_id(),
+    }
+    return signing.dumps(claims, salt=ACCESS_SALT)
+
+
+def issue_tokens(user, family=None):
+    """A fresh access token plus a refresh token recorded in ``family`` (a new one by default)."""
+    jti = new_id()
+    RefreshToken.objects.create(
+        jti=jti, family=family or new_id(), user=user,
+        expires_at=timezone.now() + timedelta(seconds=refresh_lifetime())
+    )
+    return {
+        'access': issue_access(user),
+        'refresh': signing.dumps({'jti': jti}, salt=REFRESH_SALT),
+        'access_expires_in': access_lifetime(),
+    }, jti
+
+
+def decode_access(token):
+    """Claims of a valid access token: signature, expiry and the revocation list, no DB."""
+    try:
+        claims = signing.loads(token, salt=ACCESS_SALT, max_age=access_lifetime())
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed(_('Invalid or expired access token.'))
+    if claims.get('exp', 0) < time.time():
+        raise exceptions.AuthenticationFailed(_('Invalid or expired access token.'))
+    if revocation_cache().get(f"users.access.revoked:{claims['jti']}"):
+        raise exceptions.AuthenticationFailed(_('Access token has been revoked.'))
+    return claims
+
+
+def revoke_access(claims):
+    remaining = int(claims['exp'] - time.time())
+    if remaining > 0:
+        revocation_cache().set(f"users.access.revoked:{claims['jti']}", True, remaining)
+
+
+def load_refresh(token):
+    try:
+        payload = signing.loads(token, salt=REFRESH_SALT, max_age=refresh_lifetime())
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed(_('Invalid or expired refresh token.'))
+    return payload['jti']
+
+
+def rotate(token):
+    """
+    Trade a refresh token for a new pair. Each refresh token works once: presenting
+    one that was already rotated or revoked revokes its whole family.
+    """
+    jti = load_refresh(token)
+    now = timezone.now()
+    with transaction.atomic():
+        record = RefreshToken.objects.select_for_update().select_related('user').filter(jti=jti).first()
+        if record is None or record.expires_at <= now or not record.user.is_active:
+            raise exceptions.AuthenticationFailed(_('Invalid or expired refresh token.'))
+        reused = record.revoked_at is not None
+        if not reused:
+            tokens, new_jti = issue_tokens(record.user, family=record.family)
+            record.revoked_at, record.replaced_by = now, new_jti
+            record.save(update_fields=['revoked_at', 'replaced_by'])
+    if reused:
+        # Committed before raising, so the revocation survives the failed request.
+        revoke_family(record.family)
+        raise exceptions.AuthenticationFailed(_('Refresh token has already been used.'))
+    return tokens
+
+def revoke_family(family):
+    return RefreshToken.objects.filter(family=family, revoked_at__isnull=True).update(revoked_at=timezone.now())
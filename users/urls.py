@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LoginView, RegisterView, UserViewSet
+from .views import LoginView, LogoutView, RegisterView, TokenRefreshView, UserViewSet
 
 router = DefaultRouter()
 router.register(r'', UserViewSet)
@@ -8,5 +8,7 @@ router.register(r'', UserViewSet)
 urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path('register/', RegisterView.as_view(), name='register'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('', include(router.urls)),
 ]
@@ -1,6 +1,8 @@
 from django.core.exceptions import ValidationError
 
+AVATAR_MAX_SIZE_KB = 1024
+
 def validate_avatar_size(file):
-    max_size_kb = 1024
+    max_size_kb = AVATAR_MAX_SIZE_KB
     if file.size > max_size_kb * 1024:
         raise ValidationError(f'Avatar file size must be less than {max_size_kb} KB')
\ No newline at end of file
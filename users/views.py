@@ -1,16 +1,21 @@
 import logging
 from rest_framework import viewsets, permissions, filters
-from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
 from .models import User
+from . import tokens
 from .serializers import LoginSerializer, RegisterSerializer, UserSerializer, UserDetailSerializer
 from rest_framework import serializers
+from core.pagination import StandardResultsSetPagination
+from .search import UserSearchFilter
 
 class LoginView(APIView):
+    throttle_scope = 'login'
+
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
@@ -21,10 +26,43 @@ class LoginView(APIView):
                     status=status.HTTP_403_FORBIDDEN
                 )
             token, _ = Token.objects.get_or_create(user=user)
-            return Response({'token': token.key})
+            issued, _ = tokens.issue_tokens(user)
+            return Response({'token': token.key, **issued})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class TokenRefreshView(APIView):
+    # Callers usually hold an expired access token; it must not fail this request.
+    authentication_classes = []
+
+    def get_authenticate_header(self, request):
+        return 'Bearer'
+
+    def post(self, request):
+        refresh = request.data.get('refresh')
+        if not refresh:
+            return Response({'refresh': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(tokens.rotate(refresh))
+
+class LogoutView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        refresh = request.data.get('refresh')
+        if refresh:
+            try:
+                jti = tokens.load_refresh(refresh)
+            except AuthenticationFailed:
+                jti = None
+            family = request.user.refresh_tokens.filter(jti=jti).values_list('family', flat=True).first()
+            if family:
+                tokens.revoke_family(family)
+        if isinstance(request.auth, dict):
+            tokens.revoke_access(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class RegisterView(APIView):
+    throttle_scope = 'register'
+
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
@@ -38,18 +76,13 @@ class RegisterView(APIView):
                 return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-    
 logger = logging.getLogger('my_custom_logger')
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     permission_classes = [permissions.IsAdminUser]
     pagination_class = StandardResultsSetPagination
-    filter_backends = (DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter)
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter, UserSearchFilter)
     search_fields = ['email', 'full_name', 'phone_number', 'role']
     ordering_fields = ['full_name', 'email', 'role', 'created_at']
     ordering = ['full_name']
@@ -14,6 +14,7 @@ from pathlib import Path
 from decouple import config
 import dj_database_url
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -52,6 +53,7 @@ INSTALLED_APPS += ['storages']
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'core.querybudget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -65,6 +67,9 @@ MIDDLEWARE = [
     # 'corsheaders.middleware.CorsMiddleware',
 ]
 
+QUERY_BUDGET_DEFAULT = config('QUERY_BUDGET_DEFAULT', default=20, cast=int)
+QUERY_BUDGET_DUPLICATE_THRESHOLD = config('QUERY_BUDGET_DUPLICATE_THRESHOLD', default=3, cast=int)
+
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 INTERNAL_IPS = [
@@ -127,6 +132,20 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# The first hasher hashes new passwords; the rest only verify old hashes, which are
+# upgraded on the next successful login. Argon2 costs: KiB of memory, passes, lanes.
+PASSWORD_HASHERS = [
+    config('PASSWORD_HASHER', default='users.hashers.TunedArgon2PasswordHasher'),
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+ARGON2_TIME_COST = config('ARGON2_TIME_COST', default=2, cast=int)
+ARGON2_MEMORY_COST = config('ARGON2_MEMORY_COST', default=19456, cast=int)
+ARGON2_PARALLELISM = config('ARGON2_PARALLELISM', default=1, cast=int)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -163,6 +182,85 @@ AWS_S3_OBJECT_PARAMETERS = {'CacheControl': 'max-age=86400'}
 
 DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
+# Direct-to-storage uploads (core.uploads); LocalUploadBackend is the filesystem stand-in.
+UPLOAD_BACKEND = config('UPLOAD_BACKEND', default='core.uploads.S3UploadBackend')
+UPLOAD_URL_EXPIRES = config('UPLOAD_URL_EXPIRES', default=900, cast=int)
+
+# Resized image variants for Course.image and User.avatar (core.images).
+IMAGE_VARIANTS = {'small': 160, 'medium': 480}
+IMAGE_VARIANT_FORMAT = config('IMAGE_VARIANT_FORMAT', default='WEBP')
+IMAGE_VARIANT_QUALITY = config('IMAGE_VARIANT_QUALITY', default=80, cast=int)
+IMAGE_MAX_PIXELS = config('IMAGE_MAX_PIXELS', default=40_000_000, cast=int)
+IMAGE_WORKERS = config('IMAGE_WORKERS', default=2, cast=int)
+IMAGE_DERIVATIVES_ASYNC = config('IMAGE_DERIVATIVES_ASYNC', default=True, cast=bool)
+
+# Bulk certificate issuance (core.certificates), run by ``manage.py issue_certificates``.
+CERTIFICATE_WORKERS = config('CERTIFICATE_WORKERS', default=2, cast=int)
+CERTIFICATE_LEASE = config('CERTIFICATE_LEASE', default=300, cast=int)
+CERTIFICATE_PROGRESS_BATCH = config('CERTIFICATE_PROGRESS_BATCH', default=100, cast=int)
+
+# Push delivery of messages (core.realtime). Multi-process deployments need a shared
+# broker, e.g. 'core.realtime.RedisBroker' with REALTIME_REDIS_URL.
+REALTIME_BROKER = config('REALTIME_BROKER', default='core.realtime.InMemoryBroker')
+REALTIME_REDIS_URL = config('REALTIME_REDIS_URL', default='redis://localhost:6379/0')
+REALTIME_HEARTBEAT = config('REALTIME_HEARTBEAT', default=20, cast=int)
+REALTIME_QUEUE_SIZE = config('REALTIME_QUEUE_SIZE', default=100, cast=int)
+
+# Telegram relay of messages (core.telegram), sent by `manage.py dispatch_telegram`.
+TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN', default='')
+TELEGRAM_API_URL = config('TELEGRAM_API_URL', default='https://api.telegram.org')
+TELEGRAM_TRANSPORT = config('TELEGRAM_TRANSPORT', default='core.telegram.BotApiTransport')
+TELEGRAM_BATCH_SIZE = config('TELEGRAM_BATCH_SIZE', default=100, cast=int)
+TELEGRAM_CONCURRENCY = config('TELEGRAM_CONCURRENCY', default=8, cast=int)
+TELEGRAM_MAX_ATTEMPTS = config('TELEGRAM_MAX_ATTEMPTS', default=8, cast=int)
+TELEGRAM_CHAT_INTERVAL = config('TELEGRAM_CHAT_INTERVAL', default=1.0, cast=float)
+TELEGRAM_GLOBAL_RATE = config('TELEGRAM_GLOBAL_RATE', default=30, cast=int)
+
+# Caches. SHARED_CACHE_URL (redis://...) adds a 'shared' alias every process sees.
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+SHARED_CACHE_URL = config('SHARED_CACHE_URL', default='')
+if SHARED_CACHE_URL:
+    CACHES['shared'] = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': SHARED_CACHE_URL}
+
+# Token auth cache (users.authentication). Set TOKEN_AUTH_SHARED_CACHE to a cache alias
+# (e.g. a Redis-backed one) to share snapshots between processes.
+TOKEN_AUTH_CACHE_SIZE = config('TOKEN_AUTH_CACHE_SIZE', default=10000, cast=int)
+TOKEN_AUTH_CACHE_TTL = config('TOKEN_AUTH_CACHE_TTL', default=60, cast=int)
+TOKEN_AUTH_SHARED_CACHE = config('TOKEN_AUTH_SHARED_CACHE', default='shared' if SHARED_CACHE_URL else None)
+TOKEN_AUTH_SHARED_TTL = config('TOKEN_AUTH_SHARED_TTL', default=300, cast=int)
+
+# Signed access / refresh tokens (users.tokens), lifetimes in seconds. Revoked access
+# tokens are listed in TOKEN_REVOCATION_CACHE, which must be shared between processes
+# or logout only works in the worker that served it; ``check --deploy`` reports a
+# per-process cache as users.E002 (silence it for a single-process deployment).
+ACCESS_TOKEN_LIFETIME = config('ACCESS_TOKEN_LIFETIME', default=300, cast=int)
+REFRESH_TOKEN_LIFETIME = config('REFRESH_TOKEN_LIFETIME', default=14 * 24 * 3600, cast=int)
+TOKEN_REVOCATION_CACHE = config('TOKEN_REVOCATION_CACHE', default=TOKEN_AUTH_SHARED_CACHE or 'default')
+
+# Run after a signup commits (users.registration). The welcome message is sent from the
+# WELCOME_MESSAGE_SENDER account when that is set.
+REGISTRATION_HOOKS = [
+    'users.registration.create_auth_token',
+    'users.registration.send_welcome_message',
+]
+WELCOME_MESSAGE_SENDER = config('WELCOME_MESSAGE_SENDER', default=None)
+WELCOME_MESSAGE_TEXT = config('WELCOME_MESSAGE_TEXT', default='Welcome to WisdomWay! Reply here if you need any help.')
+
+# Request throttling (core.throttling); rates are DEFAULT_THROTTLE_RATES below. The local
+# backend counts per process; CacheThrottleBackend shares counters through THROTTLE_CACHE.
+# Off under `manage.py test`, where every client is 127.0.0.1.
+THROTTLE_ENABLED = config('THROTTLE_ENABLED', default=sys.argv[1:2] != ['test'], cast=bool)
+THROTTLE_BACKEND = config('THROTTLE_BACKEND', default='core.throttling.LocalThrottleBackend')
+THROTTLE_CACHE = config('THROTTLE_CACHE', default='default')
+
+# Teachers' grading queue (core.grading): seconds a claimed submission stays reserved.
+GRADING_LEASE = config('GRADING_LEASE', default=900, cast=int)
+
+# Dashboard rollups (core.analytics), refreshed by `manage.py refresh_analytics`. Rows
+# changed up to ANALYTICS_OVERLAP seconds before the last run are read again.
+ANALYTICS_OVERLAP = config('ANALYTICS_OVERLAP', default=300, cast=int)
+ANALYTICS_HOURLY_RETENTION_DAYS = config('ANALYTICS_HOURLY_RETENTION_DAYS', default=14, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -173,10 +271,26 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.AccessTokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.IPRateThrottle',
+        'core.throttling.UserRateThrottle',
+        'core.throttling.ScopedRateThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'ip': config('THROTTLE_RATE_IP', default='100/min'),
+        'user': config('THROTTLE_RATE_USER', default='300/min'),
+        'login': config('THROTTLE_RATE_LOGIN', default='10/min'),
+        'register': config('THROTTLE_RATE_REGISTER', default='5/hour'),
+        'uploads': config('THROTTLE_RATE_UPLOADS', default='30/min'),
+        'messages': config('THROTTLE_RATE_MESSAGES', default='60/min'),
+    },
+    # Proxies in front of the app that append to X-Forwarded-For. 0 trusts only REMOTE_ADDR;
+    # never leave it unset, or throttles key on the whole client-supplied header.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
     'EXCEPTION_HANDLER': 'core.exceptions.custom_exception_handler',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
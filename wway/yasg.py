@@ -13,7 +13,10 @@ info = openapi.Info(
         "## Authentication\n"
         "Most endpoints require authentication. Use the login endpoint to obtain a token.\n\n"
         "## Rate Limiting\n"
-        "API requests are limited to 100 requests per minute per IP address.\n\n"
+        "Anonymous requests are limited to 100 requests per minute per IP address and "
+        "authenticated ones to 300 per minute per user. Login, registration, uploads and "
+        "sending messages have tighter limits of their own. Throttled requests get "
+        "`429 Too Many Requests` with a `Retry-After` header in seconds.\n\n"
         "## Error Handling\n"
         "All errors return a JSON response with an error message and status code."
     ),